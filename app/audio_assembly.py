@@ -0,0 +1,201 @@
+import asyncio
+import subprocess
+import wave
+from typing import AsyncIterator
+
+import numpy as np
+from loguru import logger
+
+from app.utils import ffmpeg_binary
+
+MP3_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG 1
+    2: (22050, 24000, 16000),  # MPEG 2
+    0: (11025, 12000, 8000),  # MPEG 2.5
+}
+
+
+def mp3_gapless_length(head: bytes) -> tuple[int, int] | None:
+    """Reads the Xing/LAME header of an mp3 and returns (samples, sample rate).
+
+    A seekable file lets ffmpeg trim the encoder padding itself, a pipe does
+    not, so streamed audio is trimmed to this length instead. None when the
+    stream carries no such header (e.g. most streaming encoders).
+    """
+    offset = 0
+    if head[:3] == b"ID3" and len(head) >= 10:
+        size = head[6] << 21 | head[7] << 14 | head[8] << 7 | head[9]
+        offset = 10 + size
+
+    frame = head[offset : offset + 4]
+    if len(frame) < 4 or frame[0] != 0xFF or frame[1] & 0xE0 != 0xE0:
+        return None
+
+    version = (frame[1] >> 3) & 0x3
+    rate_index = (frame[2] >> 2) & 0x3
+    if version not in MP3_SAMPLE_RATES or rate_index == 3:
+        return None
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    samples_per_frame = 1152 if version == 3 else 576
+
+    tag = max(head.find(b"Xing", offset), head.find(b"Info", offset))
+    if tag < 0 or len(head) < tag + 8:
+        return None
+
+    flags = int.from_bytes(head[tag + 4 : tag + 8], "big")
+    if not flags & 0x1:
+        return None
+    frames = int.from_bytes(head[tag + 8 : tag + 12], "big")
+
+    lame = tag + 8 + 4 * bool(flags & 0x1) + 4 * bool(flags & 0x2)
+    lame += 100 * bool(flags & 0x4) + 4 * bool(flags & 0x8)
+    delay = padding = 0
+    # the extension starts with the encoder name, e.g. LAME3.100 or Lavc58.54
+    if head[lame : lame + 4].isalpha() and len(head) >= lame + 24:
+        gap = int.from_bytes(head[lame + 21 : lame + 24], "big")
+        delay, padding = gap >> 12, gap & 0xFFF
+
+    return frames * samples_per_frame - delay - padding, sample_rate
+
+
+class AudioAssembler:
+    """Decodes narration files into PCM buffers and joins them with numpy.
+
+    Every file is decoded exactly once by a short-lived ffmpeg process that
+    is waited on before returning, so no reader outlives the call.
+    """
+
+    def __init__(self, sample_rate: int = 44100, channels: int = 2):
+        self.sample_rate = sample_rate
+        self.channels = channels
+
+    def decode_cmd(self, source: str) -> list[str]:
+        return [
+            ffmpeg_binary(),
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-i",
+            source,
+            "-f",
+            "f32le",
+            "-acodec",
+            "pcm_f32le",
+            "-ac",
+            str(self.channels),
+            "-ar",
+            str(self.sample_rate),
+            "-",
+        ]
+
+    def to_pcm(self, raw: bytes) -> np.ndarray:
+        return np.frombuffer(raw, dtype=np.float32).reshape(-1, self.channels)
+
+    def decode(self, path: str) -> np.ndarray:
+        """Returns the audio of `path` as a (samples, channels) float32 array."""
+        with subprocess.Popen(
+            self.decode_cmd(path), stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        ) as proc:
+            raw, err = proc.communicate()
+
+        if proc.returncode != 0:
+            raise RuntimeError(
+                f"Could not decode {path}: {err.decode(errors='ignore')}"
+            )
+
+        return self.to_pcm(raw)
+
+    async def decode_stream(self, chunks: AsyncIterator[bytes]) -> np.ndarray:
+        """Decodes audio while it is still arriving, e.g. a streaming TTS response.
+
+        The chunks are piped into ffmpeg as they come, so decoding runs
+        alongside the download and finishes right after the last chunk.
+        """
+        proc = await asyncio.create_subprocess_exec(
+            *self.decode_cmd("pipe:0"),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        assert proc.stdin and proc.stdout and proc.stderr
+
+        head = bytearray()
+
+        async def feed():
+            try:
+                async for chunk in chunks:
+                    if len(head) < 8192:
+                        head.extend(chunk[: 8192 - len(head)])
+                    proc.stdin.write(chunk)
+                    await proc.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                # ffmpeg exited early, its error is reported below
+                pass
+            finally:
+                proc.stdin.close()
+
+        try:
+            _, raw, err = await asyncio.gather(
+                feed(), proc.stdout.read(), proc.stderr.read()
+            )
+        except BaseException:
+            proc.kill()
+            await proc.wait()
+            raise
+
+        if await proc.wait() != 0:
+            raise RuntimeError(
+                f"Could not decode stream: {err.decode(errors='ignore')}"
+            )
+
+        pcm = self.to_pcm(raw)
+        gapless = mp3_gapless_length(bytes(head))
+        if gapless:
+            samples, sample_rate = gapless
+            pcm = pcm[: round(samples * self.sample_rate / sample_rate)]
+        return pcm
+
+    def assemble(
+        self,
+        paths: list[str],
+        gap: float = 0.0,
+        decoded: dict[str, np.ndarray] | None = None,
+    ) -> tuple[np.ndarray, list[float]]:
+        """Concatenates the files with `gap` seconds of silence between them.
+
+        Returns the master PCM buffer and the sample-accurate duration of each
+        file, repeated paths are decoded only once and paths in `decoded`
+        (already decoded while they streamed in) not at all.
+        """
+        decoded = dict(decoded or {})
+        for path in paths:
+            if path not in decoded:
+                decoded[path] = self.decode(path)
+
+        silence = np.zeros(
+            (round(gap * self.sample_rate), self.channels), dtype=np.float32
+        )
+        parts = []
+        durations = []
+        for index, path in enumerate(paths):
+            if index and len(silence):
+                parts.append(silence)
+            parts.append(decoded[path])
+            durations.append(len(decoded[path]) / self.sample_rate)
+
+        if not parts:
+            return np.zeros((0, self.channels), dtype=np.float32), durations
+
+        return np.concatenate(parts), durations
+
+    def write_wav(self, pcm: np.ndarray, path: str) -> str:
+        """Writes a lossless 16-bit PCM wav."""
+        samples = (np.clip(pcm, -1.0, 1.0) * 32767).astype("<i2")
+        with wave.open(path, "wb") as f:
+            f.setnchannels(self.channels)
+            f.setsampwidth(2)
+            f.setframerate(self.sample_rate)
+            f.writeframes(samples.tobytes())
+
+        logger.debug(f"Wrote master audio: {path} ({len(pcm) / self.sample_rate:.3f}s)")
+        return path
@@ -0,0 +1,185 @@
+"""Headless batch rendering.
+
+Reads one ReelsMakerConfig json object per line from a file or stdin and
+renders them with a pool of worker processes, one result line is written
+as soon as each reel finishes:
+
+    python -m app.batch reels.jsonl --jobs 4 --output results.jsonl
+    cat reels.jsonl | python -m app.batch - --jobs 4
+
+Workers share the on-disk speech, video, pexels and LLM caches, so
+repeated sentences, sources and prompts across the batch are only paid
+for once.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import IO, Callable, Iterator
+
+from loguru import logger
+
+
+def read_records(stream: IO[str]) -> Iterator[tuple[int, str]]:
+    """Yields (line number, json) for every non empty line, reading lazily."""
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if line:
+            yield line_no, line
+
+
+def render_record(line_no: int, record_json: str, threads: int) -> dict:
+    """Renders one record in a worker process and returns its result line."""
+    from app.reels_maker import ReelsMaker, ReelsMakerConfig
+
+    started = time.perf_counter()
+    result: dict = {"line": line_no}
+    maker = None
+    try:
+        record = json.loads(record_json)
+        record.setdefault("cwd", os.path.join(os.getcwd(), "tmp", str(uuid.uuid4())))
+        os.makedirs(record["cwd"], exist_ok=True)
+
+        # split the cores between the parallel jobs unless the record says otherwise
+        video_gen_config = record.setdefault("video_gen_config", {})
+        video_gen_config.setdefault("threads", threads)
+
+        config = ReelsMakerConfig.model_validate(record)
+        maker = ReelsMaker(config)
+        result["output"] = asyncio.run(maker.start())
+        result["status"] = "done"
+    except Exception as e:
+        logger.exception(f"Failed to render line {line_no}: {e}")
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    result["timings"] = {
+        **(maker.profiler.stage_totals() if maker else {}),
+        "total": round(time.perf_counter() - started, 3),
+    }
+    return result
+
+
+def failed_result(line_no: int, error: BaseException) -> dict:
+    """Result line of a record whose worker raised or died."""
+    return {
+        "line": line_no,
+        "status": "failed",
+        "error": f"{type(error).__name__}: {error}",
+    }
+
+
+def run_batch(
+    records: Iterator[tuple[int, str]],
+    out: IO[str],
+    jobs: int,
+    threads: int,
+    render: Callable[[int, str, int], dict] = render_record,
+) -> int:
+    """Renders all records with `jobs` processes, returns the number of failures.
+
+    A record whose worker raises or dies gets a failed result line and the
+    batch goes on. A dead worker breaks the whole pool, the records still
+    queued in it fail with it and a fresh pool takes the rest.
+    """
+    failures = 0
+    # spawn: workers must not inherit the parent's event loop or sqlite handles
+    ctx = multiprocessing.get_context("spawn")
+
+    def new_pool() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=jobs, mp_context=ctx)
+
+    pool = new_pool()
+    # line number and pool of every submitted record
+    pending: dict[Future, tuple[int, ProcessPoolExecutor]] = {}
+
+    def replace_broken(broken: ProcessPoolExecutor) -> None:
+        nonlocal pool
+        if broken is pool:
+            logger.warning("A batch worker died, starting a new pool")
+            broken.shutdown(wait=False, cancel_futures=True)
+            pool = new_pool()
+
+    def submit(line_no: int, record_json: str) -> None:
+        try:
+            future = pool.submit(render, line_no, record_json, threads)
+        except BrokenProcessPool:
+            replace_broken(pool)
+            future = pool.submit(render, line_no, record_json, threads)
+        pending[future] = (line_no, pool)
+
+    def drain(block_until: int):
+        nonlocal failures
+        while len(pending) > block_until:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                line_no, owner = pending.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    logger.error(f"Worker of line {line_no} died: {e}")
+                    result = failed_result(line_no, e)
+                    replace_broken(owner)
+                except Exception as e:
+                    logger.exception(f"Failed to render line {line_no}: {e}")
+                    result = failed_result(line_no, e)
+
+                failures += result["status"] != "done"
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+
+    try:
+        for line_no, record_json in records:
+            submit(line_no, record_json)
+            # keep a bounded window so a stdin stream is not read ahead unboundedly
+            drain(block_until=jobs * 2)
+
+        drain(block_until=0)
+    finally:
+        pool.shutdown()
+
+    return failures
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Render reels from a JSONL file")
+    parser.add_argument("input", help="jsonl file of ReelsMakerConfig, - for stdin")
+    parser.add_argument(
+        "--jobs", type=int, default=max(multiprocessing.cpu_count() // 2, 1)
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="encoder threads per job, defaults to cores / jobs",
+    )
+    parser.add_argument("--output", default="-", help="results jsonl, - for stdout")
+    args = parser.parse_args(argv)
+
+    threads = args.threads or max(multiprocessing.cpu_count() // args.jobs, 1)
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    out = sys.stdout if args.output == "-" else open(args.output, "a")
+    try:
+        failures = run_batch(read_records(source), out, args.jobs, threads)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    sys.exit(main())
@@ -0,0 +1,204 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from loguru import logger
+
+from app.config import (
+    audios_cache_path,
+    images_cache_path,
+    pexels_cache_path,
+    speech_cache_path,
+    stages_cache_path,
+    videos_cache_path,
+)
+
+
+class CacheStore:
+    """Content-addressed file cache.
+
+    Keys are hashed with sha256 and stored as `<root>/<ab>/<cd>/<digest><ext>`,
+    a small SQLite index next to the files keeps sizes and access times so
+    lookups never walk the directory and the store can be trimmed to
+    `max_bytes` by evicting the least recently used entries.
+    """
+
+    def __init__(self, root: str, max_bytes: int | None = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(root, "index.db")
+        self._local = threading.local()
+
+    @staticmethod
+    def digest(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str, ext: str = "") -> str:
+        digest = self.digest(key)
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}{ext}")
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(self.root, exist_ok=True)
+            conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    digest TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, max_age: float | None = None) -> str | None:
+        """Returns the cached file for `key`, or None when missing or older than `max_age` seconds."""
+        digest = self.digest(key)
+        row = self.db.execute(
+            "SELECT path, created_at FROM entries WHERE digest = ?", (digest,)
+        ).fetchone()
+        if not row:
+            return None
+
+        path, created_at = row
+        now = time.time()
+        if not os.path.exists(path) or (
+            max_age is not None and now - created_at > max_age
+        ):
+            self.remove(key)
+            return None
+
+        self.db.execute(
+            "UPDATE entries SET last_access = ? WHERE digest = ?", (now, digest)
+        )
+        return path
+
+    @contextmanager
+    def reserve(self, key: str, ext: str = "") -> Iterator[str]:
+        """Yields a temp path in the store, it is renamed into place only if the block succeeds."""
+        final_path = self.path_for(key, ext)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(final_path), prefix=".tmp-", suffix=ext
+        )
+        os.close(fd)
+
+        try:
+            yield tmp_path
+            os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._index(key, final_path)
+
+    def adopt(self, key: str, src_path: str, ext: str = "") -> str:
+        """Moves a finished file (on the same filesystem) into the store."""
+        final_path = self.path_for(key, ext)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(src_path, final_path)
+        self._index(key, final_path)
+        return final_path
+
+    def put_file(self, key: str, src_path: str, ext: str = "") -> str:
+        with self.reserve(key, ext) as tmp_path:
+            shutil.copyfile(src_path, tmp_path)
+        return self.path_for(key, ext)
+
+    def put_bytes(self, key: str, data: bytes, ext: str = "") -> str:
+        with self.reserve(key, ext) as tmp_path:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+        return self.path_for(key, ext)
+
+    def remove(self, key: str) -> None:
+        digest = self.digest(key)
+        row = self.db.execute(
+            "SELECT path FROM entries WHERE digest = ?", (digest,)
+        ).fetchone()
+        self.db.execute("DELETE FROM entries WHERE digest = ?", (digest,))
+        if row and os.path.exists(row[0]):
+            os.remove(row[0])
+
+    def total_bytes(self) -> int:
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[
+            0
+        ]
+
+    def evict(self, keep: str | None = None) -> None:
+        """Removes least recently used entries until the store fits in `max_bytes`.
+
+        `keep` is a digest that must survive, e.g. the entry that was just inserted.
+        """
+        if self.max_bytes is None:
+            return
+
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+
+        rows = self.db.execute(
+            "SELECT digest, path, size FROM entries ORDER BY last_access"
+        ).fetchall()
+        for digest, path, size in rows:
+            if total <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+
+            self.db.execute("DELETE FROM entries WHERE digest = ?", (digest,))
+            if os.path.exists(path):
+                os.remove(path)
+            total -= size
+            logger.debug(f"Evicted from cache: {path}")
+
+    def _index(self, key: str, path: str) -> None:
+        now = time.time()
+        digest = self.digest(key)
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries (digest, path, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (digest, path, os.path.getsize(path), now, now),
+        )
+        self.evict(keep=digest)
+
+
+def _max_bytes(env: str, default: int) -> int:
+    return int(os.getenv(env, default))
+
+
+GB = 1024 * 1024 * 1024
+
+speech_cache = CacheStore(
+    speech_cache_path, max_bytes=_max_bytes("SPEECH_CACHE_MAX_BYTES", 2 * GB)
+)
+videos_cache = CacheStore(
+    videos_cache_path, max_bytes=_max_bytes("VIDEOS_CACHE_MAX_BYTES", 20 * GB)
+)
+audios_cache = CacheStore(
+    audios_cache_path, max_bytes=_max_bytes("AUDIOS_CACHE_MAX_BYTES", 2 * GB)
+)
+pexels_cache = CacheStore(
+    pexels_cache_path, max_bytes=_max_bytes("PEXELS_CACHE_MAX_BYTES", GB // 10)
+)
+stages_cache = CacheStore(
+    stages_cache_path, max_bytes=_max_bytes("STAGES_CACHE_MAX_BYTES", 10 * GB)
+)
+images_cache = CacheStore(
+    images_cache_path, max_bytes=_max_bytes("IMAGES_CACHE_MAX_BYTES", 2 * GB)
+)
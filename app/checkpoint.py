@@ -0,0 +1,74 @@
+import json
+import os
+from typing import Any
+
+from loguru import logger
+
+from app.cache import CacheStore, stages_cache
+from app.normalize import content_hash
+from app.utils import reflink_or_copy
+
+# bump when a stage's output format changes so old checkpoints are not reused
+CHECKPOINT_VERSION = 1
+
+
+def stage_key(stage: str, **inputs) -> str:
+    """Cache key of a stage output, `inputs` must be json serializable."""
+    return json.dumps(
+        {"stage": stage, "version": CHECKPOINT_VERSION, **inputs}, sort_keys=True
+    )
+
+
+def file_hash(path: str | None) -> str | None:
+    """Content hash of an optional input file, a missing file fails later where it is used."""
+    return content_hash(path) if path and os.path.exists(path) else None
+
+
+class Checkpoints:
+    """Memoizes the outputs of pipeline stages on disk.
+
+    Each output is stored under a key built from the content hashes of the
+    stage inputs and the config fields that affect it, so a rerun only
+    recomputes the stages whose inputs changed. Files are reflinked in and
+    out of the store when the filesystem allows it, never hardlinked: stages
+    rewrite their outputs in place on a rerun, which would otherwise change
+    the stored checkpoint too.
+    """
+
+    def __init__(self, cache: CacheStore = stages_cache, enabled: bool = True):
+        self.cache = cache
+        self.enabled = enabled
+
+    def load_json(self, key: str) -> Any | None:
+        if not self.enabled:
+            return None
+
+        path = self.cache.get(key)
+        if not path:
+            return None
+
+        with open(path) as f:
+            return json.load(f)
+
+    def save_json(self, key: str, value: Any) -> None:
+        if self.enabled:
+            self.cache.put_bytes(key, json.dumps(value).encode("utf-8"), ext=".json")
+
+    def load_file(self, key: str, dest: str) -> str | None:
+        """Places the checkpointed file of `key` at `dest`, None when there is none."""
+        if not self.enabled:
+            return None
+
+        path = self.cache.get(key)
+        if not path:
+            return None
+
+        logger.debug(f"Reusing checkpoint: {dest}")
+        return reflink_or_copy(path, dest)
+
+    def save_file(self, key: str, path: str, ext: str = "") -> None:
+        if not self.enabled:
+            return
+
+        with self.cache.reserve(key, ext) as tmp_path:
+            reflink_or_copy(path, tmp_path)
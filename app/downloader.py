@@ -0,0 +1,124 @@
+import asyncio
+import fcntl
+import os
+
+import aiohttp
+from loguru import logger
+
+from app.cache import CacheStore, videos_cache
+from app.instrumentation import record_cache
+
+
+class DownloadError(Exception):
+    pass
+
+
+class Downloader:
+    """Streams remote files into a cache store.
+
+    Transfers are written in chunks to a `.part` file next to their final
+    location and renamed into the cache once complete, an interrupted
+    transfer resumes from the `.part` file with an HTTP Range request.
+    Concurrent requests for the same url are coalesced into one transfer,
+    within a process through a shared task and across processes through a
+    lock file.
+    """
+
+    def __init__(
+        self,
+        cache: CacheStore = videos_cache,
+        chunk_size: int = 1024 * 1024,
+        max_retries: int = 3,
+    ):
+        self.cache = cache
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    async def fetch(self, url: str, ext: str = "") -> str:
+        """Returns the cached path of `url`, downloading it if needed."""
+        cached = self.cache.get(url)
+        if cached:
+            logger.info(f"Found resource in cache: {cached}")
+            record_cache(True)
+            return cached
+
+        record_cache(False)
+        task = self._inflight.get(url)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.create_task(self._fetch_locked(url, ext))
+            self._inflight[url] = task
+            task.add_done_callback(lambda t: self._forget(url, t))
+        else:
+            logger.debug(f"Joining in-flight download: {url}")
+
+        return await asyncio.shield(task)
+
+    def _forget(self, url: str, task: asyncio.Task) -> None:
+        if self._inflight.get(url) is task:
+            del self._inflight[url]
+
+    async def _fetch_locked(self, url: str, ext: str) -> str:
+        final_path = self.cache.path_for(url, ext)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+
+        with open(f"{final_path}.lock", "w") as lock:
+            # another process may hold it while downloading the same url
+            await asyncio.to_thread(fcntl.flock, lock.fileno(), fcntl.LOCK_EX)
+            try:
+                cached = self.cache.get(url)
+                if cached:
+                    return cached
+
+                part_path = f"{final_path}.part"
+                async with aiohttp.ClientSession() as session:
+                    await self._download(session, url, part_path)
+
+                return self.cache.adopt(url, part_path, ext)
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    async def _download(
+        self, session: aiohttp.ClientSession, url: str, part_path: str
+    ) -> None:
+        for attempt in range(1, self.max_retries + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 416 and offset:
+                        # the part file already holds the whole resource
+                        return
+
+                    response.raise_for_status()
+                    if offset and response.status != 206:
+                        logger.debug(f"Server ignored range request: {url}")
+                        offset = 0
+
+                    logger.info(f"Downloading resource from: {url} (offset {offset})")
+                    with open(part_path, "ab" if offset else "wb") as f:
+                        async for chunk in response.content.iter_chunked(
+                            self.chunk_size
+                        ):
+                            f.write(chunk)
+
+                    if response.content_length is not None:
+                        expected = offset + response.content_length
+                        if os.path.getsize(part_path) < expected:
+                            raise DownloadError(f"Transfer ended early: {url}")
+
+                logger.debug(f"Downloaded resource from: {url}")
+                return
+            except (
+                aiohttp.ClientPayloadError,
+                aiohttp.ClientConnectionError,
+                asyncio.TimeoutError,
+                DownloadError,
+            ) as e:
+                logger.warning(f"Download interrupted ({attempt}): {url}: {e}")
+
+        raise DownloadError(f"Failed to download {url}")
+
+
+default_downloader = Downloader()
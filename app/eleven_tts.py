@@ -0,0 +1,107 @@
+import asyncio
+import os
+from typing import AsyncIterator
+
+import aiohttp
+from loguru import logger
+
+from app.http_session import LoopSession
+
+
+class ElevenLabsError(Exception):
+    pass
+
+
+class ElevenLabsClient:
+    """Async client for the ElevenLabs streaming text-to-speech endpoint.
+
+    Audio is yielded chunk by chunk as it arrives, nothing is buffered
+    beyond one chunk. At most `max_concurrency_per_key` requests run at the
+    same time for one API key, matching the concurrency limit of the plan
+    the key belongs to.
+
+    Unset arguments are read from ELEVENLABS_BASE_URL, ELEVENLABS_API_KEY and
+    ELEVENLABS_MAX_CONCURRENCY when the first request is made, after .env
+    has been loaded.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        api_key: str | None = None,
+        max_concurrency_per_key: int | None = None,
+        chunk_size: int = 16 * 1024,
+        timeout: float = 120,
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_concurrency_per_key = max_concurrency_per_key
+        self.chunk_size = chunk_size
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+        self.http = LoopSession(self.new_session)
+        # api key -> semaphore, bound to the loop of the session
+        self._limits: dict[str, asyncio.Semaphore] = {}
+
+    def new_session(self) -> aiohttp.ClientSession:
+        self._limits = {}
+        return aiohttp.ClientSession(timeout=self.timeout)
+
+    async def session(self) -> aiohttp.ClientSession:
+        return await self.http.get()
+
+    async def close(self) -> None:
+        await self.http.close()
+
+    def limit(self, api_key: str) -> asyncio.Semaphore:
+        if api_key not in self._limits:
+            limit = self.max_concurrency_per_key or int(
+                os.getenv("ELEVENLABS_MAX_CONCURRENCY", 2)
+            )
+            self._limits[api_key] = asyncio.Semaphore(limit)
+        return self._limits[api_key]
+
+    async def stream(
+        self,
+        text: str,
+        voice_id: str,
+        model_id: str = "eleven_multilingual_v2",
+        voice_settings: dict | None = None,
+        output_format: str = "mp3_44100_128",
+    ) -> AsyncIterator[bytes]:
+        """Yields the mp3 of `text` while it is being synthesized."""
+        api_key = self.api_key or os.getenv("ELEVENLABS_API_KEY")
+        if not api_key:
+            raise ElevenLabsError("ELEVENLABS_API_KEY is not set")
+
+        session = await self.session()
+        base_url = self.base_url or os.getenv(
+            "ELEVENLABS_BASE_URL", "https://api.elevenlabs.io"
+        )
+        url = f"{base_url.rstrip('/')}/v1/text-to-speech/{voice_id}/stream"
+        payload = {"text": text, "model_id": model_id}
+        if voice_settings:
+            payload["voice_settings"] = voice_settings
+
+        async with self.limit(api_key):
+            async with session.post(
+                url,
+                params={"output_format": output_format},
+                headers={"xi-api-key": api_key, "Accept": "audio/mpeg"},
+                json=payload,
+            ) as response:
+                if response.status != 200:
+                    detail = await response.text()
+                    raise ElevenLabsError(
+                        f"ElevenLabs TTS failed ({response.status}): {detail}"
+                    )
+
+                received = 0
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    received += len(chunk)
+                    yield chunk
+
+        logger.debug(f"ElevenLabs TTS streamed {received} bytes for voice {voice_id}")
+
+
+default_client = ElevenLabsClient()
@@ -0,0 +1,395 @@
+import asyncio
+import os
+from typing import NamedTuple
+
+from loguru import logger
+from PIL import Image
+
+from app.cache import CacheStore, videos_cache
+from app.layout import OutputLayout, master_size
+from app.normalize import NormalizeParams, normalize_filter, normalize_source
+from app.overlay import OverlayLayer
+from app.subtitle_raster import rasterize_text
+from app.subtitle_track import SubtitleTrack
+from app.timeline import Segment, plan_segments
+from app.utils import probe_duration, run_ffmpeg
+from app.video_config import VideoGeneratorConfig
+
+
+def overlay_position(position: str) -> tuple[str, str]:
+    """Maps a moviepy style "horizontal,vertical" position to overlay x/y expressions."""
+    horizontal, vertical = position.split(",")
+    x = {"left": "0", "center": "(W-w)/2", "right": "W-w"}.get(horizontal, horizontal)
+    y = {"top": "0", "center": "(H-h)/2", "bottom": "H-h"}.get(vertical, vertical)
+    return x, y
+
+
+class Output(NamedTuple):
+    layout: OutputLayout
+    path: str
+    cue_track_path: str | None = None
+    overlay: tuple[str, int, int] | None = None
+    """ pre-composited overlay png and its position """
+
+
+class FFmpegRenderer:
+    """Renders the reel as a single native ffmpeg filtergraph.
+
+    Builds the same timeline as the moviepy path in `VideoGenerator`:
+    background segments planned by `plan_segments`, cropped, scaled and
+    desaturated, subtitle cues pre-rasterized to PNG and overlaid at their
+    cue times, the static overlay layer, narration mixed with background
+    music and the closing fade. Python never touches pixel data while
+    encoding.
+
+    With several `formats` the background is decoded once at a master size
+    covering all of them and split, each format gets its own crop,
+    subtitles and overlay, and the shared audio mix is encoded with every
+    output of the same ffmpeg run.
+    """
+
+    def __init__(
+        self,
+        cwd: str,
+        config: VideoGeneratorConfig,
+        formats: list[VideoGeneratorConfig] | None = None,
+        videos_cache: CacheStore = videos_cache,
+    ):
+        self.cwd = cwd
+        self.config = config
+        self.videos_cache = videos_cache
+        self.profile = config.render_profile
+        self.formats = formats or [config]
+        self.width, self.height = master_size(self.formats)
+        self.layouts = [
+            OutputLayout(format_config, (self.width, self.height))
+            for format_config in self.formats
+        ]
+        self.fps = self.profile.fps
+
+    def source_filter(self) -> str:
+        return normalize_filter(
+            NormalizeParams(width=self.width, height=self.height, fps=self.fps)
+        )
+
+    def write_cue_track(
+        self, track: SubtitleTrack, duration: float, layout: OutputLayout | None = None
+    ) -> str | None:
+        """Rasterizes every distinct cue text centered on a shared canvas and
+        writes an ffconcat playlist that shows each one for its cue time."""
+        if not len(track):
+            return None
+
+        layout = layout or self.layouts[0]
+        config = layout.config
+        basedir = os.path.join(self.cwd, "subtitles", "cues", layout.slug)
+        os.makedirs(basedir, exist_ok=True)
+
+        texts = list(dict.fromkeys(track.texts))
+        images = [
+            rasterize_text(
+                text=text,
+                font_path=config.font_path,
+                font_size=self.profile.scaled(config.fontsize),
+                color=config.text_color,
+                stroke_color=config.stroke_color,
+                stroke_width=self.profile.scaled(config.stroke_width),
+                bg_color=config.bg_color,
+            )
+            for text in texts
+        ]
+        canvas = (
+            max(image.shape[1] for image in images),
+            max(image.shape[0] for image in images),
+        )
+
+        blank_path = os.path.join(basedir, "blank.png")
+        Image.new("RGBA", canvas, (0, 0, 0, 0)).save(blank_path)
+
+        # repeated words share one image
+        cue_paths: dict[str, str] = {}
+        for index, (text, image) in enumerate(zip(texts, images)):
+            cue_paths[text] = os.path.join(basedir, f"{index}.png")
+            frame = Image.new("RGBA", canvas, (0, 0, 0, 0))
+            frame.paste(
+                Image.fromarray(image),
+                (
+                    (canvas[0] - image.shape[1]) // 2,
+                    (canvas[1] - image.shape[0]) // 2,
+                ),
+            )
+            frame.save(cue_paths[text])
+
+        def entry(path: str) -> str:
+            escaped = path.replace("'", r"'\''")
+            return f"file '{escaped}'"
+
+        # durations are differences of rounded absolute times, so rounding
+        # never accumulates over thousands of cues, and overlapping cues are
+        # clamped to start where the previous one ended
+        lines = ["ffconcat version 1.0"]
+        t = 0.0
+        for start, end, text in track:
+            start = max(round(start, 3), t)
+            end = max(round(end, 3), start)
+            if start > t:
+                lines += [entry(blank_path), f"duration {start - t:.3f}"]
+            if end > start:
+                lines += [entry(cue_paths[text]), f"duration {end - start:.3f}"]
+            t = end
+
+        lines += [entry(blank_path), f"duration {max(duration - t, 0.1):.3f}"]
+        # the last entry is repeated so its duration is honoured
+        lines += [entry(blank_path)]
+
+        playlist_path = os.path.join(basedir, "cues.ffconcat")
+        with open(playlist_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return playlist_path
+
+    def write_overlay(
+        self, layout: OutputLayout | None = None
+    ) -> tuple[str, int, int] | None:
+        """Pre-composites the watermark and boxes into one PNG, returns its
+        path and position, None when there is nothing to overlay."""
+        layout = layout or self.layouts[0]
+        layer = OverlayLayer.from_config(layout.config)
+        if layer.empty:
+            return None
+
+        path = os.path.join(self.cwd, f"overlay_{layout.slug}.png")
+        x, y = layer.save_png(path)
+        return path, x, y
+
+    def build_command(
+        self,
+        video_paths: list[str],
+        segments: list[Segment],
+        tts_path: str,
+        duration: float,
+        outputs: list[Output],
+        normalized: bool,
+        background_music_path: str | None = None,
+    ) -> list[str]:
+        inputs: list[str] = []
+        filters: list[str] = []
+
+        # one input per segment with input seeking, so each is decoded only
+        # over its own time range
+        for index, segment in enumerate(segments):
+            inputs += [
+                "-ss",
+                f"{segment.start:.3f}",
+                "-t",
+                f"{segment.duration:.3f}",
+                "-i",
+                video_paths[segment.source],
+            ]
+            transform = "" if normalized else f"{self.source_filter()},"
+            filters.append(f"[{index}:v]{transform}setpts=PTS-STARTPTS[g{index}]")
+
+        labels = "".join(f"[g{index}]" for index in range(len(segments)))
+        filters.append(
+            f"{labels}concat=n={len(segments)}:v=1:a=0,fps={self.fps},format=rgb24[bg]"
+        )
+        next_input = len(segments)
+
+        narration_input = next_input
+        inputs += ["-i", tts_path]
+        next_input += 1
+
+        music_input = None
+        if background_music_path:
+            inputs += ["-i", background_music_path]
+            music_input = next_input
+            next_input += 1
+        filters.append(self.audio_filter(narration_input, music_input))
+
+        # every format is cut from the same decoded background and audio mix
+        count = len(outputs)
+        if count > 1:
+            filters.append(
+                f"[bg]split={count}{''.join(f'[bg{i}]' for i in range(count))};"
+                f"[aout]asplit={count}{''.join(f'[aout{i}]' for i in range(count))}"
+            )
+
+        mapped: list[str] = []
+        for index, output in enumerate(outputs):
+            video = f"bg{index}" if count > 1 else "bg"
+            audio = f"aout{index}" if count > 1 else "aout"
+            layout = output.layout
+
+            cut = []
+            if layout.crop != (0, 0, self.width, self.height):
+                x, y, width, height = layout.crop
+                cut.append(f"crop={width}:{height}:{x}:{y}")
+            if layout.scaled:
+                cut.append(f"scale={layout.width}:{layout.height}")
+            if cut:
+                filters.append(f"[{video}]{','.join(cut)}[cut{index}]")
+                video = f"cut{index}"
+
+            if output.cue_track_path:
+                inputs += ["-f", "concat", "-safe", "0", "-i", output.cue_track_path]
+                x, y = overlay_position(layout.config.subtitles_position)
+                filters.append(
+                    f"[{next_input}:v]format=rgba,fps={self.fps}[subs{index}];"
+                    f"[{video}][subs{index}]overlay=x={x}:y={y}:eof_action=pass"
+                    f"[subbed{index}]"
+                )
+                video = f"subbed{index}"
+                next_input += 1
+
+            if output.overlay:
+                overlay_path, x, y = output.overlay
+                inputs += ["-i", overlay_path]
+                filters.append(
+                    f"[{video}][{next_input}:v]overlay=x={x}:y={y}[marked{index}]"
+                )
+                video = f"marked{index}"
+                next_input += 1
+
+            fade_start = max(duration - 3, 0)
+            filters.append(
+                f"[{video}]fade=t=out:st={fade_start:.3f}:d=3,format=yuv420p"
+                f"[vout{index}]"
+            )
+            mapped += [
+                "-map",
+                f"[vout{index}]",
+                "-map",
+                f"[{audio}]",
+                *self.output_args(duration, output.path),
+            ]
+
+        return [*inputs, "-filter_complex", ";".join(filters), *mapped]
+
+    def audio_filter(self, narration_input: int, music_input: int | None) -> str:
+        """Narration, mixed with the background music if any, labelled [aout]."""
+        if music_input is None:
+            return f"[{narration_input}:a]aresample=44100[aout]"
+
+        # amix averages its inputs, scale back up so it sums like moviepy. The
+        # music is padded with silence so amix never drops to one input and
+        # boosts the narration once short music ends
+        return (
+            f"[{music_input}:a]aresample=44100,volume=0.2,apad[music];"
+            f"[{narration_input}:a]aresample=44100[narration];"
+            "[narration][music]amix=inputs=2:duration=first:dropout_transition=0,"
+            "volume=2[aout]"
+        )
+
+    def output_args(self, duration: float, output_path: str) -> list[str]:
+        """Encoder flags of the final mp4 for the render profile."""
+        return [
+            "-t",
+            f"{duration:.3f}",
+            "-r",
+            str(self.fps),
+            "-c:v",
+            "libx264",
+            "-preset",
+            self.profile.preset,
+            *self.profile.x264_params(),
+            "-pix_fmt",
+            "yuv420p",
+            "-c:a",
+            "aac",
+            "-b:a",
+            self.profile.audio_bitrate,
+            "-threads",
+            str(self.config.threads),
+            output_path,
+        ]
+
+    async def plan(
+        self, video_paths: list[str], tts_path: str, max_clip_duration: float
+    ) -> tuple[list[str], list[Segment], float]:
+        """Normalizes the sources if configured and plans the background
+        segments over the narration, returns the sources, segments and duration."""
+        if self.config.normalize_sources:
+            params = NormalizeParams(width=self.width, height=self.height, fps=self.fps)
+            video_paths = list(
+                await asyncio.gather(
+                    *(
+                        asyncio.to_thread(
+                            normalize_source, p, params, self.videos_cache
+                        )
+                        for p in video_paths
+                    )
+                )
+            )
+
+        duration = probe_duration(tts_path)
+        segments = plan_segments(
+            [probe_duration(path) for path in video_paths],
+            max_duration=duration,
+            max_clip_duration=max_clip_duration,
+            fps=self.fps,
+        )
+        return video_paths, segments, duration
+
+    async def render(
+        self,
+        video_paths: list[str],
+        tts_path: str,
+        subtitles: SubtitleTrack | str | None,
+        output_path: str,
+        max_clip_duration: float = 3,
+        background_music_path: str | None = None,
+    ) -> str:
+        paths = await self.render_formats(
+            video_paths,
+            tts_path,
+            subtitles,
+            [output_path],
+            max_clip_duration=max_clip_duration,
+            background_music_path=background_music_path,
+        )
+        return paths[0]
+
+    async def render_formats(
+        self,
+        video_paths: list[str],
+        tts_path: str,
+        subtitles: SubtitleTrack | str | None,
+        output_paths: list[str],
+        max_clip_duration: float = 3,
+        background_music_path: str | None = None,
+    ) -> list[str]:
+        """Renders every format in one pass, `output_paths` follow `formats`."""
+        if len(output_paths) != len(self.layouts):
+            raise ValueError(
+                f"{len(self.layouts)} formats but {len(output_paths)} output paths"
+            )
+
+        video_paths, segments, duration = await self.plan(
+            video_paths, tts_path, max_clip_duration
+        )
+
+        track = SubtitleTrack.coerce(subtitles) if subtitles else None
+        outputs = [
+            Output(
+                layout=layout,
+                path=path,
+                cue_track_path=(
+                    self.write_cue_track(track, duration, layout) if track else None
+                ),
+                overlay=self.write_overlay(layout),
+            )
+            for layout, path in zip(self.layouts, output_paths)
+        ]
+
+        args = self.build_command(
+            video_paths=video_paths,
+            segments=segments,
+            tts_path=tts_path,
+            duration=duration,
+            outputs=outputs,
+            normalized=self.config.normalize_sources,
+            background_music_path=background_music_path,
+        )
+
+        logger.info(f"Rendering video with ffmpeg: {', '.join(output_paths)}")
+        await asyncio.to_thread(run_ffmpeg, args)
+        return output_paths
@@ -0,0 +1,435 @@
+import asyncio
+import os
+import queue
+import subprocess
+import threading
+from contextlib import ExitStack
+
+import numpy as np
+from loguru import logger
+
+from app.ffmpeg_render import FFmpegRenderer
+from app.instrumentation import record_frame_buffers
+from app.layout import OutputLayout
+from app.overlay import (
+    OverlayLayer,
+    blend_premultiplied,
+    overlay_offset,
+    premultiply,
+)
+from app.subtitle_raster import rasterize_text
+from app.subtitle_track import SubtitleTrack
+from app.timeline import Segment
+from app.utils import ffmpeg_binary, run_ffmpeg
+
+
+class FramePool:
+    """A fixed set of frame buffers preallocated within a memory budget.
+
+    Frames are decoded into buffers taken with `acquire` and handed back
+    with `release` once encoded. Nothing is allocated per frame and a
+    producer that runs ahead waits for a free buffer, so memory stays flat
+    however long the reel is.
+    """
+
+    def __init__(self, shape: tuple[int, ...], budget_bytes: int):
+        self.frame_bytes = int(np.prod(shape))
+        count = budget_bytes // self.frame_bytes
+        if count < 2:
+            raise ValueError(
+                f"A frame memory budget of {budget_bytes} bytes holds less than "
+                f"two {shape} frames"
+            )
+
+        self.buffers = [np.empty(shape, dtype=np.uint8) for _ in range(count)]
+        self._free: queue.LifoQueue[np.ndarray] = queue.LifoQueue()
+        for buffer in self.buffers:
+            self._free.put(buffer)
+
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.peak_in_use = 0
+
+    def __len__(self) -> int:
+        return len(self.buffers)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buffers) * self.frame_bytes
+
+    @property
+    def peak_bytes(self) -> int:
+        return self.peak_in_use * self.frame_bytes
+
+    def acquire(self) -> np.ndarray:
+        """A free buffer, blocks until one is released."""
+        buffer = self._free.get()
+        with self._lock:
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return buffer
+
+    def release(self, buffer: np.ndarray) -> None:
+        with self._lock:
+            self.in_use -= 1
+        self._free.put(buffer)
+
+
+class FrameCompositor:
+    """Draws the active subtitle cue, the static overlay and the closing
+    fade onto a frame of one output format in place.
+
+    Frames are composited at the layout's crop size, graphics are drawn to
+    scale and the encoder resizes the result. A cue is rasterized and
+    premultiplied once when it becomes active, the overlay layer once per
+    render.
+    """
+
+    def __init__(self, layout: OutputLayout, track: SubtitleTrack, duration: float):
+        self.layout = layout
+        self.config = layout.config
+        self.profile = self.config.render_profile
+        self.width, self.height = layout.crop_size
+        self.scale = self.height / layout.height
+        self.track = track
+        self.fade_start = max(duration - 3, 0)
+        self.overlay = OverlayLayer.from_config(self.config, layout.crop_size)
+        self.current: tuple[int | None, tuple | None] = (None, None)
+
+    def scaled(self, value: float) -> int:
+        return round(self.profile.scaled(value) * self.scale) if value else 0
+
+    def cue(self, index: int) -> tuple[int, int, np.ndarray, np.ndarray]:
+        if self.current[0] != index:
+            image = rasterize_text(
+                text=self.track.texts[index],
+                font_path=self.config.font_path,
+                font_size=self.scaled(self.config.fontsize),
+                color=self.config.text_color,
+                stroke_color=self.config.stroke_color,
+                stroke_width=self.scaled(self.config.stroke_width),
+                bg_color=self.config.bg_color,
+            )
+            horizontal, vertical = self.config.subtitles_position.split(",")
+            x = overlay_offset(horizontal, self.width, image.shape[1])
+            y = overlay_offset(vertical, self.height, image.shape[0])
+            self.current = (index, (x, y, *premultiply(image)))
+        return self.current[1]  # type: ignore
+
+    def __call__(self, frame: np.ndarray, t: float) -> np.ndarray:
+        index = self.track.cue_at(t)
+        if index is not None:
+            blend_premultiplied(frame, *self.cue(index))
+
+        self.overlay.blend(frame)
+
+        if t >= self.fade_start:
+            fade = max(1 - (t - self.fade_start) / 3, 0)
+            np.multiply(frame, fade, out=frame, casting="unsafe")
+        return frame
+
+
+def read_frame(stream, buffer: np.ndarray) -> bool:
+    """Fills `buffer` from a raw video pipe, False at the end of the stream."""
+    view = memoryview(buffer).cast("B")
+    filled = 0
+    while filled < len(view):
+        read = stream.readinto(view[filled:])
+        if not read:
+            return False
+        filled += read
+    return True
+
+
+class FramePipelineRenderer(FFmpegRenderer):
+    """Renders the reel through a bounded pool of numpy frame buffers.
+
+    Background segments are decoded by ffmpeg straight into pooled buffers
+    on a reader thread, subtitles, overlay and fade are drawn in place and
+    the same buffer is piped to the encoder, which also mixes the audio
+    like `FFmpegRenderer`. At most `frame_memory_budget` bytes of frames
+    exist at any time.
+
+    With several formats each decoded frame is copied once per format
+    into a preallocated crop buffer, composited and piped to that format's
+    encoder. The encoders run side by side and share one audio mix.
+    """
+
+    def decode_cmd(self, video_path: str, segment: Segment, frames: int) -> list[str]:
+        # the last frame is held if a source ends early, so every segment
+        # yields exactly its share of output frames
+        transform = "" if self.config.normalize_sources else f"{self.source_filter()},"
+        return [
+            ffmpeg_binary(),
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-ss",
+            f"{segment.start:.3f}",
+            "-t",
+            f"{segment.duration:.3f}",
+            "-i",
+            video_path,
+            "-an",
+            "-vf",
+            f"{transform}fps={self.fps},tpad=stop_mode=clone:stop=-1",
+            "-frames:v",
+            str(frames),
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgb24",
+            "-",
+        ]
+
+    def encode_cmd(
+        self,
+        layout: OutputLayout,
+        tts_path: str,
+        duration: float,
+        output_path: str,
+        background_music_path: str | None = None,
+    ) -> list[str]:
+        width, height = layout.crop_size
+        inputs = [
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgb24",
+            "-s",
+            f"{width}x{height}",
+            "-r",
+            str(self.fps),
+            "-i",
+            "-",
+            "-i",
+            tts_path,
+        ]
+        music_input = None
+        if background_music_path:
+            inputs += ["-i", background_music_path]
+            music_input = 2
+
+        filters = [self.audio_filter(1, music_input)]
+        video = "0:v"
+        if layout.scaled:
+            filters.append(f"[0:v]scale={layout.width}:{layout.height}[vout]")
+            video = "[vout]"
+
+        return [
+            ffmpeg_binary(),
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-y",
+            *inputs,
+            "-filter_complex",
+            ";".join(filters),
+            "-map",
+            video,
+            "-map",
+            "[aout]",
+            *self.output_args(duration, output_path),
+        ]
+
+    def mix_audio(
+        self, tts_path: str, duration: float, background_music_path: str | None
+    ) -> str:
+        """Mixes narration and music once into a wav every encoder reads."""
+        inputs = ["-i", tts_path]
+        if background_music_path:
+            inputs += ["-i", background_music_path]
+
+        path = os.path.join(self.cwd, "master__mix.wav")
+        run_ffmpeg(
+            [
+                *inputs,
+                "-filter_complex",
+                self.audio_filter(0, 1 if background_music_path else None),
+                "-map",
+                "[aout]",
+                "-t",
+                f"{duration:.3f}",
+                path,
+            ]
+        )
+        return path
+
+    def decode(
+        self,
+        video_paths: list[str],
+        segments: list[Segment],
+        total_frames: int,
+        pool: FramePool,
+        frames: queue.Queue,
+        stop: threading.Event,
+    ) -> None:
+        """Decodes every segment into pooled buffers, queued in output order,
+        a None marks the end. Errors are queued for the consumer to raise."""
+        try:
+            produced = 0
+            end = 0.0
+            for segment in segments:
+                end += segment.duration
+                count = min(round(end * self.fps), total_frames) - produced
+                if count <= 0:
+                    continue
+
+                cmd = self.decode_cmd(video_paths[segment.source], segment, count)
+                with subprocess.Popen(
+                    cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+                ) as proc:
+                    assert proc.stdout and proc.stderr
+                    for _ in range(count):
+                        if stop.is_set():
+                            proc.kill()
+                            return
+
+                        buffer = pool.acquire()
+                        if not read_frame(proc.stdout, buffer):
+                            pool.release(buffer)
+                            proc.kill()
+                            err = proc.stderr.read().decode(errors="ignore")
+                            raise RuntimeError(f"ffmpeg decode failed: {err}")
+                        frames.put(buffer)
+                        produced += 1
+                    proc.stdout.close()
+                    proc.stderr.close()
+
+            # the plan may fall a frame short of the narration after rounding
+            while produced < total_frames and not stop.is_set():
+                buffer = pool.acquire()
+                buffer[...] = 0
+                frames.put(buffer)
+                produced += 1
+        except Exception as e:
+            frames.put(e)
+        finally:
+            frames.put(None)
+
+    def run(
+        self,
+        video_paths: list[str],
+        segments: list[Segment],
+        compositors: list[FrameCompositor],
+        encode_cmds: list[list[str]],
+        duration: float,
+    ) -> int:
+        """Decodes, composites and encodes every frame, returns the peak bytes
+        of frame buffers in use."""
+        # a single format composites in the pooled buffer itself, several
+        # formats each composite a copy of their crop
+        crops = []
+        if len(compositors) > 1:
+            crops = [
+                np.empty((c.height, c.width, 3), dtype=np.uint8) for c in compositors
+            ]
+        crop_bytes = sum(crop.nbytes for crop in crops)
+        pool = FramePool(
+            (self.height, self.width, 3), self.config.frame_memory_budget - crop_bytes
+        )
+
+        total_frames = max(round(duration * self.fps), 1)
+        frames: queue.Queue = queue.Queue()
+        stop = threading.Event()
+        reader = threading.Thread(
+            target=self.decode,
+            args=(video_paths, segments, total_frames, pool, frames, stop),
+            daemon=True,
+        )
+
+        with ExitStack() as stack:
+            procs = []
+            for cmd in encode_cmds:
+                logger.debug(f"Running: {' '.join(cmd)}")
+                procs.append(
+                    stack.enter_context(
+                        subprocess.Popen(
+                            cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE
+                        )
+                    )
+                )
+
+            reader.start()
+            number = 0
+            item = None
+            try:
+                while (item := frames.get()) is not None:
+                    if isinstance(item, Exception):
+                        raise item
+
+                    t = number / self.fps
+                    if not crops:
+                        compositors[0](item, t)
+                        procs[0].stdin.write(memoryview(item).cast("B"))  # type: ignore
+                    for compositor, crop, proc in zip(compositors, crops, procs):
+                        x, y, width, height = compositor.layout.crop
+                        np.copyto(crop, item[y : y + height, x : x + width])
+                        compositor(crop, t)
+                        proc.stdin.write(memoryview(crop).cast("B"))  # type: ignore
+
+                    pool.release(item)
+                    item = None
+                    number += 1
+            except BrokenPipeError:
+                pass
+            finally:
+                stop.set()
+                if isinstance(item, np.ndarray):
+                    pool.release(item)
+                # unblock a reader waiting on a full pool
+                while not frames.empty():
+                    item = frames.get_nowait()
+                    if isinstance(item, np.ndarray):
+                        pool.release(item)
+                reader.join()
+                for proc in procs:
+                    proc.stdin.close()  # type: ignore
+            errors = [proc.stderr.read() for proc in procs]  # type: ignore
+
+        for proc, err in zip(procs, errors):
+            if proc.returncode != 0:
+                raise RuntimeError(f"ffmpeg failed: {err.decode(errors='ignore')}")
+        return pool.peak_bytes + crop_bytes
+
+    async def render_formats(
+        self,
+        video_paths: list[str],
+        tts_path: str,
+        subtitles: SubtitleTrack | str | None,
+        output_paths: list[str],
+        max_clip_duration: float = 3,
+        background_music_path: str | None = None,
+    ) -> list[str]:
+        """Renders every format in one pass, `output_paths` follow `formats`."""
+        if len(output_paths) != len(self.layouts):
+            raise ValueError(
+                f"{len(self.layouts)} formats but {len(output_paths)} output paths"
+            )
+
+        video_paths, segments, duration = await self.plan(
+            video_paths, tts_path, max_clip_duration
+        )
+        track = SubtitleTrack.coerce(subtitles) if subtitles else SubtitleTrack([])
+        compositors = [
+            FrameCompositor(layout, track, duration) for layout in self.layouts
+        ]
+
+        if len(self.layouts) > 1:
+            tts_path = await asyncio.to_thread(
+                self.mix_audio, tts_path, duration, background_music_path
+            )
+            background_music_path = None
+        encode_cmds = [
+            self.encode_cmd(layout, tts_path, duration, path, background_music_path)
+            for layout, path in zip(self.layouts, output_paths)
+        ]
+
+        logger.info(f"Rendering video from pooled frames: {', '.join(output_paths)}")
+        peak_bytes = await asyncio.to_thread(
+            self.run, video_paths, segments, compositors, encode_cmds, duration
+        )
+
+        record_frame_buffers(peak_bytes)
+        logger.info(f"Frame buffers: {peak_bytes / 1024 / 1024:.1f} MB at peak")
+        return output_paths
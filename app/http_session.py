@@ -0,0 +1,40 @@
+import asyncio
+from typing import Callable
+
+import aiohttp
+from loguru import logger
+
+
+class LoopSession:
+    """The aiohttp session of an API client, one per event loop.
+
+    Sessions are bound to the loop they were created on and streamlit
+    starts a new loop on every run, so a new session is made by `factory`
+    when the loop changes. The previous session is closed first rather than
+    left behind unclosed.
+    """
+
+    def __init__(self, factory: Callable[[], aiohttp.ClientSession]):
+        self.factory = factory
+        self._session: aiohttp.ClientSession | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def get(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            await self.close()
+            self._session = self.factory()
+            self._loop = loop
+        return self._session
+
+    async def close(self) -> None:
+        session, self._session, self._loop = self._session, None, None
+        if session is None or session.closed:
+            return
+
+        try:
+            await session.close()
+        except RuntimeError as e:
+            # connections of a loop that is already closed cannot be shut down
+            # gracefully, the session is still marked closed
+            logger.debug(f"Closed a session of a finished event loop: {e}")
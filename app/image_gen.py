@@ -1,27 +1,129 @@
-import re
-from httpx import request
+import asyncio
+import os
+from typing import Awaitable
+from urllib.parse import quote
+
 import httpx
 from loguru import logger
 
+from app.cache import CacheStore, images_cache
+from app.instrumentation import record_cache, span
 
-def to_snake_case(string):
-    string = (
-        re.sub(r"(?<=[a-z])(?=[A-Z])|[^a-zA-Z]", " ", string).strip().replace(" ", "_")
-    )
-    return "".join(string.lower())
 
+class ImageGenError(Exception):
+    pass
 
-async def generate_image(prompt: str) -> str:
-    url = "https://image.pollinations.ai/prompt"
-    url = f"{url}/{prompt}"
 
-    logger.debug(f"Generating image from prompt: {prompt}")
+class ImageGenerator:
+    """Generates images from prompts with a pollinations style text-to-image API.
+
+    `GET <base_url>/<prompt>?width=..&height=..` answers with the image.
+    Images are stored in a content-addressed cache keyed by the request, so
+    a prompt is only generated once per size. At most `max_concurrency`
+    requests are in flight; unset arguments are read from
+    IMAGE_GEN_BASE_URL and IMAGE_GEN_MAX_CONCURRENCY on first use.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        cache: CacheStore = images_cache,
+        max_concurrency: int | None = None,
+        timeout: float = 120,
+    ):
+        self.base_url = base_url
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.timeout = httpx.Timeout(timeout)
+
+    def url_for(self, prompt: str) -> str:
+        base_url = self.base_url or os.getenv(
+            "IMAGE_GEN_BASE_URL", "https://image.pollinations.ai/prompt"
+        )
+        return f"{base_url.rstrip('/')}/{quote(prompt, safe='')}"
+
+    async def generate(
+        self,
+        prompt: str,
+        width: int = 1080,
+        height: int = 1920,
+        client: httpx.AsyncClient | None = None,
+    ) -> str:
+        """Returns the cached image of `prompt`, generating it if needed."""
+        url = self.url_for(prompt)
+        params = {"width": str(width), "height": str(height), "nologo": "true"}
+        key = f"{url}?width={width}&height={height}"
+
+        with span("image_gen"):
+            cached = self.cache.get(key)
+            record_cache(cached is not None)
+            if cached:
+                logger.info(f"Found image in cache: {cached}")
+                return cached
+
+            logger.debug(f"Generating image from prompt: {prompt}")
+            if client is None:
+                async with httpx.AsyncClient(timeout=self.timeout) as client:
+                    return await self._download(client, url, params, key)
+            return await self._download(client, url, params, key)
+
+    async def _download(
+        self, client: httpx.AsyncClient, url: str, params: dict, key: str
+    ) -> str:
+        async with client.stream("GET", url, params=params) as response:
+            if response.status_code != 200:
+                raise ImageGenError(f"Image generation failed ({response.status_code})")
+
+            content_type = response.headers.get("content-type", "")
+            if not content_type.startswith("image/"):
+                raise ImageGenError(f"Not an image: {content_type}")
 
-    timeout = httpx.Timeout(30.0)
-    response = request("GET", url, timeout=timeout)
+            ext = "." + content_type.split("/")[1].split(";")[0].replace("jpeg", "jpg")
+            with self.cache.reserve(key, ext) as tmp_path:
+                with open(tmp_path, "wb") as f:
+                    async for chunk in response.aiter_bytes():
+                        f.write(chunk)
 
-    fname = to_snake_case(prompt) + ".jpg"
-    with open(fname, "wb") as f:
-        f.write(response.content)
+        return self.cache.path_for(key, ext)
 
-    return fname
+    async def generate_batch(
+        self,
+        prompts: list[str | Awaitable[str]],
+        width: int = 1080,
+        height: int = 1920,
+        max_concurrency: int | None = None,
+    ) -> list[str]:
+        """Generates all prompts over one connection pool, the paths follow `prompts`.
+
+        A prompt may still be in the making (an awaitable), its image is
+        requested as soon as it resolves. Repeated prompts are requested once.
+        """
+        limit = (
+            max_concurrency
+            or self.max_concurrency
+            or int(os.getenv("IMAGE_GEN_MAX_CONCURRENCY", 4))
+        )
+        semaphore = asyncio.Semaphore(limit)
+        tasks: dict[str, asyncio.Task] = {}
+
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+
+            async def limited(prompt: str) -> str:
+                async with semaphore:
+                    return await self.generate(prompt, width, height, client)
+
+            async def generate(prompt: str | Awaitable[str]) -> str:
+                if not isinstance(prompt, str):
+                    prompt = await prompt
+                if prompt not in tasks:
+                    tasks[prompt] = asyncio.create_task(limited(prompt))
+                return await tasks[prompt]
+
+            return list(await asyncio.gather(*(generate(p) for p in prompts)))
+
+
+default_generator = ImageGenerator()
+
+
+async def generate_image(prompt: str) -> str:
+    return await default_generator.generate(prompt)
@@ -0,0 +1,173 @@
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Literal
+
+from pydantic import BaseModel
+
+
+class Span(BaseModel):
+    name: str
+    labels: dict[str, str] = {}
+    started_at: float = 0.0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    """ cpu time of this process plus finished child processes (ffmpeg) """
+
+    peak_rss_bytes: int = 0
+    """ high-water mark of the process when the span ended """
+
+    read_bytes: int = 0
+    write_bytes: int = 0
+    cache: Literal["hit", "miss"] | None = None
+    frame_buffer_bytes: int = 0
+    """ peak bytes of pooled frame buffers in use during the span """
+
+
+def _cpu_seconds() -> float:
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def _peak_rss_bytes() -> int:
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # linux reports kilobytes, macos bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _io_bytes() -> tuple[int, int]:
+    """Bytes read and written by this process through read()/write() calls."""
+    try:
+        with open(f"/proc/{os.getpid()}/io") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+class StageProfiler:
+    """Collects per-stage spans of a render.
+
+    Counters other than wall time are process wide, spans that run
+    concurrently (e.g. the TTS calls of one batch) overlap in cpu and io.
+    """
+
+    def __init__(self):
+        self.spans: list[Span] = []
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[Span]:
+        span = Span(
+            name=name,
+            labels={k: str(v) for k, v in labels.items()},
+            started_at=time.time(),
+        )
+        wall = time.perf_counter()
+        cpu = _cpu_seconds()
+        read, written = _io_bytes()
+
+        token = current_span.set(span)
+        try:
+            yield span
+        finally:
+            current_span.reset(token)
+            span.wall_seconds = time.perf_counter() - wall
+            span.cpu_seconds = _cpu_seconds() - cpu
+            span.peak_rss_bytes = _peak_rss_bytes()
+            read_end, written_end = _io_bytes()
+            span.read_bytes = read_end - read
+            span.write_bytes = written_end - written
+            self.spans.append(span)
+
+    def stage_totals(self) -> dict[str, float]:
+        """Wall seconds summed per stage name."""
+        totals: dict[str, float] = {}
+        for span in self.spans:
+            totals[span.name] = round(totals.get(span.name, 0) + span.wall_seconds, 3)
+        return totals
+
+    def report(self) -> dict:
+        return {
+            "stages": self.stage_totals(),
+            "spans": [span.model_dump() for span in self.spans],
+        }
+
+    def save_json(self, path: str) -> str:
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition of every span, labelled by stage."""
+        metrics = {
+            "wall_seconds": "Wall clock time spent in the stage",
+            "cpu_seconds": "CPU time of the process and its finished children",
+            "peak_rss_bytes": "Process peak resident set size at the end of the stage",
+            "read_bytes": "Bytes read by the process during the stage",
+            "write_bytes": "Bytes written by the process during the stage",
+            "frame_buffer_bytes": "Peak bytes of pooled frame buffers in use",
+        }
+        lines = []
+        for metric, help_text in metrics.items():
+            name = f"reels_stage_{metric}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for index, span in enumerate(self.spans):
+                labels = {"stage": span.name, "span": str(index), **span.labels}
+                if span.cache:
+                    labels["cache"] = span.cache
+                lines.append(
+                    f"{name}{{{_format_labels(labels)}}} {getattr(span, metric)}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def save_prometheus(self, path: str) -> str:
+        with open(path, "w") as f:
+            f.write(self.to_prometheus())
+        return path
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return ",".join(f'{key}="{escape(value)}"' for key, value in labels.items())
+
+
+current_profiler: ContextVar[StageProfiler | None] = ContextVar(
+    "current_profiler", default=None
+)
+current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+@contextmanager
+def span(name: str, **labels) -> Iterator[Span | None]:
+    """Records a span on the profiler of the current render, if there is one."""
+    profiler = current_profiler.get()
+    if profiler is None:
+        yield None
+        return
+
+    with profiler.span(name, **labels) as s:
+        yield s
+
+
+def record_cache(hit: bool) -> None:
+    """Marks the innermost active span as a cache hit or miss."""
+    s = current_span.get()
+    if s is not None:
+        s.cache = "hit" if hit else "miss"
+
+
+def record_frame_buffers(nbytes: int) -> None:
+    """Records the peak frame buffer usage on the innermost active span."""
+    s = current_span.get()
+    if s is not None:
+        s.frame_buffer_bytes = max(s.frame_buffer_bytes, nbytes)
@@ -0,0 +1,301 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Iterator, Literal
+
+from loguru import logger
+from pydantic import BaseModel
+
+JOB_STATE = Literal["queued", "running", "done", "failed"]
+
+jobs_db_path = os.getenv("JOBS_DB_PATH", os.path.join(os.getcwd(), "cache/jobs.db"))
+
+
+class Job(BaseModel):
+    id: str
+    state: JOB_STATE
+    config: str
+    """ the ReelsMakerConfig as json """
+
+    attempts: int = 0
+    worker: str | None = None
+    result: str | None = None
+    """ path to the final video once done """
+
+    error: str | None = None
+    created_at: float
+    updated_at: float
+
+
+class JobQueue:
+    """Durable render queue in a local SQLite file.
+
+    Jobs move through queued -> running -> done | failed. Running jobs are
+    leased: the worker heartbeats while rendering, and a job whose lease
+    expired (its worker crashed or was killed) is queued again until it
+    has been attempted `max_attempts` times. A lease is the claiming worker
+    and attempt, a worker that lost its lease can no longer update the job.
+    """
+
+    def __init__(
+        self,
+        path: str = jobs_db_path,
+        max_attempts: int = 3,
+        lease_timeout: float = 60,
+    ):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lease_timeout = lease_timeout
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self.connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    config TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    result TEXT,
+                    error TEXT,
+                    heartbeat REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at)"
+            )
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        # connections are cheap and must not be shared between processes
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, config_json: str) -> str:
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, state, config, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, config_json, now, now),
+            )
+        logger.debug(f"Enqueued job: {job_id}")
+        return job_id
+
+    def get(self, job_id: str) -> Job | None:
+        with self.connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.model_validate(dict(row)) if row else None
+
+    def position(self, job_id: str) -> int:
+        """Number of queued jobs ahead of `job_id`."""
+        with self.connect() as conn:
+            row = conn.execute(
+                """
+                SELECT COUNT(*) FROM jobs
+                WHERE state = 'queued'
+                AND created_at < (SELECT created_at FROM jobs WHERE id = ?)
+                """,
+                (job_id,),
+            ).fetchone()
+        return row[0]
+
+    def requeue_expired(self, conn: sqlite3.Connection) -> None:
+        now = time.time()
+        expired = now - self.lease_timeout
+        conn.execute(
+            """
+            UPDATE jobs SET state = 'failed', error = 'worker lost too many times', updated_at = ?
+            WHERE state = 'running' AND heartbeat < ? AND attempts >= ?
+            """,
+            (now, expired, self.max_attempts),
+        )
+        conn.execute(
+            """
+            UPDATE jobs SET state = 'queued', worker = NULL, updated_at = ?
+            WHERE state = 'running' AND heartbeat < ?
+            """,
+            (now, expired),
+        )
+
+    def claim(self, worker: str) -> Job | None:
+        with self.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.requeue_expired(conn)
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE state = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row:
+                    now = time.time()
+                    conn.execute(
+                        """
+                        UPDATE jobs SET state = 'running', worker = ?, attempts = attempts + 1,
+                        heartbeat = ?, updated_at = ? WHERE id = ?
+                        """,
+                        (worker, now, now, row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        return self.get(row["id"]) if row else None
+
+    def update_leased(self, job: Job, assignments: str, values: tuple) -> bool:
+        """Updates a running job only while `job`'s lease still holds, returns
+        False when the job was requeued or claimed by another worker since."""
+        with self.connect() as conn:
+            cursor = conn.execute(
+                f"""
+                UPDATE jobs SET {assignments}
+                WHERE id = ? AND state = 'running' AND worker = ? AND attempts = ?
+                """,
+                (*values, job.id, job.worker, job.attempts),
+            )
+        if not cursor.rowcount:
+            logger.warning(f"Lost the lease of job {job.id} (attempt {job.attempts})")
+        return cursor.rowcount > 0
+
+    def heartbeat(self, job: Job) -> bool:
+        return self.update_leased(job, "heartbeat = ?", (time.time(),))
+
+    def complete(self, job: Job, result: str) -> bool:
+        return self.update_leased(
+            job, "state = 'done', result = ?, updated_at = ?", (result, time.time())
+        )
+
+    def fail(self, job: Job, error: str) -> bool:
+        return self.update_leased(
+            job, "state = 'failed', error = ?, updated_at = ?", (error, time.time())
+        )
+
+
+def render_job(config_json: str) -> str:
+    """Renders a ReelsMakerConfig json, returns the final video path."""
+    from app.reels_maker import ReelsMaker, ReelsMakerConfig
+
+    config = ReelsMakerConfig.model_validate_json(config_json)
+    return asyncio.run(ReelsMaker(config).start())
+
+
+def run_job(
+    queue: JobQueue, job: Job, render: Callable[[str], str] = render_job
+) -> None:
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(queue.lease_timeout / 3):
+            queue.heartbeat(job)
+
+    heartbeat = threading.Thread(target=beat, daemon=True)
+    heartbeat.start()
+    try:
+        video_path = render(job.config)
+        if queue.complete(job, video_path):
+            logger.info(f"Job done: {job.id} -> {video_path}")
+    except Exception as e:
+        logger.exception(f"Job failed: {job.id}: {e}")
+        queue.fail(job, str(e))
+    finally:
+        stop.set()
+        heartbeat.join()
+
+
+def run_worker(path: str = jobs_db_path, poll_interval: float = 1.0) -> None:
+    queue = JobQueue(path)
+    worker = f"{os.uname().nodename}:{os.getpid()}"
+    logger.info(f"Worker started: {worker}")
+
+    while True:
+        job = queue.claim(worker)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+
+        logger.info(f"Worker {worker} picked job {job.id} (attempt {job.attempts})")
+        run_job(queue, job)
+
+
+class WorkerPool:
+    """Pool of worker processes draining a JobQueue.
+
+    `supervise` replaces workers that died, their jobs are picked up again
+    once the lease expires.
+    """
+
+    def __init__(self, workers: int, path: str = jobs_db_path):
+        self.workers = workers
+        self.path = path
+        self.processes: list[multiprocessing.Process] = []
+
+    def spawn(self) -> multiprocessing.Process:
+        # spawn: do not inherit the parent's event loop, threads or sqlite handles
+        ctx = multiprocessing.get_context("spawn")
+        process = ctx.Process(target=run_worker, args=(self.path,), daemon=True)
+        process.start()
+        return process
+
+    def start(self) -> "WorkerPool":
+        self.processes = [self.spawn() for _ in range(self.workers)]
+        return self
+
+    def restart_dead(self) -> int:
+        """Replaces every worker that is no longer alive, returns how many."""
+        restarted = 0
+        for index, process in enumerate(self.processes):
+            if not process.is_alive():
+                logger.warning(
+                    f"Worker {process.pid} exited with {process.exitcode}, restarting"
+                )
+                process.close()
+                self.processes[index] = self.spawn()
+                restarted += 1
+        return restarted
+
+    def supervise(self, interval: float = 5.0) -> None:
+        """Keeps the pool at full size until interrupted."""
+        while True:
+            self.restart_dead()
+            time.sleep(interval)
+
+    def stop(self) -> None:
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        self.processes = []
+
+
+def default_workers() -> int:
+    return int(os.getenv("REELS_WORKERS", max(multiprocessing.cpu_count() // 2, 1)))
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Run reels render workers")
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--db", default=jobs_db_path)
+    args = parser.parse_args()
+
+    pool = WorkerPool(args.workers, args.db).start()
+    try:
+        pool.supervise()
+    except KeyboardInterrupt:
+        pool.stop()
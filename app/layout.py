@@ -0,0 +1,45 @@
+from app.video_config import VideoGeneratorConfig
+
+
+def master_size(configs: list[VideoGeneratorConfig]) -> tuple[int, int]:
+    """The widest output by the tallest, a frame every format can be cut from."""
+    sizes = [config.output_size for config in configs]
+    return max(width for width, _ in sizes), max(height for _, height in sizes)
+
+
+class OutputLayout:
+    """Where one output format is cut from the shared master frame.
+
+    Background frames are decoded once at the master size. Each format
+    takes the largest centered crop of its own aspect ratio and scales it
+    to its output size, a format as wide or as tall as the master is a
+    plain crop.
+    """
+
+    def __init__(self, config: VideoGeneratorConfig, master: tuple[int, int]):
+        self.config = config
+        self.width, self.height = config.output_size
+
+        master_width, master_height = master
+        scale = min(master_width / self.width, master_height / self.height)
+        width = min(round(self.width * scale / 2) * 2, master_width)
+        height = min(round(self.height * scale / 2) * 2, master_height)
+        self.crop = (
+            (master_width - width) // 2,
+            (master_height - height) // 2,
+            width,
+            height,
+        )
+
+    @property
+    def slug(self) -> str:
+        return self.config.aspect_ratio.replace(":", "x")
+
+    @property
+    def crop_size(self) -> tuple[int, int]:
+        return self.crop[2], self.crop[3]
+
+    @property
+    def scaled(self) -> bool:
+        """Whether the crop is resized to the output size."""
+        return self.crop_size != (self.width, self.height)
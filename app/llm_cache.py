@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+from loguru import logger
+
+llm_cache_path = os.getenv(
+    "LLM_CACHE_PATH", os.path.join(os.getcwd(), "cache/llm_cache.db")
+)
+
+
+class LLMCache(BaseCache):
+    """LangChain cache of model generations in a WAL SQLite file.
+
+    Entries older than `ttl` seconds are ignored and removed on lookup. Each
+    thread keeps its own connection, so concurrent jobs only serialize on
+    writes.
+    """
+
+    def __init__(self, path: str = llm_cache_path, ttl: float | None = None):
+        self.path = path
+        self.ttl = (
+            ttl
+            if ttl is not None
+            else float(os.getenv("LLM_CACHE_TTL", 30 * 24 * 60 * 60))
+        )
+        self._local = threading.local()
+
+    @property
+    def lock_dir(self) -> str:
+        """Lock files of the processes sharing this cache, next to the database."""
+        return os.path.join(os.path.dirname(os.path.abspath(self.path)), "llm_locks")
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS generations (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        key = self.key(prompt, llm_string)
+        row = self.db.execute(
+            "SELECT response, created_at FROM generations WHERE key = ?", (key,)
+        ).fetchone()
+        if not row:
+            return None
+
+        response, created_at = row
+        if time.time() - created_at > self.ttl:
+            self.db.execute("DELETE FROM generations WHERE key = ?", (key,))
+            return None
+
+        try:
+            return [loads(generation) for generation in json.loads(response)]
+        except Exception as e:
+            logger.warning(f"Dropping unreadable llm cache entry: {e}")
+            self.db.execute("DELETE FROM generations WHERE key = ?", (key,))
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        response = json.dumps([dumps(generation) for generation in return_val])
+        self.db.execute(
+            "INSERT OR REPLACE INTO generations (key, response, created_at) VALUES (?, ?, ?)",
+            (self.key(prompt, llm_string), response, time.time()),
+        )
+
+    def clear(self, **kwargs: Any) -> None:
+        self.db.execute("DELETE FROM generations")
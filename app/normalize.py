@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+
+from loguru import logger
+from pydantic import BaseModel
+
+from app.cache import CacheStore, videos_cache
+from app.utils import run_ffmpeg
+
+# bump when the filter chain below changes so old mezzanines are not reused
+NORMALIZE_VERSION = 1
+
+# same weights as moviepy's fx.blackwhite (plain average of r, g and b)
+BLACKWHITE = "colorchannelmixer=" + ":".join(["0.3333:0.3333:0.3333:0"] * 3)
+
+
+class NormalizeParams(BaseModel):
+    width: int = 1080
+    height: int = 1920
+    fps: int = 30
+    grayscale: bool = True
+    crf: int = 18
+    preset: str = "veryfast"
+
+
+_hash_memo: dict[tuple[str, int, float], str] = {}
+
+
+def content_hash(path: str) -> str:
+    """sha256 of the file content, memoized on (path, size, mtime)."""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    if memo_key in _hash_memo:
+        return _hash_memo[memo_key]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    _hash_memo[memo_key] = digest.hexdigest()
+    return _hash_memo[memo_key]
+
+
+def normalize_filter(params: NormalizeParams) -> str:
+    ratio = f"{params.width}/{params.height}"
+    filters = [
+        # center crop to the output aspect ratio
+        f"crop=w='min(iw,ih*{ratio})':h='min(ih,iw/({ratio}))'",
+        f"scale={params.width}:{params.height}",
+        "setsar=1",
+        f"fps={params.fps}",
+    ]
+    if params.grayscale:
+        filters.append(BLACKWHITE)
+    return ",".join(filters)
+
+
+def normalize_source(
+    video_path: str,
+    params: NormalizeParams = NormalizeParams(),
+    cache: CacheStore = videos_cache,
+) -> str:
+    """Transcodes `video_path` once into a mezzanine file with the portrait crop,
+    size, frame rate and colour already applied.
+
+    The result is cached under the source content hash and the transform
+    parameters, so later jobs read pre-normalized frames.
+    """
+    key = json.dumps(
+        {
+            "normalize": NORMALIZE_VERSION,
+            "source": content_hash(video_path),
+            **params.model_dump(),
+        },
+        sort_keys=True,
+    )
+
+    cached = cache.get(key)
+    if cached:
+        logger.debug(f"Found normalized source in cache: {video_path} -> {cached}")
+        return cached
+
+    logger.info(f"Normalizing source: {video_path}")
+    with cache.reserve(key, ".mp4") as tmp_path:
+        run_ffmpeg(
+            [
+                "-i",
+                video_path,
+                "-an",
+                "-vf",
+                normalize_filter(params),
+                "-c:v",
+                "libx264",
+                "-preset",
+                params.preset,
+                "-crf",
+                str(params.crf),
+                "-pix_fmt",
+                "yuv420p",
+                "-f",
+                "mp4",
+                tmp_path,
+            ]
+        )
+
+    return cache.path_for(key, ".mp4")
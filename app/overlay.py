@@ -0,0 +1,169 @@
+import numpy as np
+from loguru import logger
+from PIL import Image
+
+from app.subtitle_raster import parse_color
+from app.video_config import VideoGeneratorConfig
+
+
+def overlay_offset(position: str, size: int, extent: int) -> int:
+    """Pixel offset of a moviepy style "left"/"center"/"right" or numeric position."""
+    if position in ("left", "top"):
+        return 0
+    if position == "center":
+        return (size - extent) // 2
+    if position in ("right", "bottom"):
+        return size - extent
+    return int(float(position))
+
+
+def inverse_alpha(alpha: np.ndarray) -> np.ndarray:
+    """256 * (1 - alpha) for 0..255 alpha, the 8-bit fixed point blend weight."""
+    return ((255 - alpha.astype(np.uint16)) * 256 + 127) // 255
+
+
+def premultiply(rgba: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Premultiplied colour and inverse alpha of a straight alpha uint8 image."""
+    alpha = rgba[..., 3:].astype(np.uint16)
+    color = (rgba[..., :3] * alpha + 127) // 255
+    return color, inverse_alpha(alpha)
+
+
+def blend_premultiplied(
+    frame: np.ndarray, x: int, y: int, color: np.ndarray, inverse: np.ndarray
+) -> None:
+    """Blends a premultiplied image over `frame` at x, y in place, clipped
+    to the frame. Only the covered region is touched, in 16-bit fixed point."""
+    h, w = inverse.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, frame.shape[1]), min(y + h, frame.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return
+
+    region = frame[y0:y1, x0:x1]
+    blended = region * inverse[y0 - y : y1 - y, x0 - x : x1 - x]
+    blended >>= 8
+    blended += color[y0 - y : y1 - y, x0 - x : x1 - x]
+    region[...] = blended
+
+
+class OverlayLayer:
+    """Static graphics pre-composited into one premultiplied RGBA layer.
+
+    Watermarks, logos and background boxes never change over the video, so
+    they are drawn once at output resolution and every frame pays for a
+    single in-place blend of the layer's bounding box, however many
+    graphics it holds.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        # colour is premultiplied by alpha, both 0..255
+        self.color = np.zeros((height, width, 3), dtype=np.uint8)
+        self.alpha = np.zeros((height, width), dtype=np.uint8)
+        self._blend_arrays: tuple | None = None
+
+    @classmethod
+    def from_config(
+        cls, config: VideoGeneratorConfig, size: tuple[int, int] | None = None
+    ) -> "OverlayLayer":
+        """The watermark and subtitle box of `config` at its output size, or
+        to scale on a `size` canvas that is resized to the output later."""
+        width, height = size or config.output_size
+        scale = height / config.output_size[1]
+
+        def scaled(value: float) -> int:
+            return max(round(config.render_profile.scaled(value) * scale), 1)
+
+        layer = cls(width, height)
+
+        box_color = parse_color(config.subtitles_box_color)
+        if box_color:
+            box_height = scaled(config.fontsize) * 2
+            _, vertical = config.subtitles_position.split(",")
+            y = overlay_offset(vertical, height, box_height)
+            layer.add_box(0, y, width, box_height, box_color)
+
+        if config.watermark_path:
+            logger.debug(f"added watermark: {config.watermark_path}")
+            layer.add_image(config.watermark_path, height=scaled(50), margin=scaled(8))
+        return layer
+
+    @property
+    def empty(self) -> bool:
+        return self.bbox is None
+
+    @property
+    def bbox(self) -> tuple[int, int, int, int] | None:
+        """(x0, y0, x1, y1) of the visible pixels, None when nothing is drawn."""
+        rows = np.flatnonzero(self.alpha.any(axis=1))
+        if not len(rows):
+            return None
+        cols = np.flatnonzero(self.alpha.any(axis=0))
+        return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+    def add(self, rgba: np.ndarray, x: int, y: int) -> None:
+        """Composites a straight alpha (h, w, 4) uint8 image over the layer at x, y."""
+        h, w = rgba.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, self.width), min(y + h, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        source = rgba[y0 - y : y1 - y, x0 - x : x1 - x].astype(np.float32) / 255
+        source_alpha = source[..., 3:]
+        keep = 1 - source_alpha
+
+        color = self.color[y0:y1, x0:x1]
+        alpha = self.alpha[y0:y1, x0:x1]
+        color[...] = np.rint(source[..., :3] * source_alpha * 255 + color * keep)
+        alpha[...] = np.rint(source_alpha[..., 0] * 255 + alpha * keep[..., 0])
+        self._blend_arrays = None
+
+    def add_box(
+        self, x: int, y: int, width: int, height: int, color: tuple[int, ...]
+    ) -> None:
+        """A filled rectangle, `color` is RGB or RGBA."""
+        rgba = np.empty((height, width, 4), dtype=np.uint8)
+        rgba[...] = color if len(color) == 4 else (*color, 255)
+        self.add(rgba, x, y)
+
+    def add_image(self, path: str, height: int, margin: int = 0) -> None:
+        """An image scaled to `height`, anchored to the bottom right corner."""
+        with Image.open(path) as image:
+            image = image.convert("RGBA")
+            width = max(round(image.width * height / image.height), 1)
+            image = image.resize((width, height), Image.LANCZOS)
+        self.add(
+            np.asarray(image),
+            self.width - width - margin,
+            self.height - height - margin,
+        )
+
+    def blend_arrays(self) -> tuple[int, int, np.ndarray, np.ndarray]:
+        """Offset, premultiplied colour and inverse alpha of the bounding box,
+        computed once for every frame."""
+        if self._blend_arrays is None:
+            x0, y0, x1, y1 = self.bbox or (0, 0, 0, 0)
+            alpha = self.alpha[y0:y1, x0:x1, None]
+            color = self.color[y0:y1, x0:x1].astype(np.uint16)
+            self._blend_arrays = (x0, y0, color, inverse_alpha(alpha))
+        return self._blend_arrays
+
+    def blend(self, frame: np.ndarray) -> np.ndarray:
+        """Blends the layer over an (height, width, 3) uint8 frame, in place."""
+        blend_premultiplied(frame, *self.blend_arrays())
+        return frame
+
+    def save_png(self, path: str) -> tuple[int, int]:
+        """Writes the bounding box with straight alpha, returns its x, y offset."""
+        x0, y0, x1, y1 = self.bbox or (0, 0, 1, 1)
+        alpha = self.alpha[y0:y1, x0:x1]
+        color = self.color[y0:y1, x0:x1].astype(np.uint16) * 255
+        color += alpha[..., None] // 2
+        color //= np.maximum(alpha, 1)[..., None]
+
+        rgba = np.dstack([np.minimum(color, 255).astype(np.uint8), alpha])
+        Image.fromarray(rgba, "RGBA").save(path)
+        return x0, y0
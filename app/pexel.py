@@ -1,18 +1,18 @@
+import asyncio
+import json
 import os
-from loguru import logger
-import requests
 
+import aiohttp
+from loguru import logger
 
-async def search_for_stock_videos(query: str, limit: int, min_dur: int) -> list[str]:
-    headers = {
-        "Authorization": os.getenv("PEXELS_API_KEY"),
-    }
+from app.cache import CacheStore, pexels_cache
+from app.http_session import LoopSession
+from app.instrumentation import record_cache, span
 
-    qurl = f"https://api.pexels.com/videos/search?query={query}&per_page={limit}"
+PEXELS_API_URL = "https://api.pexels.com"
 
-    r = requests.get(qurl, headers=headers)
-    response = r.json()
 
+def pick_video_urls(response: dict, limit: int, min_dur: int) -> list[str]:
     raw_urls = []
     video_urls = []
     video_res = 0
@@ -37,3 +37,109 @@ async def search_for_stock_videos(query: str, limit: int, min_dur: int) -> list[
         logger.error(f"Error Searching for video: {e}")
 
     return video_urls
+
+
+class PexelsClient:
+    """Async Pexels video search.
+
+    Responses are kept in a persistent cache keyed by (query, per_page) for
+    `cache_ttl` seconds, so popular search terms cost no API call on repeat jobs.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str = PEXELS_API_URL,
+        cache: CacheStore | None = pexels_cache,
+        cache_ttl: float | None = None,
+        pool_size: int = 16,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.cache = cache
+        self.cache_ttl = (
+            cache_ttl
+            if cache_ttl is not None
+            else float(os.getenv("PEXELS_CACHE_TTL", 7 * 24 * 60 * 60))
+        )
+        self.pool_size = pool_size
+
+        self.http = LoopSession(
+            lambda: aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=30),
+            )
+        )
+
+    async def session(self) -> aiohttp.ClientSession:
+        return await self.http.get()
+
+    async def close(self) -> None:
+        await self.http.close()
+
+    async def search(self, query: str, per_page: int) -> dict:
+        with span("pexels_query", query=query):
+            return await self._search(query, per_page)
+
+    async def _search(self, query: str, per_page: int) -> dict:
+        cache_key = json.dumps(["videos/search", query, per_page])
+        if self.cache:
+            cached = self.cache.get(cache_key, max_age=self.cache_ttl)
+            if cached:
+                logger.debug(f"Found pexels search in cache: {query}")
+                record_cache(True)
+                with open(cached, "rb") as f:
+                    return json.load(f)
+
+        record_cache(False)
+        session = await self.session()
+        headers = {"Authorization": self.api_key or os.getenv("PEXELS_API_KEY", "")}
+        async with session.get(
+            f"{self.base_url}/videos/search",
+            params={"query": query, "per_page": per_page},
+            headers=headers,
+        ) as r:
+            r.raise_for_status()
+            body = await r.read()
+
+        if self.cache:
+            self.cache.put_bytes(cache_key, body, ext=".json")
+
+        return json.loads(body)
+
+    async def search_for_stock_videos(
+        self, query: str, limit: int, min_dur: int
+    ) -> list[str]:
+        response = await self.search(query, per_page=limit)
+        return pick_video_urls(response, limit=limit, min_dur=min_dur)
+
+    async def search_many(
+        self, queries: list[str], limit: int, min_dur: int
+    ) -> list[list[str] | BaseException]:
+        """Runs all searches concurrently, failed searches are returned as exceptions."""
+        return await asyncio.gather(
+            *(self.search_for_stock_videos(q, limit, min_dur) for q in queries),
+            return_exceptions=True,
+        )
+
+    async def first_video_urls(self, search_terms: list[str]) -> list[str]:
+        """Searches all terms concurrently and returns the first url found for each."""
+        results = await self.search_many(search_terms, limit=2, min_dur=10)
+
+        urls = []
+        for search_term, result in zip(search_terms, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Consistency Violation: {search_term}: {result}")
+                continue
+            if result:
+                urls.append(result[0])
+        return urls
+
+
+default_client = PexelsClient()
+
+
+async def search_for_stock_videos(query: str, limit: int, min_dur: int) -> list[str]:
+    return await default_client.search_for_stock_videos(
+        query=query, limit=limit, min_dur=min_dur
+    )
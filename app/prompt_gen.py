@@ -1,13 +1,25 @@
-from langchain.cache import SQLiteCache
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+
 from langchain.output_parsers import PydanticOutputParser
 from langchain.prompts import ChatPromptTemplate
-from langchain_core.globals import set_llm_cache
+from langchain_core.language_models import BaseChatModel
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable
 from langchain_openai import ChatOpenAI
 from loguru import logger
 from pydantic import BaseModel, Field
 
-set_llm_cache(SQLiteCache(database_path=".llm_cache.db"))
+from app.llm_cache import LLMCache
+
+# identical requests of every PromptGenerator in this process share one call
+_inflight: dict[str, asyncio.Task] = {}
+
+# requests are striped over a fixed set of lock files shared between processes
+LOCK_STRIPES = 256
 
 
 class HashtagsSchema(BaseModel):
@@ -16,9 +28,85 @@ class HashtagsSchema(BaseModel):
     hashtags: list[str] = Field(description="List of hashtags for the sentence")
 
 
+class ScriptSchema(BaseModel):
+    """the script and hashtags response"""
+
+    script: str = Field(description="The motivational narration, short and concise")
+    hashtags: list[str] = Field(
+        description="List of pexels.com hashtags to find background videos for the script"
+    )
+
+
 class PromptGenerator:
-    def __init__(self):
-        self.model = ChatOpenAI(model="gpt-4o-mini")
+    def __init__(
+        self,
+        model: BaseChatModel | None = None,
+        max_concurrency: int = 4,
+        lock_dir: str | None = None,
+    ):
+        """`model` defaults to gpt-4o-mini cached in the shared LLMCache, tests pass a fake.
+
+        Cross-process locks live next to the model's LLMCache unless `lock_dir` is given.
+        """
+        self.model = model or ChatOpenAI(model="gpt-4o-mini", cache=LLMCache())
+        self.max_concurrency = max_concurrency
+        cache = self.model.cache
+        self.lock_dir = (
+            lock_dir or (cache if isinstance(cache, LLMCache) else LLMCache()).lock_dir
+        )
+
+    async def invoke(self, chain: Runnable, inputs: dict, name: str):
+        """Runs `chain`, joining an identical request that is already in flight.
+
+        Within a process the request is awaited once, across processes a lock
+        makes the later job wait and then read the answer from the llm cache.
+        """
+        key = json.dumps([name, inputs, self.model.dict()], sort_keys=True, default=str)
+
+        task = _inflight.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.create_task(self.invoke_locked(chain, inputs, key))
+            _inflight[key] = task
+            task.add_done_callback(lambda t: _forget(key, t))
+        else:
+            logger.debug(f"Joining in-flight llm request: {name}")
+
+        return await asyncio.shield(task)
+
+    async def invoke_locked(self, chain: Runnable, inputs: dict, key: str):
+        stripe = int(hashlib.sha256(key.encode("utf-8")).hexdigest(), 16) % LOCK_STRIPES
+        os.makedirs(self.lock_dir, exist_ok=True)
+
+        with open(os.path.join(self.lock_dir, f"{stripe}.lock"), "w") as lock:
+            await asyncio.to_thread(fcntl.flock, lock.fileno(), fcntl.LOCK_EX)
+            try:
+                return await chain.ainvoke(inputs)
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    async def generate_script(self, sentence: str) -> ScriptSchema:
+        """generates the narration and its hashtags from a prompt in one call"""
+
+        system_template = """
+You are a motivational reels narrator, you must generate a motivational quote in a narrative format for the sentence below, and your response must be short and conscience.
+Also generate pexels.com hashtags keywords for the quote, the hashtags must be short and concise and will be used to query the api:
+
+{format_instructions}
+
+[(sentence)]:
+{sentence}
+ """
+
+        parser = PydanticOutputParser(pydantic_object=ScriptSchema)
+        prompt = ChatPromptTemplate.from_messages(
+            messages=[("system", system_template), ("user", "{sentence}")]
+        )
+        prompt = prompt.partial(format_instructions=parser.get_format_instructions())
+
+        chain = prompt | self.model | parser
+
+        logger.debug(f"Generating script and hashtags from prompt: {sentence}")
+        return await self.invoke(chain, {"sentence": sentence}, "generate_script")
 
     async def generate_sentence(self, sentence: str) -> str:
         """generates a sentence from a prompt"""
@@ -35,7 +123,7 @@ You are a motivational reels narrator, you must generate a motivational quote in
         chain = prompt | self.model | StrOutputParser()
 
         logger.debug(f"Generating sentence from prompt: {sentence}")
-        return await chain.ainvoke({"sentence": sentence})
+        return await self.invoke(chain, {"sentence": sentence}, "generate_sentence")
 
     async def generate_hashtags(self, sentence: str) -> HashtagsSchema:
         """generates hashtags from a sentence"""
@@ -58,7 +146,7 @@ generate pexels.com hashtags keywords for the sentence below, the hashtags must
         chain = prompt | self.model | parser
 
         logger.debug(f"Generating sentence from prompt: {sentence}")
-        return await chain.ainvoke({"sentence": sentence})
+        return await self.invoke(chain, {"sentence": sentence}, "generate_hashtags")
 
     async def sentence_to_image_prompt(self, sentence: str) -> str:
         """generates an image prompt from a sentence"""
@@ -73,4 +161,28 @@ You are an AI image prompt generator, I will give you a sentence and you must ge
         chain = prompt | self.model | StrOutputParser()
 
         logger.debug(f"Generating sentence from prompt: {sentence}")
-        return await chain.ainvoke({"sentence": sentence})
+        return await self.invoke(
+            chain, {"sentence": sentence}, "sentence_to_image_prompt"
+        )
+
+    async def sentences_to_image_prompts(
+        self, sentences: list[str], max_concurrency: int | None = None
+    ) -> list[str]:
+        """Image prompts for all sentences, at most `max_concurrency` requests at a time.
+
+        Repeated sentences are requested once, the result follows the order of `sentences`.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+        prompts: dict[str, str] = {}
+
+        async def generate(sentence: str):
+            async with semaphore:
+                prompts[sentence] = await self.sentence_to_image_prompt(sentence)
+
+        await asyncio.gather(*(generate(s) for s in dict.fromkeys(sentences)))
+        return [prompts[sentence] for sentence in sentences]
+
+
+def _forget(key: str, task: asyncio.Task) -> None:
+    if _inflight.get(key) is task:
+        del _inflight[key]
@@ -1,34 +1,44 @@
 import asyncio
+import functools
 import multiprocessing
 import os
-import shutil
+from typing import TYPE_CHECKING, Literal
 
-import aiohttp
-import moviepy.config as moviepy_config
 from dotenv import load_dotenv
 from loguru import logger
-from moviepy.audio.AudioClip import concatenate_audioclips
-from moviepy.audio.io.AudioFileClip import AudioFileClip
-from moviepy.editor import VideoFileClip
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from typing_extensions import cast
 
-from app.config import videos_cache_path
-from app.prompt_gen import PromptGenerator
+from app import pexel
+from app.cache import videos_cache
+from app.checkpoint import Checkpoints, file_hash, stage_key
+from app.config import ensure_caches
+from app.downloader import default_downloader
+from app.instrumentation import StageProfiler, current_profiler, record_cache, span
+from app.layout import master_size
 from app.subtitle_gen import SubtitleGenerator
+from app.subtitle_track import SubtitleTrack
 from app.synth_gen import SynthConfig, SynthGenerator
-from app.utils import split_by_dot_or_newline
-from app.utils import search_file
-from app.video_gen import VideoGenerator, VideoGeneratorConfig
+from app.utils import link_or_copy, split_by_dot_or_newline
+from app.video_config import OutputFormat, VideoGeneratorConfig
 
-load_dotenv()
+# moviepy, numpy and langchain are imported on first use, so importing this
+# module (the streamlit app, every spawned worker) stays cheap
+if TYPE_CHECKING:
+    import numpy as np
 
-magickpath = os.path.join(os.getcwd(), "bin", "magick")
+    from app.audio_assembly import AudioAssembler
+    from app.image_gen import ImageGenerator
+    from app.prompt_gen import PromptGenerator
+    from app.video_gen import VideoGenerator
 
-os.environ["IMAGEMAGICK_BINARY"] = magickpath
-moviepy_config.IMAGEMAGICK_BINARY = magickpath
 
-moviepy_config.check()
+@functools.cache
+def setup_environment() -> None:
+    """Loads .env and prepares the process for rendering, runs once per process."""
+    load_dotenv()
+    os.environ["IMAGEMAGICK_BINARY"] = os.path.join(os.getcwd(), "bin", "magick")
+    ensure_caches()
 
 
 class ReelsMakerConfig(BaseModel):
@@ -42,31 +52,82 @@ class ReelsMakerConfig(BaseModel):
     background_audio_url: str | None = None
     background_music_path: str | None = None
 
+    sentence_gap: float = 0.0
+    """ seconds of silence between two narrated sentences """
+
     video_paths: list[str] = []
 
+    background: Literal["videos", "images"] = "videos"
+    """ stock videos from pexels, or a pan/zoom slideshow of one ai image per sentence """
+
     video_gen_config: VideoGeneratorConfig = VideoGeneratorConfig()
     """ config for the video generator """
 
+    formats: list[OutputFormat] = []
+    """ e.g. ["9:16", "1:1", "16:9"], all rendered in one pass, the first is the main video """
+
     synth_config: SynthConfig = SynthConfig()
     """ config for the synthesizer """
 
+    checkpoints: bool = True
+    """ reuse stage outputs of earlier renders whose inputs were identical """
+
+    @model_validator(mode="after")
+    def check_formats(self) -> "ReelsMakerConfig":
+        if len(self.formats) > 1 and self.video_gen_config.backend == "moviepy":
+            raise ValueError("Several formats need the ffmpeg or frames backend")
+        return self
+
 
 class ReelsMaker:
-    def __init__(self, config: ReelsMakerConfig):
+    def __init__(
+        self,
+        config: ReelsMakerConfig,
+        prompt_generator: "PromptGenerator | None" = None,
+        synth_generator: SynthGenerator | None = None,
+        pexels_client: pexel.PexelsClient | None = None,
+        image_generator: "ImageGenerator | None" = None,
+    ):
+        """The providers default to the real ones, benchmarks and tests pass fakes."""
+        setup_environment()
         self.config = config
 
         self.cwd = config.cwd
         self.subtitle_generator = SubtitleGenerator(cwd=self.cwd)
 
-        self.video_generator = VideoGenerator(self.cwd, config.video_gen_config)
-        self.syth_generator = SynthGenerator(self.cwd, config.synth_config)
-        self.prompt_generator = PromptGenerator()
+        self.pexels_client = pexels_client or pexel.default_client
+        self.syth_generator = synth_generator or SynthGenerator(
+            self.cwd, config.synth_config
+        )
+        if prompt_generator:
+            self.prompt_generator = prompt_generator
+        if image_generator:
+            self.image_generator = image_generator
 
         self.sentences: list[str] = []
+        # set when the script came from the prompt together with its hashtags
+        self.hashtags: list[str] | None = None
 
         self.audio_paths = []
-        self.audio_clip_paths = []
+        self.audio_durations: list[float] = []
+        self.audio_duration = 0.0
         self.final_audio_path = ""
+        self.final_video_path = os.path.join(self.cwd, "master__final__video.mp4")
+        # the first format is the main video, the others are named by aspect ratio
+        self.final_video_paths = [self.final_video_path] + [
+            os.path.join(
+                self.cwd,
+                f"master__final__video__{c.aspect_ratio.replace(':', 'x')}.mp4",
+            )
+            for c in self.format_configs[1:]
+        ]
+
+        self.profiler = StageProfiler()
+        self.checkpoints = Checkpoints(enabled=config.checkpoints)
+        # normalized mezzanines of the background sources
+        self.videos_cache = videos_cache
+        self.downloader = default_downloader
+        self.stage_keys: dict[str, str] = {}
 
         # Set from client
         self.threads: int = multiprocessing.cpu_count()
@@ -74,35 +135,74 @@ class ReelsMaker:
 
         logger.info(f"Starting Reels Maker with: {self.config.model_dump()}")
 
+    @functools.cached_property
+    def prompt_generator(self) -> "PromptGenerator":
+        from app.prompt_gen import PromptGenerator
+
+        return PromptGenerator()
+
+    @functools.cached_property
+    def image_generator(self) -> "ImageGenerator":
+        from app.image_gen import default_generator
+
+        return default_generator
+
+    @functools.cached_property
+    def format_configs(self) -> list[VideoGeneratorConfig]:
+        """The video config of every output format."""
+        video_gen_config = self.config.video_gen_config
+        return [f.apply(video_gen_config) for f in self.config.formats] or [
+            video_gen_config
+        ]
+
+    @functools.cached_property
+    def video_generator(self) -> "VideoGenerator":
+        from app.video_gen import VideoGenerator
+
+        return VideoGenerator(
+            self.cwd,
+            self.format_configs[0],
+            videos_cache=self.videos_cache,
+        )
+
     async def download_resource(self, url) -> str:
         filename = os.path.basename(url)
         file_path = os.path.join(self.cwd, filename)
-        file_cache_path = search_file(videos_cache_path, filename)
-        if file_cache_path:
-            shutil.copy2(file_cache_path, file_path)
-            logger.info(f"Found resource in cache: {file_cache_path}")
-            return file_path
-
-        async with aiohttp.ClientSession() as session:
-            logger.info(f"Downloading resource from: {url}")
-            async with session.get(url) as response:
-                with open(file_path, "wb") as f:
-                    f.write(await response.read())
-                    logger.debug(f"Downloaded resource from: {url}")
-
-                    # save to cache audios
-                    shutil.copy2(file_path, videos_cache_path)
-                    return os.path.join(self.cwd, os.path.basename(url))
+
+        with span("download", file=filename):
+            cache_path = await self.downloader.fetch(
+                url, ext=os.path.splitext(filename)[1]
+            )
+        return link_or_copy(cache_path, file_path)
 
     async def generate_script(self, sentence: str):
+        """Generates the script and its hashtags in a single llm call."""
         logger.debug(f"Generating script from prompt: {sentence}")
-        sentence = await self.prompt_generator.generate_sentence(sentence)
-        return sentence.replace('"', "")
+        key = stage_key("script_hashtags", prompt=sentence)
+        with span("script"):
+            response = self.checkpoints.load_json(key)
+            record_cache(response is not None)
+            if response is None:
+                result = await self.prompt_generator.generate_script(sentence)
+                response = result.model_dump()
+                self.checkpoints.save_json(key, response)
+
+        self.hashtags = response["hashtags"]
+        return response["script"].replace('"', "")
 
     async def generate_search_terms(self, script, max_hashtags: int = 5):
         logger.debug("Generating search terms for script...")
-        response = await self.prompt_generator.generate_hashtags(script)
-        tags = [tag.replace("#", "") for tag in response.hashtags]
+        hashtags = self.hashtags
+        if hashtags is None:
+            key = stage_key("hashtags", script=script)
+            with span("hashtags"):
+                hashtags = self.checkpoints.load_json(key)
+                record_cache(hashtags is not None)
+                if hashtags is None:
+                    response = await self.prompt_generator.generate_hashtags(script)
+                    hashtags = response.hashtags
+                    self.checkpoints.save_json(key, hashtags)
+        tags = [tag.replace("#", "") for tag in hashtags]
         if len(tags) > max_hashtags:
             logger.warning(f"Truncated search terms to {max_hashtags} tags")
             tags = tags[:max_hashtags]
@@ -113,14 +213,194 @@ class ReelsMaker:
     async def synth_text(self, text: str) -> str:
         return await self.syth_generator.generate_audio(text)
 
-    async def generate_subtitles(self) -> str:
-        return await self.subtitle_generator.generate_subtitles(
+    async def generate_images(self) -> list[str]:
+        """One ai image per sentence.
+
+        Each image is requested as soon as its prompt is ready, prompts and
+        images are bounded by the concurrency of their generators.
+        """
+        # one image covers every output format
+        width, height = master_size(self.format_configs)
+        semaphore = asyncio.Semaphore(self.prompt_generator.max_concurrency)
+
+        async def image_prompt(sentence: str) -> str:
+            async with semaphore:
+                return await self.prompt_generator.sentence_to_image_prompt(sentence)
+
+        return await self.image_generator.generate_batch(
+            [image_prompt(sentence) for sentence in self.sentences],
+            width=width,
+            height=height,
+        )
+
+    async def render_slideshow(self, image_paths: list[str]) -> str:
+        """Pans and zooms over the images, each one shown while its sentence is narrated."""
+        from app.slideshow import Slideshow
+
+        video_gen_config = self.config.video_gen_config
+        profile = video_gen_config.render_profile
+        # a near lossless mezzanine, the background is encoded again at the end
+        profile = profile.model_copy(update={"crf": min(profile.crf, 16)})
+        width, height = master_size(self.format_configs)
+        durations = [
+            duration + (self.config.sentence_gap if index else 0)
+            for index, duration in enumerate(self.audio_durations)
+        ]
+        key = stage_key(
+            "slideshow",
+            images=[file_hash(path) for path in image_paths],
+            durations=durations,
+            profile=profile.model_dump(),
+            size=[width, height],
+        )
+
+        with span("slideshow", images=len(image_paths)):
+            slideshow_path = os.path.join(self.cwd, "slideshow.mp4")
+            if self.checkpoints.load_file(key, slideshow_path):
+                record_cache(True)
+                return slideshow_path
+
+            record_cache(False)
+            slideshow = await asyncio.to_thread(
+                Slideshow, image_paths, durations, width, height
+            )
+            await asyncio.to_thread(
+                slideshow.write, slideshow_path, profile, video_gen_config.threads
+            )
+            self.checkpoints.save_file(key, slideshow_path, ".mp4")
+            return slideshow_path
+
+    @functools.cached_property
+    def audio_assembler(self) -> "AudioAssembler":
+        from app.audio_assembly import AudioAssembler
+
+        return AudioAssembler()
+
+    async def synthesize_audio(self) -> dict[str, "np.ndarray"]:
+        """Synthesizes every sentence, streamed speech is decoded while it arrives.
+
+        Returns the PCM of the sentences that were decoded on the way, keyed
+        by their speech file.
+        """
+        streamed: dict[str, "np.ndarray"] = {}
+
+        async def decode(text: str, chunks) -> None:
+            streamed[text] = await self.audio_assembler.decode_stream(chunks)
+
+        self.audio_paths = await self.syth_generator.generate_audio_batch(
+            self.sentences, consumer=decode
+        )
+        return {
+            path: streamed[text]
+            for text, path in zip(self.sentences, self.audio_paths)
+            if text in streamed
+        }
+
+    async def assemble_audio(
+        self, decoded: dict[str, "np.ndarray"] | None = None
+    ) -> None:
+        """Decodes every TTS file once and joins them as PCM into the master wav."""
+        self.final_audio_path = os.path.join(self.cwd, "master__audio.wav")
+        assembler = self.audio_assembler
+        key = stage_key(
+            "audio",
+            speech=[file_hash(path) for path in self.audio_paths],
+            gap=self.config.sentence_gap,
+            sample_rate=assembler.sample_rate,
+            channels=assembler.channels,
+        )
+        timing_key = stage_key("audio_timing", audio=key)
+        self.stage_keys["audio"] = key
+
+        with span("audio_assembly"):
+            timing = self.checkpoints.load_json(timing_key)
+            if timing and self.checkpoints.load_file(key, self.final_audio_path):
+                record_cache(True)
+                self.audio_durations = timing["durations"]
+                self.audio_duration = timing["duration"]
+                return
+
+            record_cache(False)
+            master_audio, self.audio_durations = await asyncio.to_thread(
+                assembler.assemble, self.audio_paths, self.config.sentence_gap, decoded
+            )
+            self.audio_duration = len(master_audio) / assembler.sample_rate
+            assembler.write_wav(master_audio, self.final_audio_path)
+
+            self.checkpoints.save_file(key, self.final_audio_path, ".wav")
+            self.checkpoints.save_json(
+                timing_key,
+                {"durations": self.audio_durations, "duration": self.audio_duration},
+            )
+
+    async def generate_subtitles(self) -> SubtitleTrack:
+        """Builds the subtitle track in memory, the srt is written as an export."""
+        key = stage_key(
+            "subtitles",
             sentences=self.sentences,
-            final_audio_path=self.final_audio_path,
-            audio_clips=self.audio_clip_paths,
+            durations=self.audio_durations,
+            gap=self.config.sentence_gap,
+            max_chars=self.subtitle_generator.config.max_chars,
+        )
+        self.stage_keys["subtitles"] = key
+
+        with span("subtitles"):
+            subtitles_path = os.path.join(self.cwd, "subtitles", "master.srt")
+            os.makedirs(os.path.dirname(subtitles_path), exist_ok=True)
+            if self.checkpoints.load_file(key, subtitles_path):
+                record_cache(True)
+                return SubtitleTrack.load(subtitles_path)
+
+            record_cache(False)
+            track = self.subtitle_generator.build_track(
+                sentences=self.sentences,
+                durations=self.audio_durations,
+                gap=self.config.sentence_gap,
+            )
+            track.export(subtitles_path)
+            self.checkpoints.save_file(key, subtitles_path, ".srt")
+            return track
+
+    def render_config(self, config: VideoGeneratorConfig | None = None) -> dict:
+        """The video config fields that change the output pixels, files by content."""
+        config = (config or self.config.video_gen_config).model_dump(
+            exclude={"threads", "write_intermediates", "frame_memory_budget"}
+        )
+        config["font_path"] = file_hash(config["font_path"])
+        config["watermark_path"] = file_hash(config["watermark_path"])
+        return config
+
+    def final_key(self, video_paths: list[str], config: VideoGeneratorConfig) -> str:
+        """Key of one output format, formats are cached independently."""
+        return stage_key(
+            "final",
+            audio=self.stage_keys["audio"],
+            subtitles=self.stage_keys["subtitles"],
+            videos=[file_hash(path) for path in video_paths],
+            music=file_hash(self.background_music_path),
+            video=self.render_config(config),
         )
 
+    def save_report(self) -> None:
+        """Writes the stage spans next to the final video, as json and prometheus text."""
+        base = os.path.splitext(self.final_video_path)[0]
+        try:
+            self.profiler.save_json(f"{base}.report.json")
+            self.profiler.save_prometheus(f"{base}.prom")
+        except OSError as e:
+            logger.warning(f"Could not save render report: {e}")
+
+        logger.info(f"Render stages: {self.profiler.stage_totals()}")
+
     async def start(self) -> str:
+        token = current_profiler.set(self.profiler)
+        try:
+            return await self.run_stages()
+        finally:
+            current_profiler.reset(token)
+            self.save_report()
+
+    async def run_stages(self) -> str:
         if self.config.background_audio_url:
             self.background_music_path = await self.download_resource(
                 self.config.background_audio_url
@@ -142,29 +422,26 @@ class ReelsMaker:
         self.sentences = cast(list[str], sentences)
 
         video_paths = []
+        images_task = None
         if self.config.video_paths:
             logger.info("Using video paths from client...")
             video_paths = self.config.video_paths
+        elif self.config.background == "images":
+            # prompts and images are generated while the narration is synthesized
+            images_task = asyncio.create_task(self.generate_images())
         else:
             logger.debug("Generating search terms for script...")
             search_terms = await self.generate_search_terms(
                 script=script, max_hashtags=10
             )
 
-            # holds all remote urls
-            remote_urls = []
-
             max_videos = int(os.getenv("MAX_BG_VIDEOS", 2))
 
-            for search_term in search_terms[:max_videos]:
-                # search for a related background video
-                video_path = await self.video_generator.get_video_url(
-                    search_term=search_term
+            # search for related background videos, all terms at once
+            with span("pexels_search"):
+                remote_urls = await self.pexels_client.first_video_urls(
+                    search_terms[:max_videos]
                 )
-                if not video_path:
-                    continue
-
-                remote_urls.append(video_path)
 
             # download all remote videos at once
             tasks = []
@@ -175,39 +452,104 @@ class ReelsMaker:
             local_paths = await asyncio.gather(*tasks)
             video_paths.extend(local_paths)
 
-        self.audio_clip_paths: list[AudioFileClip] = []
+        try:
+            # generate audio for all sentences concurrently
+            decoded = await self.synthesize_audio()
 
-        # for each sentence, generate audio
-        for sentence in self.sentences:
-            audio_path = await self.synth_text(sentence)
-            self.audio_clip_paths.append(AudioFileClip(audio_path))
+            await self.assemble_audio(decoded)
 
-        # combine all TTS files using moviepy
-        self.final_audio_path = os.path.join(self.cwd, "master__audio.mp3")
-
-        final_audio = concatenate_audioclips(self.audio_clip_paths)
-        final_audio.write_audiofile(self.final_audio_path)
+            if images_task:
+                # the slideshow follows the sentence timings of the narration
+                video_paths = [await self.render_slideshow(await images_task)]
+        finally:
+            if images_task:
+                images_task.cancel()
 
         # get subtitles from script
-        subtitles_path = await self.generate_subtitles()
-
-        # concatenate videos
-        temp_audio = AudioFileClip(self.final_audio_path)
-        combined_video_path = await self.video_generator.combine_videos(
-            video_paths=video_paths,
-            max_duration=temp_audio.duration,
-            max_clip_duration=3,
-            threads=self.threads,
-        )
+        subtitles = await self.generate_subtitles()
+
+        # final videos are keyed on the resolved stage inputs, never on the raw
+        # request, so a rerun reuses them only when the narration, subtitles,
+        # sources and render settings all match
+        final_keys = [
+            self.final_key(video_paths, config) for config in self.format_configs
+        ]
+        missing = [
+            (config, key, path)
+            for config, key, path in zip(
+                self.format_configs, final_keys, self.final_video_paths
+            )
+            if not self.checkpoints.load_file(key, path)
+        ]
+        if missing:
+            await self.render_video(
+                video_paths, subtitles, [(config, path) for config, _, path in missing]
+            )
+            for _, key, path in missing:
+                self.checkpoints.save_file(key, path, ".mp4")
+        else:
+            logger.info(f"Stage inputs unchanged, reusing: {self.final_video_path}")
 
-        # generate video
-        self.final_video_path = await self.video_generator.generate_video(
-            combined_video_path=combined_video_path,
-            tts_path=self.final_audio_path,
-            subtitles_path=subtitles_path,
-        )
+        return self.final_video_path
 
-        video_clip = VideoFileClip(filename=self.final_video_path)
+    async def render_video(
+        self,
+        video_paths: list[str],
+        subtitles: SubtitleTrack,
+        outputs: list[tuple[VideoGeneratorConfig, str]] | None = None,
+    ) -> str:
+        """Renders `outputs`, pairs of format config and path, every format by default."""
+        outputs = outputs or list(zip(self.format_configs, self.final_video_paths))
+        video_gen_config = self.config.video_gen_config
+        if video_gen_config.backend in ("ffmpeg", "frames"):
+            if video_gen_config.backend == "frames":
+                from app.frame_pipeline import FramePipelineRenderer as Renderer
+            else:
+                from app.ffmpeg_render import FFmpegRenderer as Renderer
+
+            renderer = Renderer(
+                self.cwd,
+                video_gen_config,
+                formats=[config for config, _ in outputs],
+                videos_cache=self.videos_cache,
+            )
+            with span(
+                "final_write", backend=video_gen_config.backend, formats=len(outputs)
+            ):
+                await renderer.render_formats(
+                    video_paths=video_paths,
+                    tts_path=self.final_audio_path,
+                    subtitles=subtitles,
+                    output_paths=[path for _, path in outputs],
+                    max_clip_duration=3,
+                    background_music_path=self.background_music_path,
+                )
+            for _, path in outputs:
+                logger.info((f"Final video: {path}"))
+            return self.final_video_path
+
+        # build the whole timeline in memory, it is encoded once at the end
+        with span("combine_videos"):
+            background_clip = await self.video_generator.build_background_clip(
+                video_paths=video_paths,
+                max_duration=self.audio_duration,
+                max_clip_duration=3,
+            )
+        if video_gen_config.write_intermediates:
+            await self.video_generator.render(
+                background_clip, os.path.join(self.cwd, "master__background.mp4")
+            )
+
+        with span("generate_video"):
+            video_clip = await self.video_generator.compose_video(
+                background_clip=background_clip,
+                tts_path=self.final_audio_path,
+                subtitles=subtitles,
+            )
+        if video_gen_config.write_intermediates:
+            await self.video_generator.render(
+                video_clip, os.path.join(self.cwd, "master__video.mp4")
+            )
 
         if self.background_music_path:
             video_clip = await self.video_generator.add_background_music(
@@ -218,8 +560,11 @@ class ReelsMaker:
 
         video_clip = await self.video_generator.add_fade_out(video_clip)
 
-        self.final_video_path = os.path.join(self.cwd, "master__final__video.mp4")
-        video_clip.write_videofile(self.final_video_path, threads=self.threads)
+        try:
+            with span("final_write", backend="moviepy"):
+                await self.video_generator.render(video_clip, self.final_video_path)
+        finally:
+            self.video_generator.close()
 
         logger.info((f"Final video: {self.final_video_path}"))
         logger.info("video generated successfully!")
@@ -0,0 +1,74 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+RENDER_PROFILE = Literal["preview", "draft", "standard", "final"]
+ASPECT_RATIO = Literal["9:16", "1:1", "4:5", "16:9"]
+
+# full size frames, reels/tiktok, instagram feed and youtube
+ASPECT_SIZES: dict[str, tuple[int, int]] = {
+    "9:16": (1080, 1920),
+    "1:1": (1080, 1080),
+    "4:5": (1080, 1350),
+    "16:9": (1920, 1080),
+}
+
+
+class RenderProfile(BaseModel):
+    scale: float = 1.0
+    """ fraction of the 1080x1920 output size, subtitles and watermark scale with it """
+
+    fps: int = 30
+    preset: str = "medium"
+    """ x264 preset """
+
+    crf: int = 23
+    tune: str | None = None
+    """ x264 tune, e.g. fastdecode for proxies """
+
+    audio_bitrate: str = "192k"
+
+    @property
+    def width(self) -> int:
+        return self.scaled(1080, even=True)
+
+    @property
+    def height(self) -> int:
+        return self.scaled(1920, even=True)
+
+    def size(self, aspect_ratio: str = "9:16") -> tuple[int, int]:
+        """Even output width and height of an aspect ratio for this profile."""
+        width, height = ASPECT_SIZES[aspect_ratio]
+        return self.scaled(width, even=True), self.scaled(height, even=True)
+
+    def scaled(self, value: float, even: bool = False) -> int:
+        """`value` in output pixels for this profile, x264 needs even frame sizes."""
+        if even:
+            return max(2, round(value * self.scale / 2) * 2)
+        return max(1, round(value * self.scale)) if value else 0
+
+    def x264_params(self) -> list[str]:
+        """Encoder flags not covered by moviepy's write_videofile arguments."""
+        params = ["-crf", str(self.crf)]
+        if self.tune:
+            params += ["-tune", self.tune]
+        return params
+
+
+RENDER_PROFILES: dict[str, RenderProfile] = {
+    # proxy for iterating on subtitles and colours in the UI
+    "preview": RenderProfile(
+        scale=0.5,
+        fps=24,
+        preset="ultrafast",
+        crf=30,
+        tune="fastdecode",
+        audio_bitrate="96k",
+    ),
+    "draft": RenderProfile(
+        scale=2 / 3, fps=30, preset="veryfast", crf=26, audio_bitrate="128k"
+    ),
+    # what every render used before profiles existed (moviepy's libx264 defaults)
+    "standard": RenderProfile(),
+    "final": RenderProfile(preset="slow", crf=18, audio_bitrate="256k"),
+}
@@ -0,0 +1,160 @@
+import bisect
+import os
+import subprocess
+
+import numpy as np
+from loguru import logger
+from PIL import Image, ImageOps
+
+from app.render_profile import RenderProfile
+from app.utils import ffmpeg_binary
+
+
+class Slideshow:
+    """Pan and zoom ("Ken Burns") over still images, one per narrated sentence.
+
+    Every image is resized once to cover the output at the maximum zoom.
+    Frames are then sampled with numpy from a resample grid computed once
+    per output size: zoom and pan are an affine map of that grid, and
+    bilinear sampling is separable, so a frame costs a few vectorized
+    gathers and never a PIL resize.
+    """
+
+    def __init__(
+        self,
+        image_paths: list[str],
+        durations: list[float],
+        width: int,
+        height: int,
+        zoom: float = 1.15,
+    ):
+        self.width = width
+        self.height = height
+        self.zoom = zoom
+        self.durations = durations
+
+        self.starts = [sum(durations[:index]) for index in range(len(durations))]
+        self.duration = sum(durations)
+
+        # repeated images are loaded once
+        loaded: dict[str, np.ndarray] = {}
+        for path in image_paths:
+            if path not in loaded:
+                loaded[path] = self.load(path)
+        self.images = [loaded[path] for path in image_paths]
+
+        # output pixel centers relative to the frame center
+        self.grid_x = np.arange(width, dtype=np.float32) - (width - 1) / 2
+        self.grid_y = np.arange(height, dtype=np.float32) - (height - 1) / 2
+
+    def load(self, path: str) -> np.ndarray:
+        size = (round(self.width * self.zoom), round(self.height * self.zoom))
+        with Image.open(path) as image:
+            image = ImageOps.fit(image.convert("RGB"), size, Image.LANCZOS)
+        return np.asarray(image)
+
+    @staticmethod
+    def axis(
+        coords: np.ndarray, size: int
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Neighbour indices and 8-bit fixed point weights of bilinear sampling."""
+        coords = np.clip(coords, 0, size - 1)
+        low = np.minimum(coords.astype(np.intp), size - 2)
+        weight = ((coords - low) * 256 + 0.5).astype(np.uint16)
+        return low, low + 1, weight
+
+    def frame(self, t: float) -> np.ndarray:
+        """The (height, width, 3) uint8 frame at `t` seconds."""
+        index = min(
+            max(bisect.bisect_right(self.starts, t) - 1, 0), len(self.images) - 1
+        )
+        image = self.images[index]
+        progress = min(max((t - self.starts[index]) / self.durations[index], 0), 1)
+
+        # even slides zoom in and pan right, odd ones zoom out and pan left
+        if index % 2:
+            progress = 1 - progress
+        scale = 1 + (self.zoom - 1) * progress
+        step = np.float32(self.zoom / scale)
+
+        source_h, source_w = image.shape[:2]
+        slack = max(source_w - self.width * step, 0) / 2
+        center_x = (source_w - 1) / 2 + slack * (2 * progress - 1)
+        center_y = (source_h - 1) / 2
+
+        x0, x1, wx = self.axis(center_x + self.grid_x * step, source_w)
+        y0, y1, wy = self.axis(center_y + self.grid_y * step, source_h)
+        wx = wx[None, :, None]
+        wy = wy[:, None, None]
+
+        # rows first: whole-row gathers are contiguous copies, then the
+        # columns of the already reduced rows, in 16-bit fixed point
+        rows = np.take(image, y0, axis=0).astype(np.uint16)
+        rows *= 256 - wy
+        rows += np.take(image, y1, axis=0) * wy
+        rows >>= 8
+
+        frame = np.take(rows, x0, axis=1)
+        frame *= 256 - wx
+        frame += np.take(rows, x1, axis=1) * wx
+        frame >>= 8
+        return frame.astype(np.uint8)
+
+    def write(self, path: str, profile: RenderProfile, threads: int = 1) -> str:
+        """Encodes the slideshow to `path`, frames are piped to ffmpeg as raw rgb.
+
+        The video is encoded to a temp file renamed over `path`, so a file
+        hardlinked to `path` (e.g. an older checkpoint) is never rewritten.
+        """
+        base, ext = os.path.splitext(path)
+        tmp_path = f"{base}.tmp{ext}"
+        cmd = [
+            ffmpeg_binary(),
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-y",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgb24",
+            "-s",
+            f"{self.width}x{self.height}",
+            "-r",
+            str(profile.fps),
+            "-i",
+            "-",
+            "-c:v",
+            "libx264",
+            "-preset",
+            profile.preset,
+            *profile.x264_params(),
+            "-pix_fmt",
+            "yuv420p",
+            "-threads",
+            str(threads),
+            tmp_path,
+        ]
+        frames = max(round(self.duration * profile.fps), 1)
+        logger.info(f"Rendering slideshow: {path} ({len(self.images)} images)")
+
+        with subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE
+        ) as proc:
+            assert proc.stdin and proc.stderr
+            try:
+                for number in range(frames):
+                    proc.stdin.write(self.frame(number / profile.fps).tobytes())
+            except BrokenPipeError:
+                pass
+            finally:
+                proc.stdin.close()
+            err = proc.stderr.read()
+
+        if proc.returncode != 0:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise RuntimeError(f"ffmpeg failed: {err.decode(errors='ignore')}")
+
+        os.replace(tmp_path, path)
+        return path
@@ -5,9 +5,10 @@ from pathlib import Path
 
 import srt_equalizer
 from loguru import logger
-from moviepy.audio.io.AudioFileClip import AudioFileClip
 from pydantic import BaseModel
 
+from app.subtitle_track import SubtitleTrack
+
 
 class SubtitleConfig(BaseModel):
     cwd: str
@@ -39,40 +40,42 @@ class SubtitleGenerator:
 
         srt_equalizer.equalize_srt_file(srt_path, srt_path, max_chars)
 
+    def build_track(
+        self, sentences: list[str], durations: list[float], gap: float = 0.0
+    ) -> SubtitleTrack:
+        """Builds the word-sized cues of the narration in memory."""
+        return SubtitleTrack.from_sentences(
+            sentences, durations, gap=gap, max_chars=self.config.max_chars
+        )
+
     async def generate_subtitles(
         self,
         final_audio_path: str,
-        audio_clips: list[AudioFileClip],
+        durations: list[float],
         sentences: list[str],
         voice: str | None = None,
+        gap: float = 0.0,
     ) -> str:
+        """Exports the subtitle track as an srt file and returns its path."""
         logger.info("Generating subtitles...")
 
         basedir = os.path.join(self.config.cwd, "subtitles")
         os.makedirs(basedir, exist_ok=True)
 
         subtitles_path = Path(basedir, f"{uuid.uuid4()}.srt")
-
-        subtitles = await self.locally_generate_subtitles(
-            sentences=sentences, audio_clips=audio_clips
-        )
-        with open(subtitles_path, "w+") as file:
-            file.write(subtitles)
-
-        await self.wordify(
-            srt_path=subtitles_path.as_posix(), max_chars=self.config.max_chars
-        )
-        return subtitles_path.as_posix()
+        track = self.build_track(sentences=sentences, durations=durations, gap=gap)
+        return track.export(subtitles_path.as_posix())
 
     async def locally_generate_subtitles(
-        self, sentences: list[str], audio_clips: list[AudioFileClip]
+        self, sentences: list[str], durations: list[float], gap: float = 0.0
     ) -> str:
         """
         Generates subtitles from a given audio file and returns the path to the subtitles.
 
         Args:
             sentences (List[str]): all the sentences said out loud in the audio clips
-            audio_clips (List[AudioFileClip]): all the individual audio clips which will make up the final audio track
+            durations (List[float]): the duration of each sentence's audio in the final audio track
+            gap (float): seconds of silence between two sentences
         Returns:
             str: The generated subtitles
         """
@@ -88,16 +91,13 @@ class SubtitleGenerator:
         start_time = 0
         subtitles = []
 
-        for i, (sentence, audio_clip) in enumerate(
-            zip(sentences, audio_clips), start=1
-        ):
-            duration = audio_clip.duration
+        for i, (sentence, duration) in enumerate(zip(sentences, durations), start=1):
             end_time = start_time + duration
 
             # Format: subtitle index, start time --> end time, sentence
             subtitle_entry = f"{i}\n{convert_to_srt_time_format(start_time)} --> {convert_to_srt_time_format(end_time)}\n{sentence}\n"
             subtitles.append(subtitle_entry)
 
-            start_time += duration  # Update start time for the next subtitle
+            start_time += duration + gap  # Update start time for the next subtitle
 
         return "\n".join(subtitles)
@@ -0,0 +1,152 @@
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+from loguru import logger
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+RasterKey = tuple[str, str, int, str | None, str | None, int, str | None]
+
+
+def parse_color(color: str | None) -> tuple[int, int, int, int] | None:
+    """Parses a css/hex color into RGBA, `None` (or the string "None") means transparent."""
+    if not color or color.lower() in ("none", "transparent"):
+        return None
+
+    rgb = ImageColor.getrgb(color)
+    if len(rgb) == 3:
+        return (*rgb, 255)
+    return rgb  # type: ignore
+
+
+@lru_cache(maxsize=32)
+def load_font(font_path: str, font_size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(font_path, font_size)
+
+
+class RasterCache:
+    """Thread-safe LRU of rendered text images bounded by the total bytes it holds."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict[RasterKey, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: RasterKey) -> np.ndarray | None:
+        with self._lock:
+            image = self._items.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+
+            self._items.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key: RasterKey, image: np.ndarray) -> None:
+        if image.nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+
+            self._items[key] = image
+            self.nbytes += image.nbytes
+
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+
+# shared by every job running in this process
+raster_cache = RasterCache(
+    max_bytes=int(os.getenv("SUBTITLE_RASTER_CACHE_BYTES", 256 * 1024 * 1024))
+)
+
+
+def render_text(
+    text: str,
+    font_path: str,
+    font_size: int,
+    color: str | None = "white",
+    stroke_color: str | None = None,
+    stroke_width: int = 0,
+    bg_color: str | None = None,
+) -> np.ndarray:
+    """Rasterizes `text` with FreeType into a (h, w, 4) uint8 RGBA array."""
+    font = load_font(font_path, font_size)
+    fill = parse_color(color) or (255, 255, 255, 255)
+    stroke = parse_color(stroke_color)
+    stroke_width = stroke_width if stroke else 0
+
+    measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = map(
+        round,
+        measure.multiline_textbbox(
+            (0, 0), text, font=font, stroke_width=stroke_width, align="center"
+        ),
+    )
+    size = (max(right - left, 1), max(bottom - top, 1))
+
+    image = Image.new("RGBA", size, parse_color(bg_color) or (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.multiline_text(
+        (-left, -top),
+        text,
+        font=font,
+        fill=fill,
+        stroke_width=stroke_width,
+        stroke_fill=stroke,
+        align="center",
+    )
+
+    return np.asarray(image)
+
+
+def rasterize_text(
+    text: str,
+    font_path: str,
+    font_size: int,
+    color: str | None = "white",
+    stroke_color: str | None = None,
+    stroke_width: int = 0,
+    bg_color: str | None = None,
+) -> np.ndarray:
+    """Cached `render_text`, the returned array is shared and read-only."""
+    key: RasterKey = (
+        text,
+        font_path,
+        font_size,
+        color,
+        stroke_color,
+        stroke_width,
+        bg_color,
+    )
+
+    image = raster_cache.get(key)
+    if image is not None:
+        return image
+
+    image = render_text(*key)
+    image.setflags(write=False)
+    raster_cache.put(key, image)
+
+    logger.debug(f"Rasterized subtitle: {text!r} {image.shape}")
+    return image
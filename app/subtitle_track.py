@@ -0,0 +1,113 @@
+import bisect
+from datetime import timedelta
+from typing import Iterator
+
+import srt
+from srt_equalizer import split_subtitle
+
+Cue = tuple[float, float, str]
+
+
+def _seconds(value: timedelta) -> float:
+    # srt keeps millisecond precision, so does the track
+    return round(value.total_seconds(), 3)
+
+
+class SubtitleTrack:
+    """Non-overlapping subtitle cues held in memory, sorted by start time.
+
+    Start and end times live in two parallel sorted lists, the cue active
+    at any time is found by bisection instead of scanning every cue, which
+    matters once a long script is split into thousands of word cues.
+    SRT is only an export format.
+    """
+
+    def __init__(self, cues: list[Cue]):
+        cues = sorted(cues, key=lambda cue: cue[0])
+        self.starts = [start for start, _, _ in cues]
+        self.ends = [end for _, end, _ in cues]
+        self.texts = [text for _, _, text in cues]
+
+    @classmethod
+    def from_sentences(
+        cls,
+        sentences: list[str],
+        durations: list[float],
+        gap: float = 0.0,
+        max_chars: int | None = None,
+    ) -> "SubtitleTrack":
+        """One cue per narrated sentence, split into `max_chars` wide cues
+        whose times are proportional to their length."""
+        cues: list[Cue] = []
+        start = 0.0
+        for sentence, duration in zip(sentences, durations):
+            sub = srt.Subtitle(
+                index=len(cues) + 1,
+                start=timedelta(seconds=round(start, 3)),
+                end=timedelta(seconds=round(start + duration, 3)),
+                content=sentence,
+            )
+            parts = split_subtitle(sub, max_chars) if max_chars else [sub]
+            cues += [(_seconds(p.start), _seconds(p.end), p.content) for p in parts]
+
+            start += duration + gap
+
+        return cls(cues)
+
+    @classmethod
+    def from_srt(cls, text: str) -> "SubtitleTrack":
+        return cls(
+            [
+                (_seconds(sub.start), _seconds(sub.end), sub.content)
+                for sub in srt.parse(text)
+            ]
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "SubtitleTrack":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_srt(f.read())
+
+    @classmethod
+    def coerce(cls, subtitles: "SubtitleTrack | str") -> "SubtitleTrack":
+        """Accepts a track or the path of an srt file."""
+        return subtitles if isinstance(subtitles, cls) else cls.load(subtitles)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __iter__(self) -> Iterator[Cue]:
+        return iter(zip(self.starts, self.ends, self.texts))
+
+    @property
+    def duration(self) -> float:
+        return max(self.ends, default=0.0)
+
+    def cue_at(self, t: float) -> int | None:
+        """Index of the cue shown at `t`, None between cues."""
+        index = bisect.bisect_right(self.starts, t) - 1
+        if index >= 0 and t < self.ends[index]:
+            return index
+        return None
+
+    def text_at(self, t: float) -> str | None:
+        index = self.cue_at(t)
+        return None if index is None else self.texts[index]
+
+    def to_srt(self) -> str:
+        return srt.compose(
+            [
+                srt.Subtitle(
+                    index=index,
+                    start=timedelta(seconds=start),
+                    end=timedelta(seconds=end),
+                    content=text,
+                )
+                for index, (start, end, text) in enumerate(self, start=1)
+            ]
+        )
+
+    def export(self, path: str) -> str:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_srt())
+        return path
@@ -1,17 +1,18 @@
+import asyncio
 import os
-import shutil
 import uuid
-from base64 import b64encode
-from typing import Literal
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable, Literal
 
-from elevenlabs import Voice, VoiceSettings, save
-from elevenlabs.client import ElevenLabs
 from loguru import logger
 from pydantic import BaseModel
 
-from app import tiktokvoice
-from app.config import speech_cache_path
-from app.utils.path_util import search_file
+from app import eleven_tts, tiktokvoice
+from app.cache import CacheStore, speech_cache
+from app.instrumentation import record_cache, span
+
+# called with a sentence and its audio while it is still being synthesized
+StreamConsumer = Callable[[str, AsyncIterator[bytes]], Awaitable[None]]
 
 VOICE_PROVIDER = Literal["elevenlabs", "tiktok"]
 
@@ -19,81 +20,136 @@ VOICE_PROVIDER = Literal["elevenlabs", "tiktok"]
 class SynthConfig(BaseModel):
     voice_provider: VOICE_PROVIDER = "tiktok"
     voice: str = "en_male_narration"
+    max_concurrency: int = 4
+    """ max number of sentences synthesized at the same time """
 
 
 class SynthGenerator:
-    def __init__(self, cwd: str, config: SynthConfig):
+    def __init__(
+        self,
+        cwd: str,
+        config: SynthConfig,
+        cache: CacheStore = speech_cache,
+        eleven_client: eleven_tts.ElevenLabsClient = eleven_tts.default_client,
+    ):
         self.config = config
         self.cwd = cwd
-        self.cache_key: str | None = None
+        self.cache = cache
+        self.eleven_client = eleven_client
         self.eleven_voice_id = "ALDM8G793G6dq21Vj1Jm"
 
         self.base = os.path.join(self.cwd, "audio_chunks")
 
         os.makedirs(self.base, exist_ok=True)
 
-        self.client = ElevenLabs(
-            api_key=os.getenv("ELEVENLABS_API_KEY"),
-        )
-
-    def set_speech_props(self):
-        self.speech_path = os.path.join(self.base, f"{uuid.uuid4()}.mp3")
-        text_hash = b64encode(self.text.encode("ascii")).decode("utf-8")
+    def new_speech_path(self) -> str:
+        return os.path.join(self.base, f"{uuid.uuid4()}.mp3")
 
+    def speech_cache_key(self, text: str) -> str:
+        # the cache store hashes the key, so the raw text is safe to use here
         if self.config.voice_provider == "elevenlabs":
-            self.cache_key = f"{self.eleven_voice_id}_{text_hash}"
+            return f"elevenlabs_{self.eleven_voice_id}_{text}"
 
-        elif self.config.voice_provider == "tiktok":
-            self.cache_key = f"{self.config.voice}_{text_hash}"
+        return f"tiktok_{self.config.voice}_{text}"
 
-    async def generate_with_eleven(self, text: str) -> str:
-        voice = Voice(
+    async def stream_with_eleven(self, text: str) -> AsyncIterator[bytes]:
+        """Yields the speech as it streams in, writing it to the speech cache on the way.
+
+        The cache entry only appears once the whole stream was received.
+        """
+        chunks = self.eleven_client.stream(
+            text,
             voice_id=self.eleven_voice_id,
-            settings=VoiceSettings(
-                stability=0.71, similarity_boost=0.5, style=0.0, use_speaker_boost=True
-            ),
+            voice_settings={
+                "stability": 0.71,
+                "similarity_boost": 0.5,
+                "style": 0.0,
+                "use_speaker_boost": True,
+            },
         )
+        # aclosing: a consumer that stops early also ends the http request
+        async with aclosing(chunks):
+            with self.cache.reserve(self.speech_cache_key(text), ".mp3") as tmp_path:
+                with open(tmp_path, "wb") as f:
+                    async for chunk in chunks:
+                        f.write(chunk)
+                        yield chunk
+
+    async def generate_with_eleven(
+        self, text: str, consumer: StreamConsumer | None = None
+    ) -> str:
+        """Synthesizes `text` straight into the speech cache and returns the cached file."""
+        stream = self.stream_with_eleven(text)
+        if consumer:
+            await consumer(text, stream)
+        else:
+            async for _ in stream:
+                pass
+
+        speech_path = self.cache.get(self.speech_cache_key(text))
+        if speech_path is None:
+            raise eleven_tts.ElevenLabsError(f"Speech stream was not consumed: {text}")
+        return speech_path
 
-        audio = self.client.generate(
-            text=text, voice=voice, model="eleven_multilingual_v2", stream=False
+    async def generate_with_tiktok(self, text: str, speech_path: str) -> str:
+        return await tiktokvoice.atts(
+            text, voice=str(self.config.voice), filename=speech_path
         )
 
-        save(audio, self.speech_path)
+    async def cache_speech(self, cache_key: str, speech_path: str) -> str:
+        return self.cache.put_file(cache_key, speech_path, ext=".mp3")
 
-        return self.speech_path
+    async def generate_audio(
+        self, text: str, consumer: StreamConsumer | None = None
+    ) -> str:
+        """Returns the speech file of `text`.
 
-    async def generate_with_tiktok(self, text: str) -> str:
-        tiktokvoice.tts(text, voice=str(self.config.voice), filename=self.speech_path)
-        return self.speech_path
+        With a streaming provider `consumer` gets the audio while it is
+        being synthesized, e.g. to decode it before the request finished.
+        """
+        with span("tts", provider=self.config.voice_provider):
+            cache_key = self.speech_cache_key(text)
+            cached_speech = self.cache.get(cache_key)
+            record_cache(cached_speech is not None)
 
-    async def cache_speech(self, text: str):
-        if not self.cache_key:
-            logger.warning("Skipping speech cache because it is not set")
-            return
+            if cached_speech:
+                logger.info(f"Found speech in cache: {cached_speech}")
+                return cached_speech
 
-        speech_path = os.path.join(speech_cache_path, f"{self.cache_key}.mp3")
-        shutil.copy2(self.speech_path, speech_path)
+            logger.info(f"Synthesizing text: {text}")
 
-    async def generate_audio(self, text: str) -> str:
-        self.text = text
-        self.set_speech_props()
+            if self.config.voice_provider == "elevenlabs":
+                return await self.generate_with_eleven(text, consumer)
 
-        cached_speech = search_file(speech_cache_path, self.cache_key)
+            speech_path = await self.generate_with_tiktok(text, self.new_speech_path())
+            await self.cache_speech(cache_key, speech_path)
 
-        if cached_speech:
-            logger.info(f"Found speech in cache: {cached_speech}")
-            shutil.copy2(cached_speech, self.speech_path)
-            return cached_speech
+            return speech_path
 
-        logger.info(f"Synthesizing text: {text}")
+    async def generate_audio_batch(
+        self,
+        texts: list[str],
+        max_concurrency: int | None = None,
+        consumer: StreamConsumer | None = None,
+    ) -> list[str]:
+        """Synthesizes all texts concurrently, the returned paths follow the order of `texts`.
 
-        genarator = (
-            self.generate_with_eleven
-            if self.config.voice_provider == "elevenlabs"
-            else self.generate_with_tiktok
-        )
+        Repeated sentences are only synthesized once, cache hits never reach
+        the network. `consumer` is handed the live stream of every sentence
+        that is synthesized by a streaming provider.
+        """
+        max_concurrency = max_concurrency or self.config.max_concurrency
+        speech_paths: dict[str, str] = {}
+        unique = list(dict.fromkeys(texts))
 
-        speech_path = await genarator(text)
-        await self.cache_speech(text)
+        logger.info(f"Generating speech of {len(unique)} sentences")
 
-        return speech_path
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def synthesize(text: str):
+            async with semaphore:
+                speech_paths[text] = await self.generate_audio(text, consumer)
+
+        await asyncio.gather(*(synthesize(text) for text in unique))
+
+        return [speech_paths[text] for text in texts]
@@ -6,13 +6,23 @@
 
 # --- MODIFIED VERSION --- #
 
+import asyncio
 import base64
-import requests
+import json
+import os
+import tempfile
 import threading
+import time
+
+import aiohttp
+import requests
 
 from typing import List
+from loguru import logger
 from termcolor import colored
 
+from app.http_session import LoopSession
+
 
 VOICES = [
     # DISNEY VOICES
@@ -207,3 +217,142 @@ def tts(
 
     except Exception as e:
         print(colored(f"[-] An error occurred during TTS: {e}", "red"))
+
+
+# --- ASYNC CLIENT --- #
+
+
+class TikTokTTSError(Exception):
+    pass
+
+
+def parse_audio_response(body: bytes) -> str:
+    """Extracts the base64 audio from either endpoint's json response."""
+    payload = json.loads(body)
+    data = payload.get("data") or payload.get("audio")
+    if not isinstance(data, str) or not data or data == "error":
+        raise TikTokTTSError(f"no audio in response: {payload.get('error')}")
+
+    # tiktoktts.com answers with a data url
+    if data.startswith("data:"):
+        data = data.split(",", 1)[1]
+    return data
+
+
+class TikTokTTSClient:
+    """asyncio TikTok TTS client.
+
+    All requests share one keep-alive connection pool. Endpoints are not
+    probed before each call: a failing endpoint is marked unhealthy for
+    `health_ttl` seconds and the next one is tried instead.
+    """
+
+    def __init__(
+        self,
+        endpoints: list[str] | None = None,
+        max_chunk_concurrency: int = 4,
+        health_ttl: float = 300,
+        timeout: float = 60,
+        pool_size: int = 16,
+    ):
+        self.endpoints = endpoints or list(ENDPOINTS)
+        self.max_chunk_concurrency = max_chunk_concurrency
+        self.health_ttl = health_ttl
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.pool_size = pool_size
+
+        # endpoint -> time until which it is considered down
+        self.unhealthy_until: dict[str, float] = {}
+
+        self.http = LoopSession(
+            lambda: aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.pool_size, keepalive_timeout=60
+                ),
+                timeout=self.timeout,
+            )
+        )
+
+    async def session(self) -> aiohttp.ClientSession:
+        return await self.http.get()
+
+    async def close(self) -> None:
+        await self.http.close()
+
+    def is_healthy(self, endpoint: str) -> bool:
+        return self.unhealthy_until.get(endpoint, 0) <= time.monotonic()
+
+    def mark_unhealthy(self, endpoint: str) -> None:
+        self.unhealthy_until[endpoint] = time.monotonic() + self.health_ttl
+
+    def endpoint_order(self) -> list[str]:
+        healthy = [e for e in self.endpoints if self.is_healthy(e)]
+        # still try the unhealthy ones as a last resort
+        return healthy + [e for e in self.endpoints if e not in healthy]
+
+    async def generate_chunk(self, text: str, voice: str) -> str:
+        session = await self.session()
+        errors = []
+
+        for endpoint in self.endpoint_order():
+            try:
+                async with session.post(
+                    endpoint, json={"text": text, "voice": voice}
+                ) as response:
+                    response.raise_for_status()
+                    audio = parse_audio_response(await response.read())
+                self.unhealthy_until.pop(endpoint, None)
+                return audio
+            except (
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+                ValueError,
+                TikTokTTSError,
+            ) as e:
+                logger.warning(f"TikTok TTS endpoint failed: {endpoint}: {e}")
+                self.mark_unhealthy(endpoint)
+                errors.append(e)
+
+        raise TikTokTTSError(f"all TikTok TTS endpoints failed: {errors}")
+
+    async def tts(self, text: str, voice: str, filename: str) -> str:
+        if voice not in VOICES:
+            raise TikTokTTSError(f"Voice not available: {voice}")
+
+        if not text:
+            raise TikTokTTSError("Please specify a text")
+
+        text_parts = [text] if len(text) < TEXT_BYTE_LIMIT else split_string(text, 299)
+        semaphore = asyncio.Semaphore(self.max_chunk_concurrency)
+
+        async def generate(text_part: str) -> str:
+            async with semaphore:
+                return await self.generate_chunk(text_part, voice)
+
+        tasks = [asyncio.create_task(generate(part)) for part in text_parts]
+
+        directory = os.path.dirname(os.path.abspath(filename))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".mp3")
+        try:
+            # decode each part to disk as soon as it is next in order
+            with os.fdopen(fd, "wb") as f:
+                for task in tasks:
+                    f.write(base64.b64decode(await task))
+            os.replace(tmp_path, filename)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        logger.debug(f"TikTok TTS saved: {filename} ({len(text_parts)} parts)")
+        return filename
+
+
+default_client = TikTokTTSClient()
+
+
+async def atts(text: str, voice: str, filename: str = "output.mp3") -> str:
+    """Async version of `tts` using the shared client."""
+    return await default_client.tts(text, voice=voice, filename=filename)
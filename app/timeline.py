@@ -0,0 +1,72 @@
+from typing import NamedTuple
+
+from loguru import logger
+
+
+class Segment(NamedTuple):
+    source: int
+    """ index of the background source """
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def plan_segments(
+    source_durations: list[float],
+    max_duration: float,
+    max_clip_duration: float,
+    fps: int = 30,
+) -> list[Segment]:
+    """Lays out the background timeline, cycling through the sources.
+
+    Each source is consumed from where its previous segment ended and
+    wraps around to the start once less than a frame is left. Sources
+    shorter than a frame are skipped.
+    """
+    usable = [
+        index
+        for index, source_duration in enumerate(source_durations)
+        if source_duration >= 1 / fps
+    ]
+    if not usable:
+        raise ValueError(
+            f"No background source is at least one frame long: {source_durations}"
+        )
+
+    # Required duration of each clip
+    req_dur = max_duration / len(usable)
+    offsets = [0.0] * len(source_durations)
+
+    segments: list[Segment] = []
+    tot_dur = 0.0
+
+    while tot_dur < max_duration:
+        for index in usable:
+            source_duration = source_durations[index]
+            remaining = max_duration - tot_dur
+            if remaining <= 0:
+                break
+
+            available = source_duration - offsets[index]
+            # not even a frame left, start over
+            if available < 1 / fps:
+                offsets[index] = 0.0
+                available = source_duration
+
+            if remaining < available:
+                duration = remaining
+            else:
+                duration = min(req_dur, available)
+            duration = min(duration, max_clip_duration)
+
+            start = offsets[index]
+            segments.append(Segment(index, start, start + duration))
+            offsets[index] = start + duration
+
+            tot_dur += duration
+            logger.debug(f"Total duration after adding clip: {tot_dur}")
+
+    return segments
@@ -1,5 +1,6 @@
 import re
 from .path_util import *
+from .ffmpeg_util import *
 
 
 def split_by_dot_or_newline(text):
@@ -0,0 +1,39 @@
+import os
+import subprocess
+
+from loguru import logger
+
+
+def ffmpeg_binary() -> str:
+    """The ffmpeg executable moviepy uses, `FFMPEG_BINARY` overrides the bundled one."""
+    binary = os.getenv("FFMPEG_BINARY")
+    if binary and binary != "ffmpeg-imageio":
+        return binary
+
+    import imageio_ffmpeg
+
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def run_ffmpeg(args: list[str]) -> None:
+    cmd = [ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y", *args]
+    logger.debug(f"Running: {' '.join(cmd)}")
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='ignore')}")
+
+
+def probe_duration(path: str) -> float:
+    """Reads the container duration from ffmpeg's banner, in seconds."""
+    result = subprocess.run(
+        [ffmpeg_binary(), "-hide_banner", "-i", path],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    for line in result.stderr.decode(errors="ignore").splitlines():
+        line = line.strip()
+        if line.startswith("Duration:"):
+            hours, minutes, seconds = line.split(",")[0].split()[1].split(":")
+            return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    raise RuntimeError(f"Could not read duration of {path}")
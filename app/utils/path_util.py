@@ -1,13 +1,42 @@
+import fcntl
 import os
+import shutil
 
+# linux ioctl to share extents between files (btrfs, xfs)
+FICLONE = 0x40049409
 
-def search_file(directory, file) -> str | None:
-    assert os.path.isdir(directory)
-    import re
 
-    pattern = re.compile(re.escape(file), re.IGNORECASE)
-    for cur_path, directories, files in os.walk(directory):
-        for filename in files:
-            if pattern.search(filename):
-                return os.path.join(directory, cur_path, filename)
-    return None
+def reflink_or_copy(src: str, dest: str) -> str:
+    """Copies `src` to `dest` as a reflink when the filesystem allows it.
+
+    Unlike a hardlink the copy is a separate file, writing over one in place
+    never changes the other.
+    """
+    if os.path.exists(dest):
+        os.remove(dest)
+
+    try:
+        with open(src, "rb") as s, open(dest, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return dest
+    except OSError:
+        pass
+
+    shutil.copy2(src, dest)
+    return dest
+
+
+def link_or_copy(src: str, dest: str) -> str:
+    """Places `src` at `dest` as a hardlink, a reflink, or as a last resort a copy."""
+    if os.path.exists(dest):
+        if os.path.samefile(src, dest):
+            return dest
+        os.remove(dest)
+
+    try:
+        os.link(src, dest)
+        return dest
+    except OSError:
+        pass
+
+    return reflink_or_copy(src, dest)
@@ -0,0 +1,64 @@
+import multiprocessing
+from typing import Literal
+
+from pydantic import BaseModel, model_validator
+
+from app.render_profile import (
+    ASPECT_RATIO,
+    RENDER_PROFILE,
+    RENDER_PROFILES,
+    RenderProfile,
+)
+
+
+class VideoGeneratorConfig(BaseModel):
+    fontsize: int = 100
+    stroke_color: str = "black"
+    text_color: str = "white"
+    stroke_width: int = 5
+    font_path: str = "fonts/bold_font.ttf"
+    bg_color: str | None = None
+    subtitles_position: str = "center,center"
+    threads: int = multiprocessing.cpu_count()
+    watermark_path: str | None = None
+    subtitles_box_color: str | None = None
+    """ full width band behind the subtitles, e.g. "#00000080" """
+    backend: Literal["moviepy", "ffmpeg", "frames"] = "moviepy"
+    """ moviepy composes frames in python, ffmpeg renders one native filtergraph,
+    frames composes in place in a fixed pool of numpy frame buffers """
+    frame_memory_budget: int = 64 * 1024 * 1024
+    """ bytes of frame buffers one render may hold, frames backend """
+    normalize_sources: bool = True
+    """ transcode each source once into a cached portrait/grayscale/30fps mezzanine """
+    write_intermediates: bool = False
+    """ debug: also write the combined background and the un-mixed master video to disk """
+    profile: RENDER_PROFILE = "standard"
+    """ output size and encoder settings, preview renders a 540x960 ultrafast proxy """
+    aspect_ratio: ASPECT_RATIO = "9:16"
+    """ output frame shape, the background is center cropped to it """
+
+    @property
+    def render_profile(self) -> RenderProfile:
+        return RENDER_PROFILES[self.profile]
+
+    @property
+    def output_size(self) -> tuple[int, int]:
+        return self.render_profile.size(self.aspect_ratio)
+
+
+class OutputFormat(BaseModel):
+    aspect_ratio: ASPECT_RATIO
+    subtitles_position: str | None = None
+    """ overrides the video config, e.g. subtitles lower in a 16:9 frame """
+    fontsize: int | None = None
+
+    @model_validator(mode="before")
+    @classmethod
+    def from_aspect_ratio(cls, value):
+        """A bare aspect ratio, e.g. "1:1", is a format without overrides."""
+        return {"aspect_ratio": value} if isinstance(value, str) else value
+
+    def apply(self, config: VideoGeneratorConfig) -> VideoGeneratorConfig:
+        """`config` rendering this format."""
+        overrides = self.model_dump(exclude_none=True)
+        return config.model_copy(update=overrides)
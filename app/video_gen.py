@@ -1,33 +1,90 @@
-import multiprocessing
-import os
-import random
+import asyncio
 import uuid
 from pathlib import Path
+from typing import Callable
 
+import numpy as np
 from loguru import logger
-from moviepy import ImageClip
 from moviepy.audio.AudioClip import CompositeAudioClip
 from moviepy.audio.io.AudioFileClip import AudioFileClip
 from moviepy.editor import VideoFileClip
 from moviepy.video import fx
 from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
 from moviepy.video.compositing.concatenate import concatenate_videoclips
-from moviepy.video.tools.subtitles import SubtitlesClip
-from moviepy.video.VideoClip import TextClip
-from pydantic import BaseModel
-from app.pexel import search_for_stock_videos
+from moviepy.video.VideoClip import VideoClip
+from app.cache import CacheStore, videos_cache
+from app.normalize import NormalizeParams, normalize_source
+from app.overlay import OverlayLayer
+from app.subtitle_raster import rasterize_text
+from app.subtitle_track import SubtitleTrack
+from app.timeline import Segment, plan_segments
+from app.video_config import VideoGeneratorConfig
+
+
+class SourcePool:
+    """Opens and probes every background source once, segments planned by
+    `plan_segments` are cut from these shared readers.
+    """
+
+    def __init__(self, video_paths: list[str], transform=None):
+        self.readers = [VideoFileClip(video_path) for video_path in video_paths]
+        self.sources = []
+        for video_path, reader in zip(video_paths, self.readers):
+            logger.debug(f"Opened source: {video_path}, duration: {reader.duration}")
+            source = reader.without_audio()
+            self.sources.append(transform(source) if transform else source)
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    @property
+    def durations(self) -> list[float]:
+        return [source.duration for source in self.sources]
+
+    def segment(self, segment: Segment) -> VideoClip:
+        return self.sources[segment.source].subclip(segment.start, segment.end)
+
+    def close(self) -> None:
+        for reader in self.readers:
+            try:
+                reader.close()
+            except Exception as e:
+                logger.exception(f"Error closing source: {e}")
+        self.readers = []
+
+
+class SubtitleTrackClip(VideoClip):
+    """Draws a SubtitleTrack, replacing moviepy's SubtitlesClip.
+
+    The active cue is found by bisection and the frame of the current cue
+    is kept until the next one starts, so a cue is rasterized and split
+    into colour and mask once instead of once per output frame.
+    """
+
+    def __init__(self, track: SubtitleTrack, render_cue: Callable[[str], np.ndarray]):
+        super().__init__(has_constant_size=False)
+        self.track = track
+        self.render_cue = render_cue
+        self.blank = (np.zeros((1, 1, 3), dtype=np.uint8), np.zeros((1, 1)))
+        self.current: tuple[int | None, tuple[np.ndarray, np.ndarray]] = (
+            None,
+            self.blank,
+        )
+
+        self.make_frame = lambda t: self.cue_frame(t)[0]
+        self.mask = VideoClip(lambda t: self.cue_frame(t)[1], is_mask=True)
+        self.duration = self.end = track.duration
+        self.mask.duration = self.mask.end = track.duration
 
+    def cue_frame(self, t: float) -> tuple[np.ndarray, np.ndarray]:
+        index = self.track.cue_at(t)
+        if index is None:
+            return self.blank
 
-class VideoGeneratorConfig(BaseModel):
-    fontsize: int = 100
-    stroke_color: str = "black"
-    text_color: str = "white"
-    stroke_width: int = 5
-    font_path: str = "fonts/bold_font.ttf"
-    bg_color: str | None = None
-    subtitles_position: str = "center,center"
-    threads: int = multiprocessing.cpu_count()
-    watermark_path: str | None = None
+        if self.current[0] != index:
+            image = self.render_cue(self.track.texts[index])
+            self.current = (index, (image[..., :3], image[..., 3] / 255.0))
+        return self.current[1]
 
 
 class VideoGenerator:
@@ -35,152 +92,192 @@ class VideoGenerator:
         self,
         cwd: str,
         config: VideoGeneratorConfig,
+        videos_cache: CacheStore = videos_cache,
     ):
         self.config = config
         self.cwd = cwd
+        self.videos_cache = videos_cache
+        self.source_pools: list[SourcePool] = []
+        self.audio_clips: list[AudioFileClip] = []
+
+    def to_portrait(self, clip: VideoClip) -> VideoClip:
+        """Crops to the output aspect ratio, resizes to the output size and
+        applies the grayscale effect."""
+        profile = self.config.render_profile
+        width, height = self.config.output_size
+        ratio = width / height
+        clip = clip.with_fps(profile.fps)
+
+        if round((clip.w / clip.h), 4) < round(ratio, 4):
+            clip = fx.crop(
+                clip,
+                width=clip.w,
+                height=round(clip.w / ratio),
+                x_center=clip.w / 2,
+                y_center=clip.h / 2,
+            )
+        else:
+            clip = fx.crop(
+                clip,
+                width=round(ratio * clip.h),
+                height=clip.h,
+                x_center=clip.w / 2,
+                y_center=clip.h / 2,
+            )
+        clip = clip.resize((width, height))
 
-    async def combine_videos(
+        # apply grayscale effect
+        return fx.blackwhite(clip)
+
+    async def build_background_clip(
         self,
         video_paths: list[str],
         max_duration: int,
         max_clip_duration: int,
-        threads: int,
-    ) -> str:
-        video_id = uuid.uuid4()
-        combined_video_path = (Path(self.cwd) / f"{video_id}.mp4").as_posix()
-
-        # Required duration of each clip
-        req_dur = max_duration / len(video_paths)
+    ) -> VideoClip:
+        """Builds the background timeline in memory without encoding it.
 
+        The sources stay open until `close()` is called after the final write.
+        """
         logger.debug("Combining videos...")
-        logger.debug(f"Each clip will be maximum {req_dur} seconds long.")
 
-        clips = []
-        tot_dur = 0
-
-        while tot_dur < max_duration:
-            for video_path in video_paths:
-                clip = VideoFileClip(video_path).without_audio()
-                logger.debug(
-                    f"Processing clip: {video_path}, duration: {clip.duration}"
+        profile = self.config.render_profile
+        if self.config.normalize_sources:
+            width, height = self.config.output_size
+            params = NormalizeParams(width=width, height=height, fps=profile.fps)
+            mezzanine_paths = await asyncio.gather(
+                *(
+                    asyncio.to_thread(normalize_source, path, params, self.videos_cache)
+                    for path in video_paths
                 )
-
-                if (max_duration - tot_dur) < clip.duration:
-                    clip = clip.subclip(0, (max_duration - tot_dur))
-                elif req_dur < clip.duration:
-                    clip = clip.subclip(0, req_dur)
-                clip = clip.with_fps(30)
-
-                if round((clip.w / clip.h), 4) < 0.5625:
-                    clip = fx.crop(
-                        clip,
-                        width=clip.w,
-                        height=round(clip.w / 0.5625),
-                        x_center=clip.w / 2,
-                        y_center=clip.h / 2,
-                    )
-                else:
-                    clip = fx.crop(
-                        clip,
-                        width=round(0.5625 * clip.h),
-                        height=clip.h,
-                        x_center=clip.w / 2,
-                        y_center=clip.h / 2,
-                    )
-                clip = clip.resize((1080, 1920))
-
-                # apply grayscale effect
-                clip = fx.blackwhite(clip)
-
-                if clip.duration > max_clip_duration:
-                    clip = clip.subclip(0, max_clip_duration)
-
-                clips.append(clip)
-
-                self.close_clip(clip)
-                tot_dur += clip.duration
-                logger.debug(f"Total duration after adding clip: {tot_dur}")
+            )
+            pool = SourcePool(list(mezzanine_paths))
+        else:
+            pool = SourcePool(video_paths, transform=self.to_portrait)
+        self.source_pools.append(pool)
+
+        segments = plan_segments(
+            pool.durations,
+            max_duration=max_duration,
+            max_clip_duration=max_clip_duration,
+        )
+        clips = [pool.segment(segment) for segment in segments]
 
         final_clip = concatenate_videoclips(clips=clips, method="compose")
-        final_clip = final_clip.with_fps(30)
-        final_clip.write_videofile(combined_video_path, threads=threads)
+        return final_clip.with_fps(profile.fps)
 
-        return combined_video_path
+    async def combine_videos(
+        self,
+        video_paths: list[str],
+        max_duration: int,
+        max_clip_duration: int,
+        threads: int,
+    ) -> str:
+        video_id = uuid.uuid4()
+        combined_video_path = (Path(self.cwd) / f"{video_id}.mp4").as_posix()
 
-    async def get_video_url(self, search_term: str) -> str | None:
-        try:
-            urls = await search_for_stock_videos(
-                limit=2,
-                min_dur=10,
-                query=search_term,
-            )
-            return urls[0] if len(urls) > 0 else None
-        except Exception as e:
-            logger.error(f"Consistency Violation: {e}")
+        final_clip = await self.build_background_clip(
+            video_paths=video_paths,
+            max_duration=max_duration,
+            max_clip_duration=max_clip_duration,
+        )
+        final_clip.write_videofile(
+            combined_video_path, **self.write_options(threads=threads)
+        )
+        self.close()
 
-        return None
+        return combined_video_path
 
-    async def generate_video(
+    async def compose_video(
         self,
-        combined_video_path: str,
+        background_clip: VideoClip,
         tts_path: str,
-        subtitles_path: str,
-    ) -> str:
-        def generator(txt) -> TextClip:
-            textclip_kwargs = {
-                "font_size": self.config.fontsize,
-                "color": self.config.text_color,
-                "stroke_color": self.config.stroke_color,
-                "stroke_width": self.config.stroke_width,
-                "bg_color": self.config.bg_color,
-            }
-
-            # remove keys with "none"
-            for k, v in textclip_kwargs.items():
-                if not v:
-                    del textclip_kwargs[k]
-
-            textclip = TextClip(
-                text=txt,
-                font="fonts/bold_font.ttf",
-                method="label",
-                **textclip_kwargs,
+        subtitles: SubtitleTrack | str,
+    ) -> VideoClip:
+        """Stacks subtitles over the background, blends the static overlay and
+        sets the narration."""
+
+        profile = self.config.render_profile
+
+        def render_cue(text: str) -> np.ndarray:
+            return rasterize_text(
+                text=text,
+                font_path=self.config.font_path,
+                font_size=profile.scaled(self.config.fontsize),
+                color=self.config.text_color,
+                stroke_color=self.config.stroke_color,
+                stroke_width=profile.scaled(self.config.stroke_width),
+                bg_color=self.config.bg_color,
             )
 
-            return textclip
-
         horizontal_subtitles_position, vertical_subtitles_position = (
             self.config.subtitles_position.split(",")
         )
 
-        subtitles = SubtitlesClip(
-            subtitles=subtitles_path, make_textclip=generator, encoding="utf-8"
-        )
-
-        subtitles_clip = subtitles.with_position(
-            (horizontal_subtitles_position, vertical_subtitles_position)
-        )
-
-        self.video_clip = VideoFileClip(combined_video_path)
+        subtitles_clip = SubtitleTrackClip(
+            SubtitleTrack.coerce(subtitles), render_cue
+        ).with_position((horizontal_subtitles_position, vertical_subtitles_position))
 
-        clips = [self.video_clip, subtitles_clip]
+        result = CompositeVideoClip(clips=[background_clip, subtitles_clip])
 
-        if self.config.watermark_path:
-            watermark_clip = self.__get_watermark_clip()
-            if watermark_clip:
-                logger.debug(f"added watermark: {self.config.watermark_path}")
-                clips.append(self.__get_watermark_clip())
-
-        result = CompositeVideoClip(clips=clips)
+        # watermark and boxes are one pre-composited layer, not more clips
+        overlay = OverlayLayer.from_config(self.config)
+        if not overlay.empty:
+            result = result.image_transform(
+                lambda frame: overlay.blend(
+                    frame if frame.flags.writeable else frame.copy()
+                )
+            )
 
         audio = AudioFileClip(tts_path)
-        result = result.with_audio(audio)
+        self.audio_clips.append(audio)
+        return result.with_audio(audio)
+
+    async def generate_video(
+        self,
+        combined_video_path: str,
+        tts_path: str,
+        subtitles: SubtitleTrack | str,
+    ) -> str:
+        result = await self.compose_video(
+            background_clip=VideoFileClip(combined_video_path),
+            tts_path=tts_path,
+            subtitles=subtitles,
+        )
 
         output_path = (Path(self.cwd) / "master__video.mp4").as_posix()
-        result.write_videofile(output_path, threads=self.config.threads)
+        await self.render(result, output_path)
 
         return output_path
 
+    async def render(self, clip: VideoClip, output_path: str) -> str:
+        """Encodes the clip to `output_path`, this is the only encode in a single-pass render."""
+        logger.info(f"Rendering video: {output_path} ({self.config.profile})")
+        clip.write_videofile(output_path, **self.write_options())
+        return output_path
+
+    def write_options(self, threads: int | None = None) -> dict:
+        """write_videofile arguments for the configured render profile."""
+        profile = self.config.render_profile
+        return {
+            "fps": profile.fps,
+            "codec": "libx264",
+            "preset": profile.preset,
+            "audio_bitrate": profile.audio_bitrate,
+            "ffmpeg_params": profile.x264_params(),
+            "threads": threads or self.config.threads,
+        }
+
+    def close(self) -> None:
+        """Closes every source and audio reader, call it only after the final write."""
+        for pool in self.source_pools:
+            pool.close()
+        self.source_pools = []
+
+        for clip in self.audio_clips:
+            self.close_clip(clip)
+        self.audio_clips = []
+
     def close_clip(self, clip: VideoFileClip):
         try:
             clip.close()
@@ -192,7 +289,9 @@ class VideoGenerator:
 
         original_duration = video_clip.duration
         original_audio = video_clip.audio
-        song_clip = AudioFileClip(song_path).with_fps(44100)
+        song_clip = AudioFileClip(song_path)
+        self.audio_clips.append(song_clip)
+        song_clip = song_clip.with_fps(44100)
 
         # set the volume of the song to 10% of the original volume
         song_clip = song_clip.subclip().multiply_volume(0.2)
@@ -200,25 +299,10 @@ class VideoGenerator:
         # add the song to the video
         comp_audio = CompositeAudioClip([original_audio, song_clip])
         video_clip = video_clip.with_audio(comp_audio)
-        video_clip = video_clip.with_fps(30)
+        video_clip = video_clip.with_fps(self.config.render_profile.fps)
         video_clip = video_clip.with_duration(original_duration)
         return video_clip
 
     async def add_fade_out(self, video_clip: VideoFileClip) -> VideoFileClip:
         """Adds a fade out to the end of the video but let the audio continue playing."""
         return fx.fadeout(video_clip, 3)
-
-    def __get_watermark_clip(self):
-        if not self.config.watermark_path:
-            logger.warning("Skipping watermark because its not provided")
-            return None
-
-        assert self.video_clip is not None, "Video is not loaded"
-
-        watermark = ImageClip(self.config.watermark_path)
-        watermark = watermark.with_duration(self.video_clip.duration)
-        watermark = watermark.with_position(("right", "bottom"))
-        watermark = watermark.margin(right=8, top=8, bottom=8, opacity=0)
-        watermark = watermark.resize(height=50)
-
-        return watermark
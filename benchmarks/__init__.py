@@ -0,0 +1,8 @@
+"""Offline render benchmarks.
+
+Sources and narration are synthesized with ffmpeg and every network
+provider is replaced by a fake, so the numbers only depend on the machine:
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --update-baseline
+"""
@@ -0,0 +1,175 @@
+import asyncio
+import itertools
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, NamedTuple
+
+from aiohttp import web
+from pydantic import BaseModel
+
+from app.pexel import PexelsClient
+from app.utils import run_ffmpeg
+
+SCRIPT_SENTENCES = [
+    "Every morning is a chance to begin again",
+    "Small steps taken daily become long journeys",
+    "Rest is part of the work, not a break from it",
+    "Celebrate the progress you made this week",
+    "Discipline is remembering what you want most",
+    "The view at the top belongs to those who climbed",
+    "Your future is built by what you do today",
+    "Be patient with yourself and keep moving",
+]
+
+
+class SourceSpec(NamedTuple):
+    label: str
+    width: int
+    height: int
+    fps: int
+
+
+SOURCES = [
+    SourceSpec("720p30", 1280, 720, 30),
+    SourceSpec("1080p60", 1920, 1080, 60),
+    SourceSpec("portrait24", 1080, 1920, 24),
+]
+
+
+def make_source_video(
+    path: str, width: int, height: int, fps: int, duration: float = 12
+) -> str:
+    """Writes an h264 testsrc2 clip, long enough to pass the pexels `min_dur` filter."""
+    if not os.path.exists(path):
+        run_ffmpeg(
+            [
+                "-f",
+                "lavfi",
+                "-i",
+                f"testsrc2=size={width}x{height}:rate={fps}:duration={duration}",
+                "-c:v",
+                "libx264",
+                "-preset",
+                "ultrafast",
+                "-pix_fmt",
+                "yuv420p",
+                path,
+            ]
+        )
+    return path
+
+
+def make_speech(path: str, text: str, words_per_second: float = 2.5) -> str:
+    """Writes a tone as long as `text` would take to narrate."""
+    duration = max(len(text.split()) / words_per_second, 0.5)
+    frequency = 180 + sum(map(ord, text)) % 200
+    run_ffmpeg(
+        [
+            "-f",
+            "lavfi",
+            "-i",
+            f"sine=frequency={frequency}:sample_rate=44100:duration={duration:.3f}",
+            "-ac",
+            "2",
+            path,
+        ]
+    )
+    return path
+
+
+def make_script(sentences: int) -> str:
+    return ". ".join(
+        SCRIPT_SENTENCES[i % len(SCRIPT_SENTENCES)] for i in range(sentences)
+    )
+
+
+class FakeHashtags(BaseModel):
+    hashtags: list[str]
+
+
+class FakeScript(FakeHashtags):
+    script: str
+
+
+class FakePromptGenerator:
+    """Stands in for PromptGenerator, returns a fixed script of `sentences` sentences."""
+
+    def __init__(self, sentences: int):
+        self.sentences = sentences
+        self.max_concurrency = 4
+
+    async def generate_sentence(self, sentence: str) -> str:
+        return make_script(self.sentences)
+
+    async def generate_script(self, sentence: str) -> FakeScript:
+        return FakeScript(
+            script=await self.generate_sentence(sentence),
+            hashtags=(await self.generate_hashtags(sentence)).hashtags,
+        )
+
+    async def generate_hashtags(self, sentence: str) -> FakeHashtags:
+        return FakeHashtags(hashtags=["#sunrise", "#ocean", "#city", "#forest"])
+
+    async def sentence_to_image_prompt(self, sentence: str) -> str:
+        return f"a cinematic photo of {sentence.lower()}"
+
+
+class FakeSynthGenerator:
+    """Stands in for SynthGenerator, narrates with synthetic tones."""
+
+    def __init__(self, cwd: str):
+        self.speech_dir = os.path.join(cwd, "speech")
+        os.makedirs(self.speech_dir, exist_ok=True)
+        self.counter = itertools.count()
+
+    async def generate_audio(self, text: str, consumer=None) -> str:
+        path = os.path.join(self.speech_dir, f"{next(self.counter)}.wav")
+        return await asyncio.to_thread(make_speech, path, text)
+
+    async def generate_audio_batch(
+        self, texts: list[str], max_concurrency: int | None = None, consumer=None
+    ) -> list[str]:
+        return list(await asyncio.gather(*(self.generate_audio(t) for t in texts)))
+
+
+class FakePexelsClient(PexelsClient):
+    """Answers every search with one of the synthetic sources served by `serve_files`."""
+
+    def __init__(self, base_url: str, sources: list[tuple[str, SourceSpec]]):
+        super().__init__(base_url=base_url, cache=None)
+        self.sources = sources
+        self.counter = itertools.count()
+
+    async def search(self, query: str, per_page: int) -> dict:
+        path, spec = self.sources[next(self.counter) % len(self.sources)]
+        return {
+            "videos": [
+                {
+                    "duration": 12,
+                    "video_files": [
+                        {
+                            # pick_video_urls only accepts pexels file links
+                            "link": f"{self.base_url}/videos.pexels.com/video-files/{os.path.basename(path)}",
+                            "width": spec.width,
+                            "height": spec.height,
+                        }
+                    ],
+                }
+            ]
+        }
+
+
+@asynccontextmanager
+async def serve_files(directory: str) -> AsyncIterator[str]:
+    """Serves `directory` over http on a free local port, yields the base url."""
+    app = web.Application()
+    app.router.add_static("/videos.pexels.com/video-files/", directory)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        await runner.cleanup()
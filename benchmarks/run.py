@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+
+
+def compare(
+    results: dict[str, dict],
+    baseline: dict[str, dict],
+    tolerance: float = 0.25,
+    min_delta: float = 0.1,
+) -> list[str]:
+    """Lists every timing that is more than `tolerance` slower than the baseline.
+
+    Differences below `min_delta` seconds are treated as noise.
+    """
+    regressions = []
+    for name, timings in results.items():
+        for kind, seconds in timings.items():
+            expected = baseline.get(name, {}).get(kind)
+            if seconds is None or expected is None:
+                continue
+            if seconds > expected * (1 + tolerance) and seconds - expected > min_delta:
+                regressions.append(
+                    f"{name} {kind}: {seconds:.3f}s, baseline {expected:.3f}s "
+                    f"(+{(seconds / expected - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def int_list(value: str) -> list[int]:
+    return sorted({int(v) for v in value.split(",") if v})
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline render benchmarks")
+    parser.add_argument("--sentences", type=int_list, default=[3, 8])
+    parser.add_argument(
+        "--threads", type=int_list, default=sorted({1, multiprocessing.cpu_count()})
+    )
+    parser.add_argument(
+        "--backends", default="moviepy,ffmpeg,frames", type=lambda v: v.split(",")
+    )
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument(
+        "--only",
+        action="append",
+        default=[],
+        help="run benchmarks whose name starts with this, repeatable",
+    )
+    parser.add_argument(
+        "--workdir", help="where sources, caches and renders go, a temp dir by default"
+    )
+    parser.add_argument("--output", default="-", help="results json, - for stdout")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="store the results as the new baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--require-baseline",
+        action=argparse.BooleanOptionalAction,
+        default=bool(os.getenv("CI")),
+        help="fail when there is no baseline to compare with, on by default in CI",
+    )
+    args = parser.parse_args(argv)
+
+    args.baseline = os.path.abspath(args.baseline)
+    if (
+        args.require_baseline
+        and not args.update_baseline
+        and not os.path.exists(args.baseline)
+    ):
+        # a missing baseline would otherwise pass every run unchecked
+        print(
+            f"No baseline at {args.baseline}, store one with --update-baseline "
+            "on the reference machine",
+            file=sys.stderr,
+        )
+        return 2
+
+    # the app keeps its caches under the cwd, never touch the real ones
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="reels-bench-"))
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+
+    from benchmarks.suite import run_suite
+
+    results = asyncio.run(
+        run_suite(
+            sentence_counts=args.sentences,
+            thread_counts=args.threads,
+            backends=args.backends,
+            repeats=args.repeats,
+            only=args.only,
+        )
+    )
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": multiprocessing.cpu_count(),
+            "workdir": workdir,
+        },
+        "results": results,
+    }
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Stored baseline: {args.baseline}", file=sys.stderr)
+        regressions = []
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, tolerance=args.tolerance)
+        report["baseline"] = args.baseline
+    else:
+        print(f"No baseline at {args.baseline}, nothing to compare", file=sys.stderr)
+        regressions = []
+    report["regressions"] = regressions
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
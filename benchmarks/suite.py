@@ -0,0 +1,218 @@
+import asyncio
+import os
+import time
+import uuid
+from typing import Awaitable, Callable
+
+from loguru import logger
+
+from app.audio_assembly import AudioAssembler
+from app.cache import CacheStore
+from app.downloader import Downloader
+from app.subtitle_gen import SubtitleGenerator
+from app.subtitle_raster import raster_cache, rasterize_text
+from app.subtitle_track import SubtitleTrack
+from app.utils import split_by_dot_or_newline
+from benchmarks.fixtures import (
+    SOURCES,
+    FakePexelsClient,
+    FakePromptGenerator,
+    FakeSynthGenerator,
+    make_script,
+    make_source_video,
+    serve_files,
+)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FONT_PATH = os.path.join(REPO_ROOT, "fonts/bold_font.ttf")
+
+
+def new_cwd() -> str:
+    cwd = os.path.join(os.getcwd(), "runs", str(uuid.uuid4()))
+    os.makedirs(cwd, exist_ok=True)
+    return cwd
+
+
+def new_cache() -> CacheStore:
+    """An empty store, each case starts cold and only its own repeats are warm."""
+    return CacheStore(os.path.join(os.getcwd(), "caches", str(uuid.uuid4())))
+
+
+async def measure(fn: Callable[[], Awaitable], repeats: int) -> dict:
+    """Runs `fn` `repeats` times, the first run is cold, later ones hit the caches."""
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await fn()
+        times.append(time.perf_counter() - started)
+
+    return {
+        "cold": round(times[0], 3),
+        "warm": round(min(times[1:]), 3) if len(times) > 1 else None,
+    }
+
+
+async def prepare_narration(
+    sentences: int,
+) -> tuple[list[str], str, SubtitleTrack, float]:
+    """Synthesizes the narration and subtitles of a script.
+
+    Returns the sentences, the wav path, the subtitle track and the narration
+    duration.
+    """
+    cwd = new_cwd()
+    texts = [t for t in split_by_dot_or_newline(make_script(sentences)) if t]
+    speech_paths = await FakeSynthGenerator(cwd).generate_audio_batch(texts)
+
+    assembler = AudioAssembler()
+    pcm, durations = assembler.assemble(speech_paths)
+    audio_path = assembler.write_wav(pcm, os.path.join(cwd, "narration.wav"))
+
+    track = SubtitleGenerator(cwd).build_track(sentences=texts, durations=durations)
+    return texts, audio_path, track, len(pcm) / assembler.sample_rate
+
+
+def wanted(name: str, only: list[str]) -> bool:
+    return not only or any(name.startswith(prefix) for prefix in only)
+
+
+async def run_suite(
+    sentence_counts: list[int],
+    thread_counts: list[int],
+    backends: list[str],
+    repeats: int,
+    only: list[str],
+) -> dict[str, dict]:
+    results: dict[str, dict] = {}
+
+    async def bench(name: str, fn: Callable[[], Awaitable]) -> None:
+        if not wanted(name, only):
+            return
+        logger.info(f"Benchmarking {name}...")
+        results[name] = await measure(fn, repeats)
+        logger.info(f"{name}: {results[name]}")
+
+    sources_dir = os.path.join(os.getcwd(), "sources")
+    os.makedirs(sources_dir, exist_ok=True)
+    sources = [
+        (
+            await asyncio.to_thread(
+                make_source_video,
+                os.path.join(sources_dir, f"{spec.label}.mp4"),
+                spec.width,
+                spec.height,
+                spec.fps,
+            ),
+            spec,
+        )
+        for spec in SOURCES
+    ]
+    narrations = {n: await prepare_narration(n) for n in sentence_counts}
+
+    # subtitle rendering: cold rasterizes every cue, warm hits the raster cache
+    raster_cache.clear()
+    for n, (texts, _, _, _) in narrations.items():
+
+        async def subtitles():
+            track = SubtitleGenerator(new_cwd()).build_track(
+                durations=[len(t.split()) / 2.5 for t in texts], sentences=texts
+            )
+            for _, _, text in track:
+                rasterize_text(text, FONT_PATH, 100, "white", "black", 5, None)
+
+        await bench(f"subtitles[sentences={n}]", subtitles)
+
+    if not any(
+        wanted(name, only) for name in ("combine_videos", "generate_video", "start")
+    ):
+        return results
+
+    from app.reels_maker import ReelsMaker, ReelsMakerConfig
+    from app.video_config import VideoGeneratorConfig
+
+    # moviepy is only imported when a moviepy benchmark is selected
+    if any(wanted(name, only) for name in ("combine_videos", "generate_video")):
+        from app.video_gen import VideoGenerator
+
+        for threads in thread_counts:
+            config = VideoGeneratorConfig(font_path=FONT_PATH, threads=threads)
+
+            for path, spec in sources:
+                videos = new_cache()
+
+                async def combine_videos():
+                    await VideoGenerator(
+                        new_cwd(), config, videos_cache=videos
+                    ).combine_videos(
+                        video_paths=[path],
+                        max_duration=10,
+                        max_clip_duration=3,
+                        threads=threads,
+                    )
+
+                await bench(
+                    f"combine_videos[source={spec.label},threads={threads}]",
+                    combine_videos,
+                )
+
+            for n, (_, audio_path, track, duration) in narrations.items():
+                videos = new_cache()
+                raster_cache.clear()
+
+                async def generate_video():
+                    cwd = new_cwd()
+                    generator = VideoGenerator(cwd, config, videos_cache=videos)
+                    try:
+                        background = await generator.build_background_clip(
+                            video_paths=[path for path, _ in sources],
+                            max_duration=duration,
+                            max_clip_duration=3,
+                        )
+                        clip = await generator.compose_video(
+                            background_clip=background,
+                            tts_path=audio_path,
+                            subtitles=track,
+                        )
+                        await generator.render(clip, os.path.join(cwd, "video.mp4"))
+                    finally:
+                        generator.close()
+
+                await bench(
+                    f"generate_video[sentences={n},threads={threads}]", generate_video
+                )
+
+    async with serve_files(sources_dir) as base_url:
+        for backend in backends:
+            for threads in thread_counts:
+                for n in sentence_counts:
+                    videos = new_cache()
+                    raster_cache.clear()
+
+                    async def start():
+                        cwd = new_cwd()
+                        # stage checkpoints would turn every repeat into a
+                        # lookup of the first render
+                        config = ReelsMakerConfig(
+                            cwd=cwd,
+                            prompt="benchmark",
+                            checkpoints=False,
+                            video_gen_config=VideoGeneratorConfig(
+                                font_path=FONT_PATH, threads=threads, backend=backend
+                            ),
+                        )
+                        maker = ReelsMaker(
+                            config,
+                            prompt_generator=FakePromptGenerator(n),
+                            synth_generator=FakeSynthGenerator(cwd),
+                            pexels_client=FakePexelsClient(base_url, sources),
+                        )
+                        maker.videos_cache = videos
+                        maker.downloader = Downloader(cache=videos)
+                        await maker.start()
+
+                    await bench(
+                        f"start[backend={backend},sentences={n},threads={threads}]",
+                        start,
+                    )
+
+    return results
@@ -7,15 +7,27 @@ from uuid import uuid4
 from loguru import logger
 import streamlit as st
 from streamlit.runtime.uploaded_file_manager import UploadedFile
-from app.reels_maker import ReelsMaker, ReelsMakerConfig
+from app.job_queue import JobQueue, WorkerPool, default_workers
+from app.reels_maker import ReelsMakerConfig
+from app.render_profile import RENDER_PROFILE
 from app.synth_gen import VOICE_PROVIDER, SynthConfig
-from app.video_gen import VideoGeneratorConfig
+from app.video_config import VideoGeneratorConfig
+from dotenv import load_dotenv
 
+load_dotenv()
 
-if "queue" not in st.session_state:
-    st.session_state["queue"] = {}
 
-queue: dict[str, ReelsMakerConfig] = st.session_state["queue"]
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """One queue and worker pool per server, shared by every browser session."""
+    queue = JobQueue()
+    # REELS_WORKERS=0 when the workers run separately (python -m app.job_queue)
+    if default_workers() > 0:
+        WorkerPool(default_workers(), queue.path).start()
+    return queue
+
+
+queue = get_job_queue()
 
 
 async def download_to_path(dest: str, buff: UploadedFile) -> str:
@@ -24,6 +36,34 @@ async def download_to_path(dest: str, buff: UploadedFile) -> str:
     return dest
 
 
+async def poll_job(job_id: str):
+    status = st.empty()
+    with st.spinner("Generating reels, this will take ~5mins or less..."):
+        job = queue.get(job_id)
+        while job and job.state in ("queued", "running"):
+            if job.state == "queued":
+                status.info(
+                    f"Waiting in queue, {queue.position(job_id)} reels ahead of yours"
+                )
+            else:
+                status.info("Rendering your reels...")
+
+            await asyncio.sleep(2)
+            job = queue.get(job_id)
+
+    status.empty()
+    del st.session_state["job_id"]
+
+    if not job or job.state == "failed" or not job.result:
+        logger.error(f"job failed: {job_id}: {job and job.error}")
+        st.error(job.error if job else "job not found")
+        return
+
+    st.balloons()
+    st.video(job.result, autoplay=True)
+    st.download_button("Download Reels", job.result, file_name="reels.mp4")
+
+
 async def main():
     st.title("AI Reels Story Maker")
     st.write("Create Engaging Faceless Videos for Social Media in Seconds")
@@ -57,6 +97,10 @@ async def main():
         st.write(
             "We'll automatically download background videos related to your prompt, usefull when you don't have a background video"
         )
+        use_images = st.checkbox(
+            "Use AI images instead",
+            help="a pan and zoom slideshow with one generated image per sentence",
+        )
 
     with upload_video_tab:
         uploaded_videos = st.file_uploader(
@@ -114,12 +158,26 @@ async def main():
 
     threads = st.number_input("Threads", value=cpu_count, step=1, min_value=1)
 
-    submitted = st.button("Generate Reels", use_container_width=True, type="primary")
+    profile = st.selectbox(
+        "Render quality",
+        ["standard", "draft", "final"],
+        help="draft renders 720x1280 quickly, final encodes slower for the upload",
+    )
 
-    if submitted:
-        queue_id = str(uuid4())
+    preview_col, submit_col = st.columns([1, 2])
+    with preview_col:
+        preview = st.button(
+            "Preview",
+            use_container_width=True,
+            help="a 540x960 proxy that renders in a fraction of the time",
+        )
+    with submit_col:
+        submitted = st.button(
+            "Generate Reels", use_container_width=True, type="primary"
+        )
 
-        cwd = os.path.join(os.getcwd(), "tmp", queue_id)
+    if submitted or preview:
+        cwd = os.path.join(os.getcwd(), "tmp", str(uuid4()))
         os.makedirs(cwd, exist_ok=True)
 
         # create config
@@ -128,6 +186,7 @@ async def main():
             cwd=cwd,
             prompt=prompt,
             sentence=sentence,
+            background="images" if use_images else "videos",
             video_gen_config=VideoGeneratorConfig(
                 bg_color=str(bg_color),
                 fontsize=int(fontsize),
@@ -136,6 +195,7 @@ async def main():
                 subtitles_position=str(subtitles_position),
                 text_color=str(text_color),
                 threads=int(threads),
+                profile=typing.cast(RENDER_PROFILE, "preview" if preview else profile),
                 # watermark_path="images/watermark.png",
             ),
             synth_config=SynthConfig(
@@ -162,23 +222,12 @@ async def main():
         st.write(
             "This process is CPU-intensive and will take a considerable time to complete"
         )
-        with st.spinner("Generating reels, this will take ~5mins or less..."):
-            try:
-                if len(queue.items()) > 1:
-                    raise Exception("queue is full - someone else is generating reels")
-
-                logger.debug("Added to queue")
-                queue[queue_id] = config
-
-                reels_maker = ReelsMaker(config)
-                video_path = await reels_maker.start()
-                st.balloons()
-                st.video(video_path, autoplay=True)
-                st.download_button("Download Reels", video_path, file_name="reels.mp4")
-            except Exception as e:
-                del queue[queue_id]
-                logger.exception(f"removed from queue: {queue_id}: -> {e}")
-                st.error(e)
+        st.session_state["job_id"] = queue.enqueue(config.model_dump_json())
+        logger.debug(f"Added to queue: {st.session_state['job_id']}")
+
+    # keep polling across reruns until the job finishes
+    if "job_id" in st.session_state:
+        await poll_job(st.session_state["job_id"])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,68 @@
+import asyncio
+import wave
+
+import numpy as np
+import pytest
+
+from app.audio_assembly import AudioAssembler, mp3_gapless_length
+from app.utils import run_ffmpeg
+
+
+def make_tone(path: str, duration: float) -> str:
+    run_ffmpeg(["-f", "lavfi", "-i", f"sine=duration={duration}", path])
+    return path
+
+
+def test_assemble_durations_and_gaps(tmp_path):
+    first = make_tone(str(tmp_path / "first.wav"), 1.0)
+    second = make_tone(str(tmp_path / "second.wav"), 0.5)
+    assembler = AudioAssembler(sample_rate=16000)
+
+    pcm, durations = assembler.assemble([first, second, first], gap=0.25)
+
+    assert durations == pytest.approx([1.0, 0.5, 1.0])
+    assert len(pcm) == round((2.5 + 2 * 0.25) * 16000)
+    assert pcm.shape[1] == 2
+    # the gap is silent
+    assert not pcm[16000 : 16000 + 4000].any()
+
+
+def test_write_wav(tmp_path):
+    tone = make_tone(str(tmp_path / "tone.wav"), 1.0)
+    assembler = AudioAssembler()
+    pcm, _ = assembler.assemble([tone])
+
+    out = assembler.write_wav(pcm, str(tmp_path / "master.wav"))
+
+    with wave.open(out) as f:
+        assert f.getnframes() == len(pcm)
+        assert f.getframerate() == 44100
+
+
+@pytest.mark.asyncio
+async def test_decode_stream_matches_file(tmp_path):
+    tone = make_tone(str(tmp_path / "tone.mp3"), 1.0)
+    assembler = AudioAssembler()
+
+    async def chunks():
+        with open(tone, "rb") as f:
+            while chunk := f.read(1000):
+                yield chunk
+                await asyncio.sleep(0)
+
+    pcm = await assembler.decode_stream(chunks())
+
+    # a pipe cannot be seeked, the encoder padding is trimmed from the header
+    assert mp3_gapless_length(open(tone, "rb").read(8192)) == (44100, 44100)
+    assert np.array_equal(pcm, assembler.decode(tone))
+    _, durations = assembler.assemble([tone], decoded={tone: pcm})
+    assert durations == [1.0]
+
+
+@pytest.mark.asyncio
+async def test_decode_stream_reports_garbage(tmp_path):
+    async def chunks():
+        yield b"not audio" * 100
+
+    with pytest.raises(RuntimeError, match="Could not decode stream"):
+        await AudioAssembler().decode_stream(chunks())
@@ -0,0 +1,36 @@
+import io
+import json
+import os
+
+from app.batch import read_records, run_batch
+
+
+def fake_render(line_no: int, record_json: str, threads: int) -> dict:
+    """Stands in for render_record in the worker processes."""
+    action = json.loads(record_json)["action"]
+    if action == "raise":
+        raise ValueError("bad record")
+    if action == "crash":
+        os._exit(1)
+    return {"line": line_no, "status": "done", "threads": threads}
+
+
+def test_failures_do_not_abort_the_batch():
+    actions = ["ok", "raise", "crash", "ok", "ok", "ok"]
+    records = io.StringIO("".join(json.dumps({"action": a}) + "\n" for a in actions))
+    out = io.StringIO()
+
+    failures = run_batch(
+        read_records(records), out, jobs=1, threads=3, render=fake_render
+    )
+
+    results = {r["line"]: r for r in map(json.loads, out.getvalue().splitlines())}
+    # every record gets exactly one result line
+    assert sorted(results) == list(range(1, 7))
+    assert failures == sum(r["status"] == "failed" for r in results.values())
+
+    assert results[1] == {"line": 1, "status": "done", "threads": 3}
+    assert results[2]["error"] == "ValueError: bad record"
+    assert results[3]["error"].startswith("BrokenProcessPool")
+    # records queued after the crash are rendered by a fresh pool
+    assert results[6]["status"] == "done"
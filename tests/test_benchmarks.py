@@ -0,0 +1,54 @@
+import pytest
+
+from app.pexel import pick_video_urls
+from app.utils import probe_duration
+from benchmarks.fixtures import (
+    FakePexelsClient,
+    SourceSpec,
+    make_source_video,
+    make_speech,
+)
+from benchmarks.run import compare, main
+
+
+def test_compare_flags_slowdowns_only():
+    baseline = {
+        "combine_videos[a]": {"cold": 10.0, "warm": 4.0},
+        "subtitles[b]": {"cold": 0.05, "warm": 0.01},
+    }
+    results = {
+        "combine_videos[a]": {"cold": 14.0, "warm": 3.0},
+        "subtitles[b]": {"cold": 0.1, "warm": None},
+        "start[new]": {"cold": 99.0, "warm": None},
+    }
+
+    regressions = compare(results, baseline, tolerance=0.25, min_delta=0.1)
+
+    assert regressions == ["combine_videos[a] cold: 14.000s, baseline 10.000s (+40%)"]
+
+
+def test_missing_baseline_fails_when_required(tmp_path, capsys):
+    missing = str(tmp_path / "baseline.json")
+
+    assert main(["--baseline", missing, "--require-baseline"]) == 2
+    assert "No baseline" in capsys.readouterr().err
+
+
+def test_synthetic_media(tmp_path):
+    video = make_source_video(str(tmp_path / "src.mp4"), 320, 180, 24, duration=2)
+    speech = make_speech(str(tmp_path / "speech.wav"), "one two three four five")
+
+    assert probe_duration(video) == pytest.approx(2, abs=0.1)
+    assert probe_duration(speech) == pytest.approx(2, abs=0.05)
+
+
+@pytest.mark.asyncio
+async def test_fake_pexels_urls_pass_the_picker():
+    spec = SourceSpec("small", 320, 180, 24)
+    client = FakePexelsClient("http://127.0.0.1:1", [("/tmp/src.mp4", spec)])
+
+    response = await client.search("ocean", per_page=2)
+
+    assert pick_video_urls(response, limit=1, min_dur=10) == [
+        "http://127.0.0.1:1/videos.pexels.com/video-files/src.mp4"
+    ]
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from app.cache import CacheStore
+
+
+def test_put_and_get(tmp_path):
+    store = CacheStore(str(tmp_path))
+    key = "tiktok_en_us_001_Ça va? " + "a very long sentence " * 50
+
+    path = store.put_bytes(key, b"mp3", ext=".mp3")
+
+    assert store.get(key) == path
+    assert os.path.basename(path) == f"{store.digest(key)}.mp3"
+    assert store.get("tiktok_en_us_001_") is None
+
+
+def test_reserve_discards_failed_writes(tmp_path):
+    store = CacheStore(str(tmp_path))
+
+    with pytest.raises(RuntimeError):
+        with store.reserve("key", ".mp4") as tmp:
+            open(tmp, "wb").write(b"half")
+            raise RuntimeError("interrupted")
+
+    assert store.get("key") is None
+    assert not os.path.exists(store.path_for("key", ".mp4"))
+
+
+def test_lru_eviction(tmp_path):
+    store = CacheStore(str(tmp_path), max_bytes=20)
+
+    store.put_bytes("a", b"x" * 10)
+    store.put_bytes("b", b"x" * 10)
+    store.get("a")
+    store.put_bytes("c", b"x" * 10)
+
+    assert store.get("a") is not None
+    assert store.get("b") is None
+    assert store.get("c") is not None
+    assert store.total_bytes() == 20
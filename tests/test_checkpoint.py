@@ -0,0 +1,78 @@
+import os
+
+from app.cache import CacheStore
+from app.checkpoint import Checkpoints, file_hash, stage_key
+from app.utils import run_ffmpeg
+
+
+def test_stage_key_is_order_independent():
+    assert stage_key("audio", a=1, b=[1, 2]) == stage_key("audio", b=[1, 2], a=1)
+    assert stage_key("audio", a=1) != stage_key("subtitles", a=1)
+
+
+def test_file_hash_follows_content(tmp_path):
+    a, b = tmp_path / "a.mp3", tmp_path / "b.mp3"
+    a.write_bytes(b"narration")
+    b.write_bytes(b"narration")
+
+    assert file_hash(str(a)) == file_hash(str(b))
+    assert file_hash(None) is None
+    assert file_hash(str(tmp_path / "missing.mp3")) is None
+
+
+def test_checkpoint_roundtrip(tmp_path):
+    checkpoints = Checkpoints(CacheStore(str(tmp_path / "store")))
+    key = stage_key("audio", speech=["abc"])
+
+    output = tmp_path / "master__audio.wav"
+    output.write_bytes(b"RIFF")
+    checkpoints.save_file(key, str(output), ".wav")
+    checkpoints.save_json(stage_key("audio_timing", audio=key), {"duration": 1.5})
+
+    dest = str(tmp_path / "rerun" / "master__audio.wav")
+    os.makedirs(os.path.dirname(dest))
+    assert checkpoints.load_file(key, dest) == dest
+    with open(dest, "rb") as f:
+        assert f.read() == b"RIFF"
+    assert checkpoints.load_json(stage_key("audio_timing", audio=key)) == {
+        "duration": 1.5
+    }
+    assert checkpoints.load_file(stage_key("audio", speech=["xyz"]), dest) is None
+
+
+def test_disabled_checkpoints_store_nothing(tmp_path):
+    store = CacheStore(str(tmp_path / "store"))
+    checkpoints = Checkpoints(store, enabled=False)
+
+    checkpoints.save_json("key", [1])
+    assert checkpoints.load_json("key") is None
+    assert store.total_bytes() == 0
+
+
+def test_rerun_in_same_cwd_keeps_older_checkpoints(tmp_path):
+    checkpoints = Checkpoints(CacheStore(str(tmp_path / "store")))
+    output = str(tmp_path / "a" / "final.mp4")
+    os.makedirs(os.path.dirname(output))
+
+    def render(color: str) -> bytes:
+        # ffmpeg -y truncates and writes over the existing file in place
+        run_ffmpeg(
+            ["-f", "lavfi", "-i", f"color=c={color}:size=32x32:duration=0.2", output]
+        )
+        checkpoints.save_file(stage_key("final", color=color), output, ".mp4")
+        with open(output, "rb") as f:
+            return f.read()
+
+    white = render("white")
+    red = render("red")
+    assert white != red
+
+    # a rerun restoring white into the same cwd, then rendering red over it
+    assert checkpoints.load_file(stage_key("final", color="white"), output)
+    render("red")
+
+    dest = str(tmp_path / "b" / "final.mp4")
+    os.makedirs(os.path.dirname(dest))
+    checkpoints.load_file(stage_key("final", color="white"), dest)
+    with open(dest, "rb") as f:
+        assert f.read() == white
@@ -0,0 +1,78 @@
+import asyncio
+import os
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+from app.cache import CacheStore
+from app.downloader import Downloader
+from app.utils import link_or_copy
+
+PAYLOAD = os.urandom(256 * 1024)
+
+
+@pytest_asyncio.fixture
+async def file_server():
+    requests = []
+
+    async def video(request):
+        requests.append(request.headers.get("Range"))
+        await asyncio.sleep(0.05)
+        start = 0
+        if "Range" in request.headers:
+            start = int(request.headers["Range"].split("=")[1].rstrip("-"))
+            return web.Response(body=PAYLOAD[start:], status=206)
+        return web.Response(body=PAYLOAD)
+
+    app = web.Application()
+    app.router.add_get("/video-files/clip.mp4", video)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+    yield f"http://127.0.0.1:{port}/video-files/clip.mp4", requests
+
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fetches_are_coalesced(file_server, tmp_path):
+    url, requests = file_server
+    downloader = Downloader(cache=CacheStore(str(tmp_path / "cache")))
+
+    paths = await asyncio.gather(*(downloader.fetch(url, ".mp4") for _ in range(4)))
+
+    assert len(set(paths)) == 1
+    assert open(paths[0], "rb").read() == PAYLOAD
+    assert requests == [None]
+
+
+@pytest.mark.asyncio
+async def test_interrupted_download_resumes(file_server, tmp_path):
+    url, requests = file_server
+    cache = CacheStore(str(tmp_path / "cache"))
+    downloader = Downloader(cache=cache)
+
+    part_path = cache.path_for(url, ".mp4") + ".part"
+    os.makedirs(os.path.dirname(part_path))
+    with open(part_path, "wb") as f:
+        f.write(PAYLOAD[:1000])
+
+    path = await downloader.fetch(url, ".mp4")
+
+    assert open(path, "rb").read() == PAYLOAD
+    assert requests == ["bytes=1000-"]
+    assert not os.path.exists(part_path)
+
+
+def test_link_or_copy_hardlinks(tmp_path):
+    src = tmp_path / "src.mp4"
+    src.write_bytes(b"video")
+
+    dest = link_or_copy(str(src), str(tmp_path / "dest.mp4"))
+
+    assert os.path.samefile(src, dest)
@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+from app.cache import CacheStore
+from app.eleven_tts import ElevenLabsClient, ElevenLabsError
+from app.synth_gen import SynthConfig, SynthGenerator
+
+AUDIO = bytes(range(256)) * 64
+
+
+@pytest_asyncio.fixture
+async def stub_api():
+    """Local stand-in for the ElevenLabs streaming TTS endpoint."""
+    state = {
+        "active": 0,
+        "max_active": 0,
+        "requests": [],
+        "release": None,
+    }
+
+    async def stream(request):
+        if request.headers.get("xi-api-key") != "test-key":
+            return web.json_response({"detail": "invalid api key"}, status=401)
+
+        payload = await request.json()
+        state["requests"].append((request.match_info["voice_id"], payload))
+        state["active"] += 1
+        state["max_active"] = max(state["max_active"], state["active"])
+        try:
+            response = web.StreamResponse(headers={"Content-Type": "audio/mpeg"})
+            await response.prepare(request)
+            for offset in range(0, len(AUDIO), 4096):
+                await response.write(AUDIO[offset : offset + 4096])
+                if offset == 0 and state["release"] is not None:
+                    # hold the rest back until the client saw the first chunk
+                    await state["release"].wait()
+                await asyncio.sleep(0.01)
+            await response.write_eof()
+            return response
+        finally:
+            state["active"] -= 1
+
+    app = web.Application()
+    app.router.add_post("/v1/text-to-speech/{voice_id}/stream", stream)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+    yield f"http://127.0.0.1:{port}", state
+
+    await runner.cleanup()
+
+
+def make_generator(tmp_path, base_url: str, api_key: str = "test-key"):
+    client = ElevenLabsClient(
+        base_url=base_url, api_key=api_key, max_concurrency_per_key=2, chunk_size=1024
+    )
+    generator = SynthGenerator(
+        str(tmp_path / "work"),
+        SynthConfig(voice_provider="elevenlabs", max_concurrency=8),
+        cache=CacheStore(str(tmp_path / "speech")),
+        eleven_client=client,
+    )
+    return generator, client
+
+
+@pytest.mark.asyncio
+async def test_streams_into_cache_within_key_limit(stub_api, tmp_path):
+    base_url, state = stub_api
+    generator, client = make_generator(tmp_path, base_url)
+    texts = ["one.", "two.", "three.", "four.", "two."]
+
+    paths = await generator.generate_audio_batch(texts)
+    again = await generator.generate_audio_batch(texts)
+    await client.close()
+
+    assert all(open(path, "rb").read() == AUDIO for path in paths)
+    assert paths[1] == paths[4]
+    assert again == paths
+    # repeated and cached sentences are not requested again
+    assert len(state["requests"]) == 4
+    assert state["max_active"] == 2
+
+    voice_id, payload = state["requests"][0]
+    assert voice_id == generator.eleven_voice_id
+    assert payload["model_id"] == "eleven_multilingual_v2"
+    assert payload["voice_settings"]["stability"] == 0.71
+
+
+@pytest.mark.asyncio
+async def test_consumer_reads_before_synthesis_ends(stub_api, tmp_path):
+    base_url, state = stub_api
+    state["release"] = asyncio.Event()
+    generator, client = make_generator(tmp_path, base_url)
+    received = []
+
+    async def consumer(text, chunks):
+        async for chunk in chunks:
+            received.append(chunk)
+            # the server only finishes once the first bytes were consumed
+            state["release"].set()
+
+    path = await generator.generate_audio("streamed.", consumer=consumer)
+    await client.close()
+
+    assert b"".join(received) == AUDIO
+    assert open(path, "rb").read() == AUDIO
+
+
+@pytest.mark.asyncio
+async def test_failed_request_is_not_cached(stub_api, tmp_path):
+    base_url, state = stub_api
+    generator, client = make_generator(tmp_path, base_url, api_key="wrong")
+
+    with pytest.raises(ElevenLabsError, match="401"):
+        await generator.generate_audio("denied.")
+    await client.close()
+
+    assert generator.cache.get(generator.speech_cache_key("denied.")) is None
+    assert state["requests"] == []
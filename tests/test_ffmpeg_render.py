@@ -0,0 +1,191 @@
+import subprocess
+
+import numpy as np
+import pytest
+
+from app.cache import CacheStore
+from app.ffmpeg_render import FFmpegRenderer
+from app.frame_pipeline import FramePipelineRenderer
+from app.subtitle_track import SubtitleTrack
+from app.timeline import plan_segments
+from app.utils import ffmpeg_binary, probe_duration, run_ffmpeg
+from app.video_config import VideoGeneratorConfig
+
+SUBTITLES = """1
+00:00:00,000 --> 00:00:01,500
+Imagine
+
+2
+00:00:01,500 --> 00:00:04,000
+waking up
+"""
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+    """Synthetic sources, narration and subtitles."""
+    paths = {
+        "landscape": str(tmp_path / "landscape.mp4"),
+        "portrait": str(tmp_path / "portrait.mp4"),
+        "narration": str(tmp_path / "narration.mp3"),
+        "subtitles": str(tmp_path / "subtitles.srt"),
+    }
+    run_ffmpeg(
+        ["-f", "lavfi", "-i", "testsrc=size=640x360:rate=25:duration=3"]
+        + ["-pix_fmt", "yuv420p", paths["landscape"]]
+    )
+    run_ffmpeg(
+        ["-f", "lavfi", "-i", "testsrc2=size=360x640:rate=30:duration=2"]
+        + ["-pix_fmt", "yuv420p", paths["portrait"]]
+    )
+    run_ffmpeg(["-f", "lavfi", "-i", "sine=duration=4", paths["narration"]])
+    with open(paths["subtitles"], "w") as f:
+        f.write(SUBTITLES)
+    return paths
+
+
+def read_frame(path: str, t: float, size=(1080, 1920)) -> np.ndarray:
+    raw = subprocess.run(
+        [ffmpeg_binary(), "-loglevel", "error", "-ss", str(t), "-i", path]
+        + ["-frames:v", "1", "-f", "rawvideo", "-pix_fmt", "gray", "-"],
+        capture_output=True,
+        check=True,
+    ).stdout
+    return np.frombuffer(raw, np.uint8).reshape(size[1], size[0]).astype(np.int16)
+
+
+def test_plan_segments_advances_and_wraps():
+    segments = plan_segments([10.0, 8.0], max_duration=12, max_clip_duration=3)
+    assert [tuple(s) for s in segments] == [
+        (0, 0.0, 3.0),
+        (1, 0.0, 3.0),
+        (0, 3.0, 6.0),
+        (1, 3.0, 6.0),
+    ]
+
+    segments = plan_segments([3.0, 2.0], max_duration=7, max_clip_duration=3)
+    assert sum(s.duration for s in segments) == pytest.approx(7)
+    # the first source is used up after one segment and starts over
+    assert tuple(segments[2]) == (0, 0.0, 2.0)
+
+
+def test_plan_segments_skips_sub_frame_sources():
+    segments = plan_segments([0.01, 4.0], max_duration=6, max_clip_duration=3, fps=30)
+    assert {s.source for s in segments} == {1}
+    assert sum(s.duration for s in segments) == pytest.approx(6)
+
+    with pytest.raises(ValueError, match="one frame"):
+        plan_segments([0.01, 0.0], max_duration=6, max_clip_duration=3, fps=30)
+    with pytest.raises(ValueError, match="one frame"):
+        plan_segments([], max_duration=6, max_clip_duration=3)
+
+
+@pytest.mark.asyncio
+async def test_backends_are_equivalent(fixtures, tmp_path):
+    pytest.importorskip("moviepy")
+    from app.video_gen import VideoGenerator
+
+    config = VideoGeneratorConfig(threads=2)
+    video_paths = [fixtures["landscape"], fixtures["portrait"]]
+    videos = CacheStore(str(tmp_path / "videos"))
+
+    ffmpeg_path = await FFmpegRenderer(
+        str(tmp_path), config, videos_cache=videos
+    ).render(
+        video_paths=video_paths,
+        tts_path=fixtures["narration"],
+        subtitles=fixtures["subtitles"],
+        output_path=str(tmp_path / "ffmpeg.mp4"),
+    )
+
+    generator = VideoGenerator(str(tmp_path), config, videos_cache=videos)
+    background = await generator.build_background_clip(
+        video_paths, max_duration=4, max_clip_duration=3
+    )
+    clip = await generator.compose_video(
+        background, fixtures["narration"], fixtures["subtitles"]
+    )
+    clip = await generator.add_fade_out(clip)
+    moviepy_path = await generator.render(clip, str(tmp_path / "moviepy.mp4"))
+    generator.close()
+
+    assert probe_duration(ffmpeg_path) == pytest.approx(
+        probe_duration(moviepy_path), abs=0.1
+    )
+    for t in (0.5, 2.2, 3.5):
+        diff = np.abs(read_frame(ffmpeg_path, t) - read_frame(moviepy_path, t))
+        assert diff.mean() < 12, f"frames differ at {t}s"
+
+
+@pytest.mark.asyncio
+async def test_preview_profile_renders_a_small_proxy(fixtures, tmp_path):
+    config = VideoGeneratorConfig(threads=2, profile="preview")
+
+    path = await FFmpegRenderer(
+        str(tmp_path), config, videos_cache=CacheStore(str(tmp_path / "videos"))
+    ).render(
+        video_paths=[fixtures["landscape"], fixtures["portrait"]],
+        tts_path=fixtures["narration"],
+        subtitles=fixtures["subtitles"],
+        output_path=str(tmp_path / "preview.mp4"),
+    )
+
+    assert probe_duration(path) == pytest.approx(4, abs=0.1)
+    assert read_frame(path, 1.0, size=(540, 960)).shape == (960, 540)
+
+
+def audio_rms(path: str, start: float, duration: float) -> float:
+    raw = subprocess.run(
+        [ffmpeg_binary(), "-loglevel", "error", "-ss", str(start), "-t"]
+        + [str(duration), "-i", path, "-ac", "1", "-f", "s16le", "-"],
+        capture_output=True,
+        check=True,
+    ).stdout
+    samples = np.frombuffer(raw, np.int16).astype(np.float64) / 32768
+    return float(np.sqrt(np.mean(samples**2)))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("renderer", [FFmpegRenderer, FramePipelineRenderer])
+async def test_short_music_keeps_the_narration_level(renderer, fixtures, tmp_path):
+    music_path = str(tmp_path / "music.mp3")
+    run_ffmpeg(["-f", "lavfi", "-i", "sine=frequency=220:duration=1", music_path])
+    config = VideoGeneratorConfig(threads=2, profile="preview", normalize_sources=False)
+
+    async def render(name: str, background_music_path: str | None) -> str:
+        return await renderer(str(tmp_path), config).render(
+            video_paths=[fixtures["landscape"]],
+            tts_path=fixtures["narration"],
+            subtitles=None,
+            output_path=str(tmp_path / name),
+            background_music_path=background_music_path,
+        )
+
+    plain = await render("plain.mp4", None)
+    mixed = await render("mixed.mp4", music_path)
+
+    # once the music has ended only the narration is left, at its own level
+    assert audio_rms(mixed, 2, 1.5) == pytest.approx(audio_rms(plain, 2, 1.5), rel=0.05)
+
+
+def test_cue_track_is_exact_and_quoted(tmp_path):
+    cwd = tmp_path / "it's here"
+    cwd.mkdir()
+    # thousands of cues a third of a second long, then an overlapping one
+    cues = [(i / 3, (i + 1) / 3, f"word {i % 5}") for i in range(3000)]
+    cues.append((999.5, 1001.0, "overlap"))
+    renderer = FFmpegRenderer(str(cwd), VideoGeneratorConfig(profile="preview"))
+
+    playlist = renderer.write_cue_track(SubtitleTrack(cues), duration=1002)
+
+    with open(playlist) as f:
+        durations = [
+            float(line.split()[1]) for line in f if line.startswith("duration")
+        ]
+    assert min(durations) > 0
+    assert sum(durations[:-1]) == pytest.approx(1001.0, abs=1e-6)
+
+    # ffmpeg's concat demuxer reads the quoted paths
+    run_ffmpeg(
+        ["-f", "concat", "-safe", "0", "-i", playlist, "-t", "1", "-f", "null", "-"]
+    )
@@ -0,0 +1,120 @@
+import subprocess
+
+import pytest
+
+from app.cache import CacheStore
+from app.checkpoint import Checkpoints
+from app.ffmpeg_render import FFmpegRenderer
+from app.frame_pipeline import FramePipelineRenderer
+from app.layout import OutputLayout, master_size
+from app.reels_maker import ReelsMaker, ReelsMakerConfig
+from app.subtitle_track import SubtitleTrack
+from app.utils import ffmpeg_binary, probe_duration, run_ffmpeg
+from app.video_config import OutputFormat, VideoGeneratorConfig
+from benchmarks.fixtures import FakePromptGenerator, FakeSynthGenerator
+
+FORMATS = [OutputFormat.model_validate(f) for f in ("9:16", "1:1", "16:9")]
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+    paths = {
+        "landscape": str(tmp_path / "landscape.mp4"),
+        "narration": str(tmp_path / "narration.mp3"),
+    }
+    run_ffmpeg(
+        ["-f", "lavfi", "-i", "testsrc=size=640x360:rate=25:duration=3"]
+        + ["-pix_fmt", "yuv420p", paths["landscape"]]
+    )
+    run_ffmpeg(["-f", "lavfi", "-i", "sine=duration=2", paths["narration"]])
+    return paths
+
+
+def probe_size(path: str) -> tuple[int, int]:
+    frame = subprocess.run(
+        [ffmpeg_binary(), "-loglevel", "error", "-i", path]
+        + ["-frames:v", "1", "-f", "image2pipe", "-vcodec", "ppm", "-"],
+        capture_output=True,
+        check=True,
+    ).stdout
+    width, height = frame.split(b"\n")[1].split()
+    return int(width), int(height)
+
+
+def test_formats_are_cut_from_one_master_frame():
+    base = VideoGeneratorConfig(profile="preview")
+    configs = [f.apply(base) for f in FORMATS] + [
+        OutputFormat(aspect_ratio="4:5", subtitles_position="center,bottom").apply(base)
+    ]
+
+    master = master_size(configs)
+    layouts = [OutputLayout(config, master) for config in configs]
+
+    assert master == (960, 960)
+    portrait, square, landscape, feed = layouts
+    assert portrait.crop == (210, 0, 540, 960) and not portrait.scaled
+    assert landscape.crop == (0, 210, 960, 540) and not landscape.scaled
+    assert square.crop == (0, 0, 960, 960) and square.scaled
+    assert (feed.width, feed.height) == (540, 676)
+    assert feed.crop == (97, 0, 766, 960)
+    assert feed.config.subtitles_position == "center,bottom"
+    # a lone portrait format keeps the plain 9:16 render
+    assert master_size([base]) == base.output_size
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("renderer", [FFmpegRenderer, FramePipelineRenderer])
+async def test_every_format_renders_from_one_pass(renderer, fixtures, tmp_path):
+    config = VideoGeneratorConfig(profile="preview", threads=2, normalize_sources=False)
+    formats = [f.apply(config) for f in FORMATS]
+    paths = [str(tmp_path / f"{f.aspect_ratio.replace(':', 'x')}.mp4") for f in FORMATS]
+
+    await renderer(str(tmp_path), config, formats=formats).render_formats(
+        [fixtures["landscape"]],
+        fixtures["narration"],
+        SubtitleTrack([(0.0, 2.0, "Imagine")]),
+        paths,
+    )
+
+    assert [probe_size(path) for path in paths] == [(540, 960), (540, 540), (960, 540)]
+    for path in paths:
+        assert probe_duration(path) == pytest.approx(2, abs=0.1)
+
+
+@pytest.mark.asyncio
+async def test_reels_maker_caches_each_format(fixtures, tmp_path):
+    def make(formats: list[str]) -> ReelsMaker:
+        config = ReelsMakerConfig(
+            cwd=str(tmp_path),
+            sentence="One small step. Then another one",
+            video_paths=[fixtures["landscape"]],
+            formats=formats,
+            video_gen_config=VideoGeneratorConfig(
+                backend="frames", threads=2, profile="preview"
+            ),
+        )
+        maker = ReelsMaker(
+            config,
+            prompt_generator=FakePromptGenerator(2),
+            synth_generator=FakeSynthGenerator(str(tmp_path)),
+        )
+        maker.checkpoints = Checkpoints(CacheStore(str(tmp_path / "stages")))
+        maker.videos_cache = CacheStore(str(tmp_path / "videos"))
+        return maker
+
+    first = make(["9:16", "1:1"])
+    await first.start()
+    assert [probe_size(path) for path in first.final_video_paths] == [
+        (540, 960),
+        (540, 540),
+    ]
+
+    # adding a format renders only the new one
+    second = make(["9:16", "1:1", "16:9"])
+    await second.start()
+    writes = [s for s in second.profiler.spans if s.name == "final_write"]
+    assert [s.labels["formats"] for s in writes] == ["1"]
+    assert probe_size(second.final_video_paths[2]) == (960, 540)
+
+    with pytest.raises(ValueError, match="ffmpeg or frames"):
+        ReelsMakerConfig(cwd=str(tmp_path), formats=["9:16", "1:1"])
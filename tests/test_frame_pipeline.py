@@ -0,0 +1,112 @@
+import subprocess
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.cache import CacheStore
+from app.ffmpeg_render import FFmpegRenderer
+from app.frame_pipeline import FramePipelineRenderer, FramePool
+from app.instrumentation import StageProfiler, current_profiler
+from app.subtitle_track import SubtitleTrack
+from app.utils import ffmpeg_binary, probe_duration, run_ffmpeg
+from app.video_config import VideoGeneratorConfig
+
+WIDTH, HEIGHT = 540, 960
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+    """Synthetic sources, narration, music and a watermark."""
+    paths = {
+        "landscape": str(tmp_path / "landscape.mp4"),
+        "portrait": str(tmp_path / "portrait.mp4"),
+        "narration": str(tmp_path / "narration.mp3"),
+        "music": str(tmp_path / "music.mp3"),
+        "watermark": str(tmp_path / "watermark.png"),
+    }
+    run_ffmpeg(
+        ["-f", "lavfi", "-i", "testsrc=size=640x360:rate=25:duration=3"]
+        + ["-pix_fmt", "yuv420p", paths["landscape"]]
+    )
+    run_ffmpeg(
+        ["-f", "lavfi", "-i", "testsrc2=size=360x640:rate=30:duration=2"]
+        + ["-pix_fmt", "yuv420p", paths["portrait"]]
+    )
+    run_ffmpeg(["-f", "lavfi", "-i", "sine=duration=4", paths["narration"]])
+    run_ffmpeg(["-f", "lavfi", "-i", "sine=frequency=220:duration=6", paths["music"]])
+    Image.new("RGBA", (80, 40), (255, 255, 255, 200)).save(paths["watermark"])
+    return paths
+
+
+def read_frame(path: str, t: float) -> np.ndarray:
+    raw = subprocess.run(
+        [ffmpeg_binary(), "-loglevel", "error", "-ss", str(t), "-i", path]
+        + ["-frames:v", "1", "-f", "rawvideo", "-pix_fmt", "gray", "-"],
+        capture_output=True,
+        check=True,
+    ).stdout
+    return np.frombuffer(raw, np.uint8).reshape(HEIGHT, WIDTH).astype(np.int16)
+
+
+def test_pool_reuses_a_fixed_set_of_buffers():
+    pool = FramePool((4, 4, 3), budget_bytes=3 * 48 + 10)
+    assert len(pool) == 3 and pool.nbytes == 144
+
+    first = pool.acquire()
+    second = pool.acquire()
+    pool.release(first)
+    assert pool.acquire() is first
+    pool.release(second)
+
+    assert pool.peak_in_use == 2
+    assert pool.peak_bytes == 96
+
+    with pytest.raises(ValueError, match="less than two"):
+        FramePool((4, 4, 3), budget_bytes=60)
+
+
+@pytest.mark.asyncio
+async def test_pooled_render_matches_the_filtergraph(fixtures, tmp_path):
+    config = VideoGeneratorConfig(
+        font_path="fonts/bold_font.ttf",
+        threads=2,
+        profile="preview",
+        watermark_path=fixtures["watermark"],
+        frame_memory_budget=4 * WIDTH * HEIGHT * 3,
+    )
+    track = SubtitleTrack([(0.0, 1.5, "Imagine"), (1.5, 4.0, "waking up")])
+    sources = [fixtures["landscape"], fixtures["portrait"]]
+
+    videos = CacheStore(str(tmp_path / "videos"))
+    expected = await FFmpegRenderer(str(tmp_path), config, videos_cache=videos).render(
+        sources,
+        fixtures["narration"],
+        track,
+        str(tmp_path / "ffmpeg.mp4"),
+        background_music_path=fixtures["music"],
+    )
+
+    profiler = StageProfiler()
+    token = current_profiler.set(profiler)
+    try:
+        with profiler.span("final_write"):
+            pooled = await FramePipelineRenderer(
+                str(tmp_path), config, videos_cache=videos
+            ).render(
+                sources,
+                fixtures["narration"],
+                track,
+                str(tmp_path / "frames.mp4"),
+                background_music_path=fixtures["music"],
+            )
+    finally:
+        current_profiler.reset(token)
+
+    assert probe_duration(pooled) == pytest.approx(probe_duration(expected), abs=0.05)
+    for t in (0.5, 2.0, 3.5):
+        difference = np.abs(read_frame(pooled, t) - read_frame(expected, t))
+        assert difference.mean() < 3, t
+
+    peak = profiler.spans[0].frame_buffer_bytes
+    assert 0 < peak <= config.frame_memory_budget
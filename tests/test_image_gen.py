@@ -0,0 +1,173 @@
+import asyncio
+import io
+import os
+
+import numpy as np
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from PIL import Image
+
+from app.cache import CacheStore
+from app.checkpoint import Checkpoints
+from app.image_gen import ImageGenError, ImageGenerator
+from app.reels_maker import ReelsMaker, ReelsMakerConfig
+from app.render_profile import RENDER_PROFILES
+from app.slideshow import Slideshow
+from app.utils import probe_duration
+from app.video_config import VideoGeneratorConfig
+from benchmarks.fixtures import FakePromptGenerator, FakeSynthGenerator
+
+
+@pytest_asyncio.fixture
+async def image_server():
+    """Local stand-in for the text-to-image API, answers with a flat colour per prompt."""
+    state = {"prompts": [], "active": 0, "max_active": 0}
+
+    async def generate(request):
+        prompt = request.match_info["prompt"]
+        if prompt == "broken":
+            return web.Response(text="model overloaded", content_type="text/plain")
+
+        state["prompts"].append(prompt)
+        state["active"] += 1
+        state["max_active"] = max(state["max_active"], state["active"])
+        await asyncio.sleep(0.05)
+        state["active"] -= 1
+
+        size = (int(request.query["width"]), int(request.query["height"]))
+        colour = tuple(ord(c) % 256 for c in (prompt * 3)[:3])
+        buffer = io.BytesIO()
+        Image.new("RGB", size, colour).save(buffer, "PNG")
+        return web.Response(body=buffer.getvalue(), content_type="image/png")
+
+    app = web.Application()
+    app.router.add_get("/prompt/{prompt}", generate)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+    yield f"http://127.0.0.1:{port}/prompt", state
+
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_images_are_cached_and_bounded(image_server, tmp_path):
+    base_url, state = image_server
+    generator = ImageGenerator(
+        base_url=base_url, cache=CacheStore(str(tmp_path)), max_concurrency=2
+    )
+
+    async def later(prompt: str) -> str:
+        await asyncio.sleep(0.01)
+        return prompt
+
+    prompts = ["a quiet lake", later("a red fox"), "a city at night", "a quiet lake"]
+    paths = await generator.generate_batch(prompts, width=90, height=160)
+    again = await generator.generate_batch(["a red fox"], width=90, height=160)
+
+    assert paths[0] == paths[3]
+    assert again == [paths[1]]
+    assert sorted(state["prompts"]) == ["a city at night", "a quiet lake", "a red fox"]
+    assert state["max_active"] == 2
+    with Image.open(paths[1]) as image:
+        assert image.size == (90, 160)
+
+
+@pytest.mark.asyncio
+async def test_non_image_answer_is_an_error(image_server, tmp_path):
+    base_url, _ = image_server
+    generator = ImageGenerator(base_url=base_url, cache=CacheStore(str(tmp_path)))
+
+    with pytest.raises(ImageGenError, match="Not an image"):
+        await generator.generate("broken")
+
+
+def make_image(path, size, colour=None) -> str:
+    if colour is None:
+        image = Image.linear_gradient("L").resize(size).convert("RGB")
+    else:
+        image = Image.new("RGB", size, colour)
+    image.save(path)
+    return str(path)
+
+
+def test_slideshow_pans_and_zooms(tmp_path):
+    gradient = make_image(tmp_path / "gradient.png", (300, 400))
+    flat = make_image(tmp_path / "flat.png", (200, 200), (200, 40, 40))
+    slideshow = Slideshow(
+        [gradient, gradient, flat], [1.0, 1.0, 0.5], width=90, height=160
+    )
+
+    first = slideshow.frame(0)
+    assert first.shape == (160, 90, 3) and first.dtype == np.uint8
+    # fully zoomed out, the frame is the whole prepared image scaled down
+    reference = Image.fromarray(slideshow.images[0]).resize((90, 160))
+    assert np.abs(first.astype(int) - np.asarray(reference)).mean() < 2
+    # the second slide starts fully zoomed in, a 1:1 crop panned to the right
+    top = (slideshow.images[1].shape[0] - 160) // 2
+    assert np.array_equal(
+        slideshow.frame(1.0), slideshow.images[1][top : top + 160, -90:]
+    )
+
+    assert (slideshow.frame(2.2) == (200, 40, 40)).all()
+
+
+def test_slideshow_writes_the_narration_length(tmp_path):
+    image = make_image(tmp_path / "gradient.png", (300, 400))
+    slideshow = Slideshow([image, image], [0.5, 0.75], width=90, height=160)
+
+    path = slideshow.write(str(tmp_path / "slideshow.mp4"), RENDER_PROFILES["preview"])
+
+    assert probe_duration(path) == pytest.approx(1.25, abs=0.05)
+
+
+def test_slideshow_never_rewrites_a_linked_file(tmp_path):
+    image = make_image(tmp_path / "gradient.png", (300, 400))
+    path = str(tmp_path / "slideshow.mp4")
+    checkpoint = tmp_path / "checkpoint.mp4"
+    checkpoint.write_bytes(b"older slideshow")
+    os.link(checkpoint, path)
+
+    Slideshow([image], [0.5], width=90, height=160).write(
+        path, RENDER_PROFILES["preview"]
+    )
+
+    assert checkpoint.read_bytes() == b"older slideshow"
+    assert probe_duration(path) == pytest.approx(0.5, abs=0.05)
+
+
+@pytest.mark.asyncio
+async def test_reels_maker_renders_an_image_slideshow(image_server, tmp_path):
+    base_url, state = image_server
+    config = ReelsMakerConfig(
+        cwd=str(tmp_path),
+        sentence="One small step. Then another one",
+        background="images",
+        video_gen_config=VideoGeneratorConfig(
+            backend="ffmpeg", threads=2, profile="preview"
+        ),
+    )
+    maker = ReelsMaker(
+        config,
+        prompt_generator=FakePromptGenerator(2),
+        synth_generator=FakeSynthGenerator(str(tmp_path)),
+        image_generator=ImageGenerator(
+            base_url=base_url, cache=CacheStore(str(tmp_path / "images"))
+        ),
+    )
+    maker.checkpoints = Checkpoints(CacheStore(str(tmp_path / "stages")))
+    maker.videos_cache = CacheStore(str(tmp_path / "videos"))
+
+    video_path = await maker.start()
+
+    assert sorted(state["prompts"]) == [
+        "a cinematic photo of one small step",
+        "a cinematic photo of then another one",
+    ]
+    assert probe_duration(video_path) == pytest.approx(maker.audio_duration, abs=0.1)
+    assert "slideshow" in {span.name for span in maker.profiler.spans}
@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# cumulative import time of app.reels_maker, heavy dependencies alone
+# (moviepy, langchain, the elevenlabs sdk) take well over a second
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", 800))
+
+HEAVY_MODULES = [
+    "moviepy",
+    "langchain",
+    "langchain_core",
+    "langchain_openai",
+    "openai",
+    "elevenlabs",
+    "numpy",
+    "PIL",
+]
+
+
+def run_python(code: str, cwd: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=cwd,
+        env={**os.environ, "PYTHONPATH": ROOT},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_import_has_no_heavy_dependencies_or_side_effects(tmp_path):
+    result = run_python(
+        "import json, sys, app.reels_maker; print(json.dumps(sorted(sys.modules)))",
+        cwd=str(tmp_path),
+    )
+
+    modules = json.loads(result.stdout)
+    loaded = [m for m in HEAVY_MODULES if m in modules]
+    assert loaded == [], f"imported at module level: {loaded}"
+    # caches and .env are only touched once a ReelsMaker is created
+    assert os.listdir(tmp_path) == []
+
+
+def test_import_time_budget(tmp_path):
+    timings = []
+    for _ in range(3):
+        result = run_python("import app.reels_maker", str(tmp_path), "-X", "importtime")
+        line = next(
+            line
+            for line in result.stderr.splitlines()
+            if line.rstrip().endswith("| app.reels_maker")
+        )
+        timings.append(int(line.split("|")[1]) / 1000)
+
+    assert min(timings) < IMPORT_BUDGET_MS, f"import took {min(timings):.0f}ms"
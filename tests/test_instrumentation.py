@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+import pytest
+
+from app.instrumentation import (
+    StageProfiler,
+    current_profiler,
+    record_cache,
+    span,
+)
+
+
+def test_span_records_wall_cpu_and_io(tmp_path):
+    profiler = StageProfiler()
+    with profiler.span("write", kind="test"):
+        (tmp_path / "blob").write_bytes(b"x" * 1024 * 1024)
+        sum(range(200_000))
+
+    (s,) = profiler.spans
+    assert s.name == "write"
+    assert s.labels == {"kind": "test"}
+    assert s.wall_seconds > 0
+    assert s.cpu_seconds > 0
+    assert s.peak_rss_bytes > 0
+    assert s.write_bytes >= 1024 * 1024
+
+
+def test_span_without_profiler_is_a_noop():
+    with span("script") as s:
+        record_cache(True)
+    assert s is None
+
+
+@pytest.mark.asyncio
+async def test_spans_follow_tasks_and_record_cache():
+    profiler = StageProfiler()
+    token = current_profiler.set(profiler)
+    try:
+
+        async def tts(hit: bool):
+            with span("tts"):
+                await asyncio.sleep(0.01)
+                record_cache(hit)
+
+        await asyncio.gather(tts(True), tts(False), tts(True))
+    finally:
+        current_profiler.reset(token)
+
+    assert sorted(s.cache for s in profiler.spans) == ["hit", "hit", "miss"]
+    assert profiler.stage_totals()["tts"] >= 0.03
+
+
+def test_reports(tmp_path):
+    profiler = StageProfiler()
+    with profiler.span("pexels_query", query='say "hi"') as s:
+        s.cache = "miss"
+
+    path = profiler.save_json(str(tmp_path / "report.json"))
+    with open(path) as f:
+        report = json.load(f)
+    assert report["spans"][0]["name"] == "pexels_query"
+
+    text = profiler.to_prometheus()
+    assert "# TYPE reels_stage_wall_seconds gauge" in text
+    assert (
+        'reels_stage_read_bytes{stage="pexels_query",span="0",query="say \\"hi\\"",cache="miss"}'
+        in text
+    )
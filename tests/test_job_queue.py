@@ -0,0 +1,86 @@
+import time
+
+from app.job_queue import JobQueue, WorkerPool, run_job
+
+
+def test_job_lifecycle(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    first = queue.enqueue('{"cwd": "a"}')
+    second = queue.enqueue('{"cwd": "b"}')
+
+    assert queue.position(second) == 1
+
+    job = queue.claim("worker-1")
+    assert job is not None and job.id == first
+    assert job.state == "running" and job.attempts == 1
+
+    assert queue.complete(job, "/tmp/a/master__final__video.mp4")
+    assert queue.get(first).state == "done"  # type: ignore
+
+    job = queue.claim("worker-1")
+    assert job is not None and job.id == second
+    assert queue.fail(job, "boom")
+    assert queue.get(second).error == "boom"  # type: ignore
+
+    assert queue.claim("worker-1") is None
+
+
+def test_crashed_jobs_are_retried(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_attempts=2, lease_timeout=0.01)
+    job_id = queue.enqueue("{}")
+
+    # the worker never heartbeats, as if it crashed mid render
+    assert queue.claim("worker-1").id == job_id  # type: ignore
+    time.sleep(0.02)
+    retried = queue.claim("worker-2")
+    assert retried is not None and retried.attempts == 2
+
+    time.sleep(0.02)
+    assert queue.claim("worker-3") is None
+    assert queue.get(job_id).state == "failed"  # type: ignore
+
+
+def test_expired_lease_cannot_overwrite_the_new_owner(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), lease_timeout=0.01)
+    job_id = queue.enqueue("{}")
+
+    stale = queue.claim("worker-1")
+    time.sleep(0.02)
+    owner = queue.claim("worker-2")
+    assert stale is not None and owner is not None
+
+    run_job(queue, owner, render=lambda config: "/tmp/new.mp4")
+    # the first worker finishes late, after its lease expired
+    run_job(queue, stale, render=lambda config: "/tmp/stale.mp4")
+
+    job = queue.get(job_id)
+    assert job.state == "done" and job.result == "/tmp/new.mp4"  # type: ignore
+    assert not queue.fail(stale, "late failure")
+
+
+def test_run_job_records_failures(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    job_id = queue.enqueue("{}")
+
+    def render(config: str) -> str:
+        raise ValueError("bad config")
+
+    run_job(queue, queue.claim("worker-1"), render=render)  # type: ignore
+
+    job = queue.get(job_id)
+    assert job.state == "failed" and job.error == "bad config"  # type: ignore
+
+
+def test_dead_workers_are_restarted(tmp_path):
+    pool = WorkerPool(2, str(tmp_path / "jobs.db")).start()
+    try:
+        dead = pool.processes[0]
+        dead.kill()
+        dead.join()
+
+        assert pool.restart_dead() == 1
+        assert len(pool.processes) == 2
+        assert all(process.is_alive() for process in pool.processes)
+        assert pool.restart_dead() == 0
+    finally:
+        pool.stop()
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+from typing import Any
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from app.llm_cache import LLMCache
+from app.prompt_gen import PromptGenerator
+
+
+class EchoChatModel(BaseChatModel):
+    """Local fake model, answers with a canned reply per last message and counts calls."""
+
+    replies: dict[str, str] = {}
+    calls: list[str] = []
+    delay: float = 0.05
+
+    @property
+    def _llm_type(self) -> str:
+        return "echo"
+
+    def reply(self, messages: list[BaseMessage]) -> ChatResult:
+        text = messages[-1].content
+        self.calls.append(text)
+        content = self.replies.get(text, f"prompt for: {text.strip().splitlines()[-1]}")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        return self.reply(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        await asyncio.sleep(self.delay)
+        return self.reply(messages)
+
+
+@pytest.mark.asyncio
+async def test_script_and_hashtags_in_one_call(tmp_path):
+    reply = json.dumps({"script": "Rise. Shine", "hashtags": ["#sunrise", "#run"]})
+    model = EchoChatModel(replies={"a sunday morning": reply}, calls=[])
+
+    generator = PromptGenerator(model=model, lock_dir=str(tmp_path))
+    response = await generator.generate_script("a sunday morning")
+
+    assert response.script == "Rise. Shine"
+    assert response.hashtags == ["#sunrise", "#run"]
+    assert len(model.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_image_prompts_are_batched_and_coalesced(tmp_path):
+    model = EchoChatModel(calls=[])
+    generator = PromptGenerator(model=model, max_concurrency=2, lock_dir=str(tmp_path))
+    other_job = PromptGenerator(model=model, lock_dir=str(tmp_path))
+
+    sentences = ["one", "two", "one", "three"]
+    prompts, joined = await asyncio.gather(
+        generator.sentences_to_image_prompts(sentences),
+        other_job.sentence_to_image_prompt("two"),
+    )
+
+    assert prompts == [f"prompt for: {s}" for s in sentences]
+    assert joined == "prompt for: two"
+    # one call per distinct sentence, the other job joined the in-flight request
+    assert sorted(call.strip().splitlines()[-1] for call in model.calls) == [
+        "one",
+        "three",
+        "two",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_cached_generations_skip_the_model(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.db"))
+    model = EchoChatModel(calls=[], cache=cache)
+
+    first = await PromptGenerator(model=model).sentence_to_image_prompt("sea")
+    second = await PromptGenerator(model=model).sentence_to_image_prompt("sea")
+
+    assert first == second
+    assert len(model.calls) == 1
+    assert cache.db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    # the locks follow the injected cache
+    assert os.listdir(tmp_path / "llm_locks")
+
+
+def test_cache_entries_expire(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.db"), ttl=60)
+    generations = [ChatGeneration(message=AIMessage("hello"))]
+
+    cache.update("prompt", "model", generations)
+    assert cache.lookup("prompt", "model")[0].text == "hello"
+    assert cache.lookup("prompt", "other model") is None
+
+    cache.db.execute("UPDATE generations SET created_at = created_at - 120")
+    assert cache.lookup("prompt", "model") is None
@@ -0,0 +1,49 @@
+import subprocess
+
+from app.cache import CacheStore
+from app.normalize import NormalizeParams, normalize_source
+from app.utils import ffmpeg_binary, run_ffmpeg
+
+
+def make_source(path: str, size: str = "640x360") -> str:
+    run_ffmpeg(
+        [
+            "-f",
+            "lavfi",
+            "-i",
+            f"testsrc=size={size}:rate=25:duration=1",
+            "-pix_fmt",
+            "yuv420p",
+            path,
+        ]
+    )
+    return path
+
+
+def video_stream(path: str) -> str:
+    probe = subprocess.run(
+        [ffmpeg_binary(), "-hide_banner", "-i", path], capture_output=True
+    )
+    return next(line for line in probe.stderr.decode().splitlines() if "Video:" in line)
+
+
+def test_normalize_source_is_cached(tmp_path):
+    source = make_source(str(tmp_path / "landscape.mp4"))
+    cache = CacheStore(str(tmp_path / "cache"))
+
+    first = normalize_source(source, cache=cache)
+    second = normalize_source(source, cache=cache)
+
+    assert first == second
+    stream = video_stream(first)
+    assert "1080x1920" in stream and "30 fps" in stream
+
+
+def test_normalize_params_are_part_of_the_key(tmp_path):
+    source = make_source(str(tmp_path / "portrait.mp4"), size="360x640")
+    cache = CacheStore(str(tmp_path / "cache"))
+
+    small = normalize_source(source, NormalizeParams(width=540, height=960), cache)
+
+    assert small != normalize_source(source, cache=cache)
+    assert "540x960" in video_stream(small)
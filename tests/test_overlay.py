@@ -0,0 +1,51 @@
+import numpy as np
+from PIL import Image
+
+from app.overlay import OverlayLayer
+from app.video_config import VideoGeneratorConfig
+
+
+def reference_over(frame: np.ndarray, rgba: np.ndarray) -> np.ndarray:
+    alpha = rgba[..., 3:] / 255
+    return frame * (1 - alpha) + rgba[..., :3] * alpha
+
+
+def test_layer_blends_like_stacked_graphics():
+    rng = np.random.default_rng(0)
+    logo = rng.integers(0, 256, (20, 30, 4), dtype=np.uint8)
+    box = np.empty((10, 64, 4), dtype=np.uint8)
+    box[...] = (0, 0, 0, 128)
+
+    layer = OverlayLayer(64, 48)
+    layer.add_box(0, 30, 64, 10, (0, 0, 0, 128))
+    layer.add(logo, 40, 25)
+    assert layer.bbox == (0, 25, 64, 45)
+
+    frame = rng.integers(0, 256, (48, 64, 3), dtype=np.uint8)
+    expected = frame.astype(np.float64)
+    expected[30:40] = reference_over(expected[30:40], box)
+    expected[25:45, 40:] = reference_over(expected[25:45, 40:], logo[:, :24])
+
+    blended = layer.blend(frame)
+    assert blended is frame
+    assert np.abs(frame - expected).max() <= 2
+    # nothing outside the bounding box is touched
+    assert np.array_equal(frame[:25], blended[:25])
+
+
+def test_watermark_layer_round_trips_through_png(tmp_path):
+    Image.new("RGBA", (100, 50), (255, 0, 0, 255)).save(tmp_path / "logo.png")
+    config = VideoGeneratorConfig(
+        watermark_path=str(tmp_path / "logo.png"), profile="preview"
+    )
+
+    layer = OverlayLayer.from_config(config)
+    x, y = layer.save_png(str(tmp_path / "overlay.png"))
+
+    # scaled to 25px high, 4px from the bottom right corner of 540x960
+    assert (x, y) == (540 - 50 - 4, 960 - 25 - 4)
+    with Image.open(tmp_path / "overlay.png") as image:
+        assert image.size == (50, 25)
+        assert image.getpixel((25, 12)) == (255, 0, 0, 255)
+
+    assert OverlayLayer.from_config(VideoGeneratorConfig()).empty
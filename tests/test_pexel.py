@@ -0,0 +1,89 @@
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+from app.cache import CacheStore
+from app.pexel import PexelsClient
+
+
+def fake_video(query: str, duration: int) -> dict:
+    return {
+        "duration": duration,
+        "video_files": [
+            {
+                "link": f"https://videos.pexels.com/video-files/{query}-sd.mp4",
+                "width": 540,
+                "height": 960,
+            },
+            {
+                "link": f"https://videos.pexels.com/video-files/{query}-hd.mp4",
+                "width": 1080,
+                "height": 1920,
+            },
+        ],
+    }
+
+
+@pytest_asyncio.fixture
+async def fake_pexels():
+    """Local fake of the pexels /videos/search endpoint."""
+    queries = []
+
+    async def search(request):
+        query = request.query["query"]
+        queries.append((query, request.query["per_page"]))
+        return web.json_response(
+            {"videos": [fake_video(query, 5), fake_video(query, 30)]}
+        )
+
+    app = web.Application()
+    app.router.add_get("/videos/search", search)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+    yield f"http://127.0.0.1:{port}", queries
+
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_search_many_uses_cache(fake_pexels, tmp_path):
+    base_url, queries = fake_pexels
+    client = PexelsClient(
+        api_key="test", base_url=base_url, cache=CacheStore(str(tmp_path))
+    )
+
+    first = await client.search_many(["sunrise", "motivation"], limit=2, min_dur=10)
+    second = await client.search_many(["sunrise", "motivation"], limit=2, min_dur=10)
+    await client.close()
+
+    assert (
+        first
+        == second
+        == [
+            ["https://videos.pexels.com/video-files/sunrise-hd.mp4"],
+            ["https://videos.pexels.com/video-files/motivation-hd.mp4"],
+        ]
+    )
+    assert sorted(queries) == [("motivation", "2"), ("sunrise", "2")]
+
+
+@pytest.mark.asyncio
+async def test_expired_cache_entries_are_refetched(fake_pexels, tmp_path):
+    base_url, queries = fake_pexels
+    client = PexelsClient(
+        api_key="test",
+        base_url=base_url,
+        cache=CacheStore(str(tmp_path)),
+        cache_ttl=0,
+    )
+
+    await client.search_for_stock_videos("sunrise", limit=2, min_dur=10)
+    await client.search_for_stock_videos("sunrise", limit=2, min_dur=10)
+    await client.close()
+
+    assert len(queries) == 2
@@ -1,5 +1,15 @@
+import filecmp
 import os
+from app.cache import CacheStore
+from app.checkpoint import Checkpoints
 from app.reels_maker import ReelsMaker, ReelsMakerConfig
+from app.utils import probe_duration
+from app.video_config import VideoGeneratorConfig
+from benchmarks.fixtures import (
+    FakePromptGenerator,
+    FakeSynthGenerator,
+    make_source_video,
+)
 import pytest
 
 
@@ -27,3 +37,59 @@ async def test_reels_maker():
     reels_maker = ReelsMaker(config)
     video_path = await reels_maker.start()
     return video_path
+
+
+@pytest.mark.asyncio
+async def test_reruns_only_recompute_changed_stages(tmp_path):
+    source = make_source_video(str(tmp_path / "source.mp4"), 640, 360, 25, duration=6)
+    checkpoints = Checkpoints(CacheStore(str(tmp_path / "stages")))
+    videos = CacheStore(str(tmp_path / "videos"))
+
+    def reels_maker(
+        name: str,
+        text_color: str = "#ffffff",
+        sentence: str = "One small step. Then another one",
+    ) -> ReelsMaker:
+        cwd = str(tmp_path / name)
+        os.makedirs(cwd)
+        config = ReelsMakerConfig(
+            cwd=cwd,
+            sentence=sentence,
+            video_paths=[source],
+            video_gen_config=VideoGeneratorConfig(
+                backend="ffmpeg", threads=2, text_color=text_color
+            ),
+        )
+        maker = ReelsMaker(
+            config,
+            prompt_generator=FakePromptGenerator(2),
+            synth_generator=FakeSynthGenerator(cwd),
+        )
+        maker.checkpoints = checkpoints
+        maker.videos_cache = videos
+        return maker
+
+    first = await reels_maker("first").start()
+
+    # an identical request reuses the final video of the same stage inputs
+    identical = reels_maker("identical")
+    identical.render_video = None
+    assert filecmp.cmp(await identical.start(), first, shallow=False)
+
+    # new subtitle colour: narration is reused, the video is rendered again
+    restyled = reels_maker("restyled", text_color="#ff0000")
+    video_path = await restyled.start()
+    assert not filecmp.cmp(video_path, first, shallow=False)
+    cache = {s.name: s.cache for s in restyled.profiler.spans}
+    assert cache["audio_assembly"] == "hit"
+    assert cache["subtitles"] == "hit"
+    assert "final_write" in cache
+
+    # one more sentence: the narration changes, so the reel is rendered again
+    longer = reels_maker(
+        "longer", sentence="One small step. Then another one. And one more"
+    )
+    video_path = await longer.start()
+    assert len(longer.sentences) == 3
+    assert "final_write" in {s.name for s in longer.profiler.spans}
+    assert probe_duration(video_path) > probe_duration(first) + 0.5
@@ -0,0 +1,24 @@
+from app.render_profile import RENDER_PROFILES, RenderProfile
+
+
+def test_profile_sizes_are_even_and_portrait():
+    assert (RENDER_PROFILES["preview"].width, RENDER_PROFILES["preview"].height) == (
+        540,
+        960,
+    )
+    assert (RENDER_PROFILES["draft"].width, RENDER_PROFILES["draft"].height) == (
+        720,
+        1280,
+    )
+    for profile in RENDER_PROFILES.values():
+        assert profile.width % 2 == 0 and profile.height % 2 == 0
+
+
+def test_scaled_values_and_encoder_params():
+    profile = RenderProfile(scale=0.5, crf=30, tune="fastdecode")
+
+    assert profile.scaled(100) == 50
+    assert profile.scaled(1) == 1
+    assert profile.scaled(0) == 0
+    assert profile.x264_params() == ["-crf", "30", "-tune", "fastdecode"]
+    assert RenderProfile().x264_params() == ["-crf", "23"]
@@ -0,0 +1,47 @@
+from app.subtitle_raster import RasterCache, rasterize_text, raster_cache, render_text
+
+FONT = "fonts/bold_font.ttf"
+
+
+def test_render_text_is_rgba():
+    image = render_text("waking up", FONT, 100, "#ffffff", "black", 5, None)
+
+    assert image.ndim == 3 and image.shape[2] == 4
+    assert image[..., 3].max() == 255
+    # transparent background when no bg color is given
+    assert image[0, 0, 3] == 0
+
+
+def test_rasterize_text_is_cached():
+    raster_cache.clear()
+    first = rasterize_text("each day", FONT, 80, "white", "black", 2, "None")
+    second = rasterize_text("each day", FONT, 80, "white", "black", 2, "None")
+
+    assert first is second
+    assert not first.flags.writeable
+    assert (raster_cache.hits, raster_cache.misses) == (1, 1)
+
+
+def test_raster_cache_clear_resets_counters():
+    image = render_text("Imagine", FONT, 60)
+    cache = RasterCache(max_bytes=image.nbytes)
+    key = ("Imagine", FONT, 60, None, None, 0, None)
+    cache.get(key)
+    cache.put(key, image)
+    cache.get(key)
+
+    cache.clear()
+
+    assert (len(cache), cache.nbytes, cache.hits, cache.misses) == (0, 0, 0, 0)
+
+
+def test_raster_cache_respects_byte_budget():
+    image = render_text("Imagine", FONT, 60)
+    cache = RasterCache(max_bytes=image.nbytes * 2)
+
+    for i in range(5):
+        cache.put((f"{i}", FONT, 60, None, None, 0, None), image)
+
+    assert len(cache) == 2
+    assert cache.nbytes <= cache.max_bytes
+    assert cache.get(("0", FONT, 60, None, None, 0, None)) is None
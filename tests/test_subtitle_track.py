@@ -0,0 +1,46 @@
+import srt_equalizer
+
+from app.subtitle_gen import SubtitleGenerator
+from app.subtitle_track import SubtitleTrack
+
+SENTENCES = ["Imagine waking up each day.", "Go."]
+DURATIONS = [2.0, 0.5]
+
+
+def test_track_matches_equalized_srt(tmp_path):
+    track = SubtitleTrack.from_sentences(SENTENCES, DURATIONS, gap=0.25)
+
+    # the former pipeline: write one cue per sentence, equalize the file
+    srt_path = str(tmp_path / "sentences.srt")
+    SubtitleTrack.from_sentences(SENTENCES, DURATIONS, gap=0.25).export(srt_path)
+    srt_equalizer.equalize_srt_file(srt_path, srt_path, 15)
+
+    split = SubtitleTrack.from_sentences(SENTENCES, DURATIONS, gap=0.25, max_chars=15)
+    assert list(split) == list(SubtitleTrack.load(srt_path))
+    assert len(track) == 2
+    assert [text for _, _, text in split] == ["Imagine waking", "up each day.", "Go."]
+    assert split.duration == 2.75
+
+
+def test_cue_lookup_by_bisection():
+    track = SubtitleTrack([(1.0, 2.0, "b"), (0.0, 1.0, "a"), (2.5, 3.0, "c")])
+
+    assert track.text_at(0.0) == "a"
+    assert track.text_at(0.999) == "a"
+    assert track.text_at(1.0) == "b"
+    # gaps, and before or after the track, show nothing
+    assert track.cue_at(2.2) is None
+    assert track.cue_at(-1) is None
+    assert track.cue_at(3.0) is None
+    assert track.cue_at(2.7) == 2
+
+
+def test_srt_is_only_an_export(tmp_path):
+    generator = SubtitleGenerator(cwd=str(tmp_path))
+    track = generator.build_track(SENTENCES, DURATIONS)
+
+    assert not (tmp_path / "subtitles").exists()
+
+    path = track.export(str(tmp_path / "master.srt"))
+    assert list(SubtitleTrack.coerce(path)) == list(track)
+    assert SubtitleTrack.coerce(track) is track
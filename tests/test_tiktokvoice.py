@@ -0,0 +1,93 @@
+import asyncio
+import base64
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+from app.tiktokvoice import TikTokTTSClient, TikTokTTSError, split_string
+
+
+@pytest_asyncio.fixture
+async def stub_server():
+    """Local stand-in for both TikTok TTS endpoints, the first one is down."""
+    calls = {"down": 0, "up": 0, "texts": []}
+
+    async def down(request):
+        calls["down"] += 1
+        return web.Response(status=503)
+
+    async def up(request):
+        calls["up"] += 1
+        payload = await request.json()
+        calls["texts"].append(payload["text"])
+        audio = base64.b64encode(payload["text"].encode()).decode()
+        return web.json_response({"audio": f"data:audio/mpeg;base64,{audio}"})
+
+    app = web.Application()
+    app.router.add_post("/down/api/generation", down)
+    app.router.add_post("/up/api/tiktok-tts", up)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+    base = f"http://127.0.0.1:{port}"
+    yield [f"{base}/down/api/generation", f"{base}/up/api/tiktok-tts"], calls
+
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_tts_fails_over_and_caches_health(stub_server, tmp_path):
+    endpoints, calls = stub_server
+    client = TikTokTTSClient(endpoints=endpoints, health_ttl=60)
+
+    first = tmp_path / "first.mp3"
+    second = tmp_path / "second.mp3"
+    await client.tts("Imagine waking up", "en_us_001", str(first))
+    await client.tts("each day", "en_us_001", str(second))
+    await client.close()
+
+    assert first.read_bytes() == b"Imagine waking up"
+    assert second.read_bytes() == b"each day"
+    # the failing endpoint is only tried once while it is marked unhealthy
+    assert calls["down"] == 1
+    assert calls["up"] == 2
+
+
+@pytest.mark.asyncio
+async def test_long_text_is_chunked_in_order(stub_server, tmp_path):
+    endpoints, calls = stub_server
+    client = TikTokTTSClient(endpoints=endpoints[1:], max_chunk_concurrency=2)
+    text = " ".join(f"word{i}" for i in range(200))
+
+    out = tmp_path / "long.mp3"
+    await client.tts(text, "en_us_001", str(out))
+    await client.close()
+
+    # chunks may reach the server in any order, the audio is joined in text order
+    chunks = split_string(text, 299)
+    assert len(chunks) > 1
+    assert sorted(calls["texts"]) == sorted(chunks)
+    assert out.read_bytes() == "".join(chunks).encode()
+
+
+@pytest.mark.asyncio
+async def test_unknown_voice(tmp_path):
+    with pytest.raises(TikTokTTSError):
+        await TikTokTTSClient().tts("hello", "nope", str(tmp_path / "x.mp3"))
+
+
+@pytest.mark.asyncio
+async def test_session_of_a_previous_loop_is_closed():
+    client = TikTokTTSClient()
+    previous = await asyncio.to_thread(asyncio.run, client.session())
+
+    current = await client.session()
+
+    assert current is not previous and previous.closed
+    await client.close()
+    assert current.closed